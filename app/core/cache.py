@@ -0,0 +1,242 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Optional
+
+from app.core.config import settings
+
+CACHE_DIR = Path(settings.CACHE_DIR)
+
+_MISSING = object()
+
+
+class TTLCache:
+    """In-process LRU cache with optional per-entry TTL and hit/miss counters."""
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        entry = self._data.get(key, _MISSING)
+        if entry is _MISSING:
+            self.misses += 1
+            return default
+
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def delete(self, key):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class SQLiteStore:
+    """
+    Persistent key/value table with JSON values and optional expiry.
+    Lookups are single-row primary-key reads, cheap enough to run inline.
+    """
+
+    def __init__(self, name: str, path: Optional[Path] = None):
+        self.path = Path(path) if path else CACHE_DIR / f"{name}.sqlite3"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+        )
+        self.purge_expired()
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            cur = self._conn.execute(
+                "DELETE FROM kv WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),)
+            )
+        return cur.rowcount
+
+    def get(self, key: str, default=None):
+        entry = self.get_entry(key)
+        return default if entry is None else entry[0]
+
+    def get_entry(self, key: str):
+        """(value, seconds left or None when it never expires), or None when missing/expired."""
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires_at FROM kv WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        remaining = expires_at - time.time() if expires_at is not None else None
+        if remaining is not None and remaining <= 0:
+            self.delete(key)
+            return None
+        return json.loads(value), remaining
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        self.set_many([(key, value)], ttl=ttl)
+
+    def set_many(self, items, ttl: Optional[float] = None):
+        expires_at = time.time() + ttl if ttl else None
+        rows = [(key, json.dumps(value), expires_at) for key, value in items]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)", rows)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM kv WHERE key = ?", (key,))
+
+    def items(self):
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute("SELECT key, value, expires_at FROM kv").fetchall()
+        return [(k, json.loads(v)) for k, v, exp in rows if exp is None or exp > now]
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM kv").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls for the same key into one in-flight load.
+    The load runs in its own task owned by the flight, so cancelling a
+    caller (leader or follower) only cancels that caller's wait.
+    """
+
+    def __init__(self):
+        self._inflight: dict[Any, asyncio.Task] = {}
+        self.coalesced = 0
+
+    async def do(self, key, func: Callable[[], Awaitable[Any]]):
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(func())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finished(key, t))
+        return await asyncio.shield(task)
+
+    def _finished(self, key, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Mark retrieved so a failure nobody awaited isn't logged as unhandled
+            task.exception()
+
+
+class TieredCache:
+    """
+    Memory LRU in front of an optional SQLite store, with single-flight loading.
+    get_or_load() only calls the loader when both tiers miss, and concurrent
+    misses for the same key share one loader call.
+    """
+
+    def __init__(self, name: str, maxsize: int = 1024, ttl: Optional[float] = None, persistent: bool = True):
+        self.name = name
+        self.ttl = ttl
+        self.memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.disk = SQLiteStore(name) if persistent else None
+        self.flight = SingleFlight()
+        self.disk_hits = 0
+        self.loads = 0
+
+    def get(self, key: str, default=None):
+        value = self.memory.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        if self.disk is not None:
+            entry = self.disk.get_entry(key)
+            if entry is not None:
+                value, remaining = entry
+                self.disk_hits += 1
+                # Keep the entry's own expiry (e.g. short negative TTLs) in memory too
+                self.memory.set(key, value, ttl=remaining)
+                return value
+        return default
+
+    def set(self, key: str, value, ttl: Optional[float] = None):
+        self.memory.set(key, value, ttl=ttl)
+        if self.disk is not None:
+            self.disk.set(key, value, ttl=ttl or self.ttl)
+
+    def set_many(self, items, ttl: Optional[float] = None):
+        items = list(items)
+        for key, value in items:
+            self.memory.set(key, value, ttl=ttl)
+        if self.disk is not None:
+            self.disk.set_many(items, ttl=ttl or self.ttl)
+
+    def delete(self, key: str):
+        self.memory.delete(key)
+        if self.disk is not None:
+            self.disk.delete(key)
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]]):
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        async def load():
+            self.loads += 1
+            result = await loader()
+            self.set(key, result)
+            return result
+
+        return await self.flight.do(key, load)
+
+    def stats(self) -> dict:
+        mem = self.memory.stats()
+        lookups = mem["hits"] + mem["misses"]
+        hits = mem["hits"] + self.disk_hits
+        return {
+            "name": self.name,
+            "memory_size": mem["size"],
+            "memory_hits": mem["hits"],
+            "disk_hits": self.disk_hits,
+            "misses": mem["misses"] - self.disk_hits,
+            "loads": self.loads,
+            "coalesced": self.flight.coalesced,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+        }
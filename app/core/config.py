@@ -11,6 +11,104 @@ class Settings(BaseSettings):
     OPENROUTESERVICE_BASE_URL: str
     COMPANY_DETAIL_EXTRACTOR_URL: str
     EMAIL_GENERATION_URL: str
+    NHTSA_BASE_URL: str = "https://vpic.nhtsa.dot.gov/api/vehicles"
+
+    # Logging pipeline (see app/core/logger.py)
+    LOG_LEVEL: str = "INFO"
+    LOG_LEVELS: dict[str, str] = {"httpx": "WARNING", "httpcore": "WARNING"}  # per-logger overrides (JSON in env)
+    LOG_JSON: bool = False                 # one JSON object per line instead of the text format
+    LOG_FILE: str = "logs/app.log"
+    LOG_PAYLOAD_SAMPLE_RATE: float = 0.0   # fraction of request/response bodies logged at INFO (all at DEBUG)
+
+    # Metrics (/metrics, see app/core/metrics.py)
+    METRICS_LOOP_LAG_INTERVAL: float = 0.5  # seconds between event loop lag samples
+
+    # Shared outbound HTTP client pools (see app/core/http_client.py)
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0
+    HTTP_TIMEOUT: float = 30.0
+    HTTP_CONNECT_TIMEOUT: float = 5.0
+    HTTP2_ENABLED: bool = True
+    # Max in-flight calls per upstream (see get_upstream_limiter / upstream_call)
+    UPSTREAM_CONCURRENCY: dict[str, int] = {"hubspot": 10, "ors": 8, "nhtsa": 10, "zippo": 10, "agent": 4}
+
+    # Coalesce HubSpot association writes across concurrent requests (0 = per request)
+    HUBSPOT_ASSOCIATION_WINDOW_MS: int = 0
+
+    # HubSpot client-side rate limits and retries
+    HUBSPOT_RATE_PER_SECOND: int = 10
+    HUBSPOT_RATE_PER_10S: int = 100
+    HUBSPOT_SEARCH_RATE_PER_SECOND: int = 4
+    HUBSPOT_MAX_RETRIES: int = 4
+
+    # Local caches (memory LRU + SQLite files under CACHE_DIR)
+    CACHE_DIR: str = "data/cache"
+    GEOCODE_CACHE_SIZE: int = 50_000
+    GEOCODE_WARMUP_FILE: str | None = None  # CSV with zip,lat,lon columns
+    ROUTE_CACHE_SIZE: int = 20_000
+    ROUTE_CACHE_TTL: int = 30 * 24 * 3600  # seconds; road networks change slowly
+    ROUTE_CACHE_SYMMETRIC: bool = True     # treat A→B and B→A as the same lane
+    COMPANY_CACHE_SIZE: int = 10_000
+    COMPANY_CACHE_TTL: int = 3600          # seconds
+    COMPANY_NEGATIVE_TTL: int = 60         # cache "not found" only briefly
+    VIN_CACHE_SIZE: int = 20_000
+    VIN_CACHE_TTL: int = 365 * 24 * 3600   # decodes by VIN and by VIN pattern
+    NHTSA_BATCH_SIZE: int = 50             # DecodeVINValuesBatch limit
+    ENRICHMENT_CACHE_SIZE: int = 5_000
+    ENRICHMENT_CACHE_TTL: int = 30 * 24 * 3600   # agent results per normalized company name
+    ENRICHMENT_NEGATIVE_TTL: int = 24 * 3600     # "agent found nothing" is retried sooner
+    EMAIL_CACHE_SIZE: int = 2_000
+    EMAIL_CACHE_TTL: int = 7 * 24 * 3600   # generated quote emails by request hash
+    EMAIL_GENERATION_TIMEOUT: float = 8.0  # then fall back to the template email
+    EMAIL_GENERATION_STREAM_URL: str | None = None  # streaming agent endpoint (default: EMAIL_GENERATION_URL)
+    CONTACT_CACHE_SIZE: int = 50_000
+    CONTACT_CACHE_TTL: int = 24 * 3600     # email -> contact id, persisted under CACHE_DIR
+    COMPANY_DIRECTORY_ENABLED: bool = True
+    COMPANY_DIRECTORY_REFRESH_SECONDS: int = 60        # incremental sync interval
+    COMPANY_DIRECTORY_FULL_SYNC_SECONDS: int = 6 * 3600  # full resync also drops deleted companies
+
+    # Durable background jobs (see app/core/jobs.py)
+    JOBS_DB_PATH: str = "data/jobs.sqlite3"
+    JOB_WORKERS: int = 4
+    JOB_MAX_ATTEMPTS: int = 5
+    JOB_RETRY_BASE_DELAY: float = 5.0      # seconds, doubled per attempt (with jitter)
+    JOB_RETRY_MAX_DELAY: float = 600.0
+    JOB_DRAIN_TIMEOUT: float = 10.0        # shutdown grace period for running jobs
+
+    # Local HubSpot replica kept current by webhooks (see app/services/hubspot_sync.py)
+    HUBSPOT_REPLICA_ENABLED: bool = False
+    HUBSPOT_REPLICA_PATH: str = "data/hubspot_replica.sqlite3"
+    HUBSPOT_WEBHOOK_SECRET: str | None = None      # app client secret used to sign webhooks
+    HUBSPOT_WEBHOOK_URL: str | None = None         # public URL HubSpot calls, if behind a proxy
+    HUBSPOT_WEBHOOK_MAX_AGE: int = 300             # reject signatures older than this (seconds)
+    HUBSPOT_SYNC_BATCH_WINDOW_MS: int = 500        # gather events before re-reading records
+
+    # Distance resolution: exact | estimate | estimate_then_refine
+    DISTANCE_MODE: str = "exact"
+    DEFAULT_ROAD_FACTOR: float = 1.2
+    ORS_MATRIX_MAX_LOCATIONS: int = 50
+
+    # Bulk quoting
+    BULK_QUOTE_CONCURRENCY: int = 8
+    BULK_QUOTE_MAX_ITEMS: int = 500
+
+    # Offline ZIP database (built with scripts/build_zip_db.py)
+    ZIP_DB_ENABLED: bool = True
+    ZIP_DB_PATH: str = "data/zipdb.bin"
+
+    # Similar-lane route history from past orders
+    ORDERS_CSV_PATH: str = "data/Orders_Master.csv"
+    ORDERS_DATASET_PATH: str = "data/orders"       # Arrow dataset from scripts/ingest_orders.py (preferred)
+    ROUTE_HISTORY_K: int = 5
+    ROUTE_HISTORY_RADIUS_MILES: float = 75.0       # initial search radius around each lane end
+    ROUTE_HISTORY_MAX_RADIUS_MILES: float = 600.0  # radius doubles up to this until k orders match
+
+    # Lane pricing (fit with scripts/fit_pricing_model.py)
+    PRICING_MODEL: str = "loglinear"               # loglinear | per_mile
+    PRICING_MODEL_PATH: str = "data/pricing_model.json"
+    PRICING_MARKUP_PERCENT: float = 12.0
+    PRICING_MAX_LANES: int = 10_000                # per /quote/price call
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,111 @@
+import asyncio
+import importlib.util
+import time
+from contextlib import asynccontextmanager
+import httpx
+from app.core.config import settings
+from app.core.logger import get_logger
+from app.core.metrics import upstream_request_duration, upstream_requests_in_flight, upstream_requests_waiting
+
+logger = get_logger(__name__)
+
+# -------------------------------------------------------------------
+# One pooled AsyncClient per upstream host, shared by the whole app.
+# Created in the FastAPI lifespan hook and closed on shutdown.
+# -------------------------------------------------------------------
+UPSTREAMS = {
+    "hubspot": settings.HUBSPOT_BASE_URL,
+    "ors": None,    # ORS and agent endpoints are called with full URLs
+    "nhtsa": settings.NHTSA_BASE_URL,
+    "zippo": settings.ZIPPO_BASE_URL,
+    "agent": None,
+}
+
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+_clients: dict[str, httpx.AsyncClient] = {}
+_limiters: dict[str, asyncio.Semaphore] = {}
+
+
+def _build_client(name: str) -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=settings.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+    )
+    timeout = httpx.Timeout(
+        settings.HTTP_TIMEOUT,
+        connect=settings.HTTP_CONNECT_TIMEOUT,
+    )
+    kwargs = {}
+    base_url = UPSTREAMS.get(name)
+    if base_url:
+        kwargs["base_url"] = base_url
+
+    return httpx.AsyncClient(
+        limits=limits,
+        timeout=timeout,
+        http2=settings.HTTP2_ENABLED and HTTP2_AVAILABLE,
+        **kwargs,
+    )
+
+
+def get_http_client(name: str) -> httpx.AsyncClient:
+    """
+    Return the shared client for an upstream.
+    Falls back to lazy creation when called outside the app lifespan (scripts, workers).
+    """
+    client = _clients.get(name)
+    if client is None or client.is_closed:
+        client = _build_client(name)
+        _clients[name] = client
+    return client
+
+
+def get_upstream_limiter(name: str) -> asyncio.Semaphore:
+    """
+    Per-upstream concurrency cap (UPSTREAM_CONCURRENCY), shared by every caller,
+    so bulk work queues up locally instead of flooding one upstream.
+    """
+    limiter = _limiters.get(name)
+    if limiter is None:
+        limiter = asyncio.Semaphore(settings.UPSTREAM_CONCURRENCY.get(name, settings.HTTP_MAX_CONNECTIONS))
+        _limiters[name] = limiter
+    return limiter
+
+
+@asynccontextmanager
+async def upstream_call(name: str, operation: str):
+    """
+    Wrap one outbound call: waits for a slot on the upstream's limiter, then
+    times the block into upstream_request_duration_seconds{upstream, operation}
+    (outcome "error" when it raises).
+    """
+    limiter = get_upstream_limiter(name)
+    with upstream_requests_waiting.track(upstream=name):
+        await limiter.acquire()
+    outcome = "error"
+    start = time.perf_counter()
+    try:
+        with upstream_requests_in_flight.track(upstream=name):
+            yield
+        outcome = "ok"
+    finally:
+        upstream_request_duration.observe(time.perf_counter() - start, upstream=name, operation=operation, outcome=outcome)
+        limiter.release()
+
+
+async def start_http_clients():
+    for name in UPSTREAMS:
+        get_http_client(name)
+    logger.info(
+        f"HTTP clients ready for {list(_clients)} "
+        f"(http2={settings.HTTP2_ENABLED and HTTP2_AVAILABLE}, max_connections={settings.HTTP_MAX_CONNECTIONS})"
+    )
+
+
+async def close_http_clients():
+    for name, client in list(_clients.items()):
+        await client.aclose()
+        _clients.pop(name, None)
+    logger.info("HTTP clients closed")
@@ -0,0 +1,241 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Optional
+
+from app.core.config import settings
+from app.core.logger import get_logger
+from app.core.rate_limit import backoff_delay
+
+logger = get_logger(__name__)
+
+# -------------------------------------------------------------------
+# Durable background jobs
+#
+# Jobs live in a SQLite table so queued work survives restarts. A pool of
+# asyncio workers (started from lifespan) claims due jobs, runs the handler
+# registered for the job kind, and retries failures with backoff. A dedup
+# key keeps at most one queued/running job per key (e.g. one enrichment
+# per company).
+# -------------------------------------------------------------------
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind        TEXT NOT NULL,
+    payload     TEXT NOT NULL,
+    dedup_key   TEXT,
+    status      TEXT NOT NULL DEFAULT 'queued',   -- queued | running | failed
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    run_at      REAL NOT NULL,
+    last_error  TEXT,
+    created_at  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_due ON jobs (status, run_at);
+CREATE UNIQUE INDEX IF NOT EXISTS jobs_active_dedup ON jobs (dedup_key)
+    WHERE dedup_key IS NOT NULL AND status IN ('queued', 'running');
+"""
+
+JobHandler = Callable[..., Awaitable[Any]]
+
+
+class JobStore:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def add(self, kind: str, payload: dict, dedup_key: str = None, delay: float = 0) -> Optional[int]:
+        """Insert a job; returns its id, or None if an active job with the same dedup key exists."""
+        now = time.time()
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT OR IGNORE INTO jobs (kind, payload, dedup_key, run_at, created_at) VALUES (?, ?, ?, ?, ?)",
+                (kind, json.dumps(payload), dedup_key, now + delay, now),
+            )
+        return cur.lastrowid if cur.rowcount else None
+
+    def claim(self) -> Optional[tuple[int, str, dict, int]]:
+        with self._lock:
+            row = self._conn.execute(
+                """
+                UPDATE jobs SET status = 'running', attempts = attempts + 1
+                WHERE id = (SELECT id FROM jobs WHERE status = 'queued' AND run_at <= ? ORDER BY run_at LIMIT 1)
+                RETURNING id, kind, payload, attempts
+                """,
+                (time.time(),),
+            ).fetchone()
+        if row is None:
+            return None
+        job_id, kind, payload, attempts = row
+        return job_id, kind, json.loads(payload), attempts
+
+    def next_run_at(self) -> Optional[float]:
+        with self._lock:
+            row = self._conn.execute("SELECT MIN(run_at) FROM jobs WHERE status = 'queued'").fetchone()
+        return row[0]
+
+    def complete(self, job_id: int):
+        with self._lock:
+            self._conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def retry(self, job_id: int, delay: float, error: str):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'queued', run_at = ?, last_error = ? WHERE id = ?",
+                (time.time() + delay, error, job_id),
+            )
+
+    def fail(self, job_id: int, error: str):
+        with self._lock:
+            self._conn.execute("UPDATE jobs SET status = 'failed', last_error = ? WHERE id = ?", (error, job_id))
+
+    def requeue_running(self) -> int:
+        """Jobs left 'running' by a crash or an unfinished drain go back to the queue."""
+        with self._lock:
+            cur = self._conn.execute("UPDATE jobs SET status = 'queued' WHERE status = 'running'")
+        return cur.rowcount
+
+    def counts(self) -> dict:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {"queued": 0, "running": 0, "failed": 0} | dict(rows)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class JobRunner:
+    """Worker pool over a JobStore."""
+
+    def __init__(self, store: JobStore, workers: int, max_attempts: int, poll_interval: float = 5.0):
+        self.store = store
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.handlers: dict[str, JobHandler] = {}
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._tasks: list[asyncio.Task] = []
+        self.stats = {"completed": 0, "retried": 0, "failed": 0}
+
+    def start(self):
+        requeued = self.store.requeue_running()
+        if requeued:
+            logger.info(f"Requeued {requeued} interrupted jobs")
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+
+    def notify(self):
+        self._wakeup.set()
+
+    async def _wait_for_work(self):
+        next_run = self.store.next_run_at()
+        timeout = self.poll_interval if next_run is None else min(self.poll_interval, max(0.0, next_run - time.time()))
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    async def _worker(self, worker_id: int):
+        while not self._stopping:
+            job = self.store.claim()
+            if job is None:
+                await self._wait_for_work()
+                continue
+            await self._run(*job)
+
+    async def _run(self, job_id: int, kind: str, payload: dict, attempts: int):
+        handler = self.handlers.get(kind)
+        if handler is None:
+            self.store.fail(job_id, f"No handler registered for job kind '{kind}'")
+            self.stats["failed"] += 1
+            return
+
+        try:
+            await handler(**payload)
+        except asyncio.CancelledError:
+            # Left as 'running'; requeued on next start
+            raise
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if attempts >= self.max_attempts:
+                self.store.fail(job_id, error)
+                self.stats["failed"] += 1
+                logger.error(f"Job {kind}#{job_id} failed after {attempts} attempts: {error}")
+            else:
+                delay = backoff_delay(attempts, base=settings.JOB_RETRY_BASE_DELAY, cap=settings.JOB_RETRY_MAX_DELAY)
+                self.store.retry(job_id, delay, error)
+                self.stats["retried"] += 1
+                logger.warning(f"Job {kind}#{job_id} attempt {attempts} failed ({error}); retry in {delay:.1f}s")
+        else:
+            self.store.complete(job_id)
+            self.stats["completed"] += 1
+
+    async def drain(self, timeout: float):
+        """Stop claiming new jobs and give running ones `timeout` seconds to finish."""
+        self._stopping = True
+        self._wakeup.set()
+        done, pending = await asyncio.wait(self._tasks, timeout=timeout) if self._tasks else (set(), set())
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        if pending:
+            logger.warning(f"Job drain timed out; {len(pending)} running jobs will resume on next start")
+
+
+# -------------------------------------------------------------------
+# App-level queue (lifespan) and helpers
+# -------------------------------------------------------------------
+_handlers: dict[str, JobHandler] = {}
+runner: Optional[JobRunner] = None
+
+
+def register_job(kind: str, handler: JobHandler):
+    """Register the coroutine that runs jobs of `kind`; payload keys become its kwargs."""
+    _handlers[kind] = handler
+    if runner is not None:
+        runner.handlers[kind] = handler
+
+
+def enqueue_job(kind: str, payload: dict, dedup_key: str = None, delay: float = 0) -> Optional[int]:
+    """
+    Queue a job for the background workers. Returns the job id, or None when
+    an identical job (same dedup key) is already queued or running.
+    """
+    if runner is None:
+        raise RuntimeError("Job workers are not running")
+    job_id = runner.store.add(kind, payload, dedup_key=dedup_key, delay=delay)
+    if job_id is not None:
+        runner.notify()
+    return job_id
+
+
+def start_job_workers():
+    global runner
+    store = JobStore(settings.JOBS_DB_PATH)
+    runner = JobRunner(store, workers=settings.JOB_WORKERS, max_attempts=settings.JOB_MAX_ATTEMPTS)
+    runner.handlers.update(_handlers)
+    runner.start()
+    logger.info(f"Started {settings.JOB_WORKERS} job workers; queue: {store.counts()}")
+
+
+async def stop_job_workers():
+    global runner
+    if runner is not None:
+        await runner.drain(settings.JOB_DRAIN_TIMEOUT)
+        runner.store.close()
+        runner = None
+
+
+def get_job_stats() -> dict:
+    if runner is None:
+        return {"enabled": False}
+    return {"enabled": True, "workers": runner.workers, **runner.store.counts(), **runner.stats}
@@ -1,43 +1,129 @@
+import json
 import logging
-from logging.handlers import RotatingFileHandler
-from pathlib import Path
+import queue
+import random
 import sys
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from pathlib import Path
+from typing import Optional
 
-LOG_DIR = Path("logs")
-LOG_DIR.mkdir(exist_ok=True)
-
-LOG_FILE = LOG_DIR / "app.log"
+LOG_FILE = Path("logs") / "app.log"
 LOG_FORMAT = "%(levelname)s | %(asctime)s | %(name)s | %(message)s"
 
+# -------------------------------------------------------------------
+# Logging pipeline
+#
+# Every logger propagates to the root logger. Until start_logging() runs
+# (from lifespan) the root writes straight to stdout; after that it only
+# holds a QueueHandler, and a QueueListener thread does the formatting and
+# the file/console I/O, so logging never blocks the event loop.
+# -------------------------------------------------------------------
+_listener: Optional[QueueListener] = None
+_payload_sample_rate = 0.0
+_payload_max_chars = 2_000
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, message (+ exception)."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def _console_handler() -> logging.Handler:
+    try:
+        # Reopen standard output stream in UTF‑8 mode
+        stream = open(sys.stdout.fileno(), mode="w", encoding="utf-8", closefd=False)
+    except Exception:
+        # Fallback if running in an environment where fileno() is not allowed
+        stream = sys.stdout
+    return logging.StreamHandler(stream)
+
+
+def _configure_root(handler: logging.Handler, level):
+    root = logging.getLogger()
+    for old in list(root.handlers):
+        root.removeHandler(old)
+        if old is not handler and not isinstance(old, QueueHandler):
+            old.close()
+    root.addHandler(handler)
+    root.setLevel(level)
+
+
+def _ensure_configured():
+    root = logging.getLogger()
+    if not root.handlers:
+        handler = _console_handler()
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        _configure_root(handler, logging.INFO)
+
 
 def get_logger(name: str) -> logging.Logger:
-    logger = logging.getLogger(name)
-
-    # Prevent duplicate handlers if the logger is reused
-    if not logger.handlers:
-        # --- File handler (UTF-8 safe) ---
-        file_handler = RotatingFileHandler(
-            LOG_FILE, maxBytes=2_000_000, backupCount=3, encoding="utf-8"
-        )
-        file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
-        file_handler.setLevel(logging.INFO)
-
-        # --- Console handler (force UTF‑8 output on all OS) ---
-        try:
-            # Reopen standard output stream in UTF‑8 mode
-            console_stream = open(sys.stdout.fileno(), mode="w", encoding="utf-8", closefd=False)
-        except Exception:
-            # Fallback if running in an environment where fileno() is not allowed
-            console_stream = sys.stdout
-
-        console_handler = logging.StreamHandler(console_stream)
-        console_handler.setFormatter(logging.Formatter(LOG_FORMAT))
-        console_handler.setLevel(logging.INFO)
-
-        # Attach both handlers
-        logger.addHandler(file_handler)
-        logger.addHandler(console_handler)
-        logger.setLevel(logging.INFO)
-        logger.propagate = False
-
-    return logger
\ No newline at end of file
+    _ensure_configured()
+    return logging.getLogger(name)
+
+
+def start_logging(level: str = "INFO", levels: dict = None, json_output: bool = False,
+                  log_file: str = None, payload_sample_rate: float = 0.0):
+    """
+    Route all logging through a queue drained by a background listener.
+    `levels` sets per-logger levels, e.g. {"httpx": "WARNING", "hubspot_service": "DEBUG"}.
+    """
+    global _listener, _payload_sample_rate
+    stop_logging()
+
+    formatter = JsonFormatter() if json_output else logging.Formatter(LOG_FORMAT)
+    handlers = [_console_handler()]
+    path = Path(log_file) if log_file else LOG_FILE
+    path.parent.mkdir(parents=True, exist_ok=True)
+    handlers.append(RotatingFileHandler(path, maxBytes=2_000_000, backupCount=3, encoding="utf-8"))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _configure_root(QueueHandler(log_queue), level.upper())
+    for name, logger_level in (levels or {}).items():
+        logging.getLogger(name).setLevel(logger_level.upper())
+    _payload_sample_rate = payload_sample_rate
+    _listener.start()
+
+
+def stop_logging():
+    """Flush queued records and go back to direct console output."""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+    handler = _console_handler()
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    _configure_root(handler, logging.getLogger().level)
+
+
+def log_payload(logger: logging.Logger, message: str, payload):
+    """
+    Log a request/response body. Written at DEBUG when that level is enabled,
+    otherwise for a LOG_PAYLOAD_SAMPLE_RATE fraction of calls at INFO, so
+    bodies aren't formatted or written on every request. Long bodies are cut.
+    """
+    if logger.isEnabledFor(logging.DEBUG):
+        level = logging.DEBUG
+    elif _payload_sample_rate and random.random() < _payload_sample_rate and logger.isEnabledFor(logging.INFO):
+        level = logging.INFO
+    else:
+        return
+    text = payload if isinstance(payload, str) else repr(payload)
+    if len(text) > _payload_max_chars:
+        text = f"{text[:_payload_max_chars]}… ({len(text)} chars)"
+    logger.log(level, f"{message}: {text}")
@@ -0,0 +1,220 @@
+import asyncio
+import math
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterable, Optional
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# -------------------------------------------------------------------
+# In-process metrics, rendered in the Prometheus text format at /metrics
+#
+# Counters, gauges and histograms keep one value per label combination.
+# Collectors are callables run at scrape time, for numbers that already
+# live elsewhere (cache and job stats). Everything is updated from the
+# event loop, so no locking is needed.
+# -------------------------------------------------------------------
+# Seconds; covers local cache hits up to slow agent calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_metrics: list["Metric"] = []
+_collectors: list[Callable[[], Iterable["Family"]]] = []
+
+# (name, type, help, [(labels, value), ...]) as yielded by collectors
+Family = tuple[str, str, str, list[tuple[dict, float]]]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if isinstance(value, int) or (value.is_integer() and abs(value) < 1e15):
+        return str(int(value))
+    return repr(float(value))
+
+
+def _sample_line(name: str, labels: dict, value: float) -> str:
+    if labels:
+        label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+        return f"{name}{{{label_text}}} {_format_value(value)}"
+    return f"{name} {_format_value(value)}"
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: dict[tuple, object] = {}
+        _metrics.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _labels(self, key: tuple) -> dict:
+        return dict(zip(self.labelnames, key))
+
+    def samples(self) -> list[tuple[str, dict, float]]:
+        return [(self.name, self._labels(key), value) for key, value in self._values.items()]
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track(self, **labels):
+        """In-progress gauge: +1 for the duration of the block."""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        state = self._values.get(key)
+        if state is None:
+            # per-bucket counts (+Inf last), sum, count
+            state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        counts = state[0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+                break
+        else:
+            counts[-1] += 1
+        state[1] += value
+        state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> list[tuple[str, dict, float]]:
+        out = []
+        for key, (counts, total, count) in self._values.items():
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, n in zip((*self.buckets, math.inf), counts):
+                cumulative += n
+                out.append((f"{self.name}_bucket", {**labels, "le": _format_value(float(bound))}, cumulative))
+            out.append((f"{self.name}_sum", labels, total))
+            out.append((f"{self.name}_count", labels, count))
+        return out
+
+
+def register_collector(collector: Callable[[], Iterable[Family]]):
+    """Add a callable run on every scrape; it yields (name, type, help, samples) families."""
+    _collectors.append(collector)
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in _metrics:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        lines.extend(_sample_line(name, labels, value) for name, labels, value in metric.samples())
+
+    for collector in _collectors:
+        try:
+            families = list(collector())
+        except Exception as e:
+            logger.warning(f"Metrics collector {getattr(collector, '__name__', collector)} failed: {e!r}")
+            continue
+        for name, metric_type, help, samples in families:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            lines.extend(_sample_line(name, labels, value) for labels, value in samples)
+    return "\n".join(lines) + "\n"
+
+
+# -------------------------------------------------------------------
+# Metrics shared across the app
+# -------------------------------------------------------------------
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "Inbound request latency by route template.", ("method", "route", "status")
+)
+http_requests_in_flight = Gauge("http_requests_in_flight", "Inbound requests being handled.")
+
+upstream_request_duration = Histogram(
+    "upstream_request_duration_seconds", "Outbound call latency by upstream and operation.",
+    ("upstream", "operation", "outcome"),
+)
+upstream_requests_in_flight = Gauge("upstream_requests_in_flight", "Outbound calls in progress.", ("upstream",))
+upstream_requests_waiting = Gauge(
+    "upstream_requests_waiting", "Outbound calls queued on the per-upstream concurrency cap.", ("upstream",)
+)
+
+event_loop_lag = Histogram(
+    "event_loop_lag_seconds", "How late the event loop ran a scheduled wakeup.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+event_loop_lag_last = Gauge("event_loop_lag_last_seconds", "Most recent event loop lag sample.")
+
+
+# -------------------------------------------------------------------
+# Event loop lag monitor (lifespan)
+# -------------------------------------------------------------------
+_lag_task: Optional[asyncio.Task] = None
+
+
+async def _monitor_loop_lag(interval: float):
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - expected)
+        event_loop_lag.observe(lag)
+        event_loop_lag_last.set(lag)
+
+
+def start_metrics(loop_lag_interval: float = 0.5):
+    global _lag_task
+    if _lag_task is None:
+        _lag_task = asyncio.create_task(_monitor_loop_lag(loop_lag_interval))
+
+
+async def stop_metrics():
+    global _lag_task
+    if _lag_task is not None:
+        _lag_task.cancel()
+        await asyncio.gather(_lag_task, return_exceptions=True)
+        _lag_task = None
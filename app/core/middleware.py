@@ -1,17 +1,32 @@
-
 import time
 from fastapi import Request
 from app.core.logger import get_logger
+from app.core.metrics import http_request_duration, http_requests_in_flight
 
 logger = get_logger("request_logger")
 
+
+def route_template(request: Request) -> str:
+    # Set by the router once a route matched; the template keeps metric labels bounded
+    route = request.scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
 async def log_requests(request: Request, call_next):
     start_time = time.time()
-    logger.info(f"Started request {request.method} {request.url.path}")
-    response = await call_next(request)
-    duration = time.time() - start_time
+    logger.debug(f"Started request {request.method} {request.url.path}")
+    status = 500
+    try:
+        with http_requests_in_flight.track():
+            response = await call_next(request)
+        status = response.status_code
+    finally:
+        duration = time.time() - start_time
+        http_request_duration.observe(
+            duration, method=request.method, route=route_template(request), status=status
+        )
     logger.info(
         f"Completed request {request.method} {request.url.path} "
         f"with status={response.status_code} in {duration:.3f}s"
     )
-    return response
\ No newline at end of file
+    return response
@@ -0,0 +1,85 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+
+
+@dataclass
+class Stage:
+    name: str
+    func: Callable[..., Awaitable[Any]]
+    deps: tuple[str, ...] = ()
+    # Has side effects upstream (e.g. HubSpot creates); never cancelled once started
+    writes: bool = False
+
+
+class StagePipeline:
+    """
+    Small dependency-aware async executor.
+
+    Each stage is an async callable that receives the results of its
+    dependencies as keyword arguments. Every stage starts as soon as its
+    dependencies finish, so independent chains run concurrently and the
+    total latency is the longest chain rather than the sum of all stages.
+
+    When a stage fails, stages that have not started are cancelled, but
+    write stages already under way run to completion before the error is
+    re-raised, so a create that reached HubSpot is still recorded.
+    """
+
+    def __init__(self):
+        self.stages: dict[str, Stage] = {}
+        self.timings: dict[str, float] = {}
+
+    def stage(self, name: str, func: Callable[..., Awaitable[Any]], deps: tuple[str, ...] = (),
+              writes: bool = False):
+        # Dependencies must be registered first, which also rules out cycles.
+        missing = [d for d in deps if d not in self.stages]
+        if missing:
+            raise ValueError(f"Stage '{name}' depends on unknown stages: {missing}")
+        self.stages[name] = Stage(name, func, tuple(deps), writes)
+        return self
+
+    async def run(self) -> dict[str, Any]:
+        tasks: dict[str, asyncio.Task] = {}
+        started: set[str] = set()
+
+        async def run_stage(stage: Stage):
+            # Shielded: cancelling a waiting stage must not cancel its dependencies
+            inputs = {dep: await asyncio.shield(tasks[dep]) for dep in stage.deps}
+            started.add(stage.name)
+            start = time.perf_counter()
+            try:
+                return await stage.func(**inputs)
+            finally:
+                self.timings[stage.name] = round((time.perf_counter() - start) * 1000, 2)
+
+        for stage in self.stages.values():
+            tasks[stage.name] = asyncio.create_task(run_stage(stage))
+        if not tasks:
+            return {}
+
+        # asyncio.wait (unlike gather) never cancels the stages itself
+        try:
+            done, _ = await asyncio.wait(tasks.values(), return_when=asyncio.FIRST_EXCEPTION)
+        except asyncio.CancelledError:
+            await self._stop(tasks, started)
+            raise
+
+        failure = next((task.exception() for task in done if not task.cancelled() and task.exception()), None)
+        if failure is not None:
+            await self._stop(tasks, started)
+            raise failure
+
+        return {name: task.result() for name, task in tasks.items()}
+
+    async def _stop(self, tasks: dict[str, asyncio.Task], started: set[str]):
+        """Cancel the remaining stages except started write stages, and wait for all of them."""
+        for name, task in tasks.items():
+            if not (self.stages[name].writes and name in started):
+                task.cancel()
+        await asyncio.wait(tasks.values())
+
+    def server_timing(self) -> str:
+        """Render stage timings as a Server-Timing header value."""
+        return ", ".join(f"{name};dur={ms}" for name, ms in self.timings.items())
@@ -0,0 +1,85 @@
+import asyncio
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+
+class TokenBucket:
+    """`limit` requests per `period` seconds, refilled continuously."""
+
+    def __init__(self, limit: int, period: float = 1.0):
+        self.capacity = float(limit)
+        self.rate = limit / period
+        self.tokens = float(limit)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+
+class RateLimiter:
+    """
+    Client-side limiter over one or more token buckets (e.g. per-second and
+    per-10-second budgets). Callers queue in FIFO order and wait for a token
+    instead of failing; pause() backs everyone off after a 429.
+    """
+
+    def __init__(self, name: str, *buckets: TokenBucket):
+        self.name = name
+        self.buckets = buckets
+        self._lock = asyncio.Lock()
+        self._paused_until = 0.0
+        self.acquired = 0
+        self.throttled = 0
+
+    async def acquire(self):
+        async with self._lock:
+            waited = False
+            while True:
+                now = time.monotonic()
+                delay = max([self._paused_until - now] + [b.wait_time(now) for b in self.buckets])
+                if delay <= 0:
+                    break
+                waited = True
+                await asyncio.sleep(delay)
+
+            for bucket in self.buckets:
+                bucket.take()
+            self.acquired += 1
+            if waited:
+                self.throttled += 1
+
+    def pause(self, seconds: float):
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def stats(self) -> dict:
+        return {"name": self.name, "acquired": self.acquired, "throttled": self.throttled}
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 30.0) -> float:
+    """Exponential backoff with jitter: half fixed, half random."""
+    delay = min(cap, base * (2 ** attempt))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header (delta seconds or HTTP date)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
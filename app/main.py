@@ -3,8 +3,19 @@ from app.routes.hubspot_router import hub_router
 from app.routes.vin_router import vin_router
 from app.routes.location_router import location_router
 from app.routes.quote_router import quote_router
+from app.routes.metrics_router import metrics_router
 from contextlib import asynccontextmanager
-from app.core.logger import get_logger
+from app.core.logger import get_logger, start_logging, stop_logging
+from app.core.http_client import start_http_clients, close_http_clients
+from app.core.config import settings
+from app.core.jobs import start_job_workers, stop_job_workers
+from app.core.metrics import start_metrics, stop_metrics
+from app.services.distance_service import warm_geocode_cache, calibrate_road_factors
+from app.services.zip_database import load_zip_database, close_zip_database
+from app.services.route_history import load_route_history
+from app.services.pricing_service import load_pricing_model
+from app.services.company_directory import start_company_directory, stop_company_directory
+from app.services.hubspot_sync import start_hubspot_sync, stop_hubspot_sync
 from app.core.middleware import log_requests
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -13,12 +24,38 @@ logger = get_logger(__name__)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
 
+    start_logging(
+        level=settings.LOG_LEVEL,
+        levels=settings.LOG_LEVELS,
+        json_output=settings.LOG_JSON,
+        log_file=settings.LOG_FILE,
+        payload_sample_rate=settings.LOG_PAYLOAD_SAMPLE_RATE,
+    )
+    start_metrics(settings.METRICS_LOOP_LAG_INTERVAL)
+    await start_http_clients()
+    start_job_workers()
+    load_zip_database()
+    load_route_history()
+    load_pricing_model()
+    if settings.GEOCODE_WARMUP_FILE:
+        warm_geocode_cache(settings.GEOCODE_WARMUP_FILE)
+    if settings.DISTANCE_MODE != "exact":
+        calibrate_road_factors()
+    start_company_directory()
+    start_hubspot_sync()
     logger.info(" Application startup complete")
 
     yield  
 
 
     logger.info(" Application shutdown initiated")
+    await stop_company_directory()
+    await stop_hubspot_sync()
+    await stop_job_workers()
+    await close_http_clients()
+    close_zip_database()
+    await stop_metrics()
+    stop_logging()
 
 app = FastAPI(lifespan=lifespan)
 app.add_middleware(
@@ -45,4 +82,5 @@ async def health():
 app.include_router(hub_router)
 app.include_router(vin_router)
 app.include_router(location_router)
-app.include_router(quote_router)
\ No newline at end of file
+app.include_router(quote_router)
+app.include_router(metrics_router)
\ No newline at end of file
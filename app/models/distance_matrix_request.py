@@ -0,0 +1,7 @@
+from typing import List
+from pydantic import BaseModel, Field
+
+class DistanceMatrixRequest(BaseModel):
+    origins: List[str] = Field(..., min_length=1, description="Origin ZIP codes")
+    destinations: List[str] = Field(..., min_length=1, description="Destination ZIP codes")
+    use_truck_profile: bool = False
@@ -0,0 +1,8 @@
+from typing import List, Optional
+from pydantic import BaseModel
+
+class DistanceMatrixResponse(BaseModel):
+    origins: List[str]
+    destinations: List[str]
+    # miles[i][j] is origin i → destination j; None when no route was found
+    miles: List[List[Optional[float]]]
@@ -32,4 +32,17 @@ class QuoteRequest(BaseModel):
     pickup: Location
      # ISO format date
     delivery: Location
-     # ISO format date
\ No newline at end of file
+     # ISO format date
+
+class PriceLane(BaseModel):
+    distance_miles: float = Field(..., gt=0)
+    vehicles: Optional[int] = Field(None, ge=1)  # default: len(vehicle_types), else 1
+    vehicle_types: List[str] = []
+    pickup_date: Optional[str] = None  # ISO date, sets the season (default: today)
+    pickup_zip: Optional[str] = None   # with delivery_zip, blends in similar past orders
+    delivery_zip: Optional[str] = None
+
+
+class PriceLanesRequest(BaseModel):
+    lanes: List[PriceLane]
+    markups: List[float] = []  # markup percentages to sweep (default: PRICING_MARKUP_PERCENT)
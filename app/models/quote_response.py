@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional
 from pydantic import BaseModel
 
 class Vehicle(BaseModel):
@@ -13,14 +13,16 @@ class RouteHistory(BaseModel):
     destination: str
     distance_miles: float
     date: str
-    status: str  # Won or Lost
+    status: Optional[str] = None  # Won or Lost; orders history has no status, so unset there
     price: float
+    vehicles: int = 1  # on the order; price covers all of them
     company: str
 
 class QuoteResponse(BaseModel):
     origin: str
     destination: str
     distance_miles: float
+    distance_estimated: bool = False  # True when distance is a fast estimate pending refinement
     super_dispatch_price: float
     internal_ai_price: float
     quote_amount: float
@@ -32,4 +34,10 @@ class QuoteResponse(BaseModel):
     # ➕ add these three
     company_id: str | None = None
     contact_id: str | None = None
-    deal_id: str | None = None
\ No newline at end of file
+    deal_id: str | None = None
+
+class PriceLanesResponse(BaseModel):
+    markups: List[float]
+    market_prices: List[float]  # model price per lane
+    prices: List[float]         # blended with lane history
+    quotes: List[List[float]]   # per lane, one quote amount per markup
@@ -1,5 +1,5 @@
 from pydantic import BaseModel,Field
-from typing import Optional
+from typing import List, Optional
 
 class CompanySearchRequest(BaseModel):
     
@@ -16,4 +16,7 @@ class LocationRequest(BaseModel):
     zipcode: str
     
 class DecodeVinRequest(BaseModel):
-    vin: str = Field(..., description="17-character Vehicle Identification Number to decode")
\ No newline at end of file
+    vin: str = Field(..., description="17-character Vehicle Identification Number to decode")
+
+class DecodeVinBatchRequest(BaseModel):
+    vins: List[str] = Field(..., min_length=1, max_length=500, description="VINs to decode")
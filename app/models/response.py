@@ -35,4 +35,15 @@ class DecodeVinResponse(BaseModel):
     year: Optional[int]
     make: Optional[str]
     model: Optional[str]
-    type: Optional[str] = "Unknown"
\ No newline at end of file
+    type: Optional[str] = "Unknown"
+
+class DecodeVinBatchItem(BaseModel):
+    vin: str
+    ok: bool
+    vehicle: Optional[DecodeVinResponse] = None
+    status_code: Optional[int] = None
+    error: Optional[str] = None
+
+class DecodeVinBatchResponse(BaseModel):
+    count: int
+    results: List[DecodeVinBatchItem]
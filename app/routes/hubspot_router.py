@@ -1,6 +1,11 @@
-from fastapi import APIRouter, Query
+import json
+from fastapi import APIRouter, HTTPException, Query, Request
 from app.models.response import CompanyListResponse, CompanyDetailsResponse, MessageResponse, CompanyResponse
 from app.services.hubspot_service import get_all_companies, get_company_details
+from app.services.company_directory import company_directory
+from app.services.hubspot_replica import verify_webhook
+from app.services.hubspot_sync import enqueue_webhook_events, get_hubspot_sync_stats
+from app.core.config import settings
 from app.core.logger import get_logger
 
 from typing import cast
@@ -10,11 +15,20 @@ logger = get_logger("hubspot_router")
 
 
 @hub_router.get("/companies", response_model=CompanyListResponse)
-async def list_companies(limit: int = Query(100, ge=1, le=100), start_chars: str = Query(None, min_length=1)):
+async def list_companies(
+    limit: int = Query(100, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    start_chars: str = Query(None, min_length=1),
+):
     """
-    Returns a list of companies from HubSpot.
+    Returns companies whose name starts with `start_chars` (case-insensitive).
+    Served from the local company directory once it has synced; until then
+    it pages through HubSpot directly.
     """
-    companies = await get_all_companies(100, start_chars=start_chars)
+    if company_directory.ready:
+        companies = company_directory.search_prefix(start_chars, limit=limit, offset=offset)
+    else:
+        companies = await get_all_companies(limit, start_chars=start_chars, offset=offset)
     return CompanyListResponse(count=len(companies), companies=companies)
 
 
@@ -45,4 +59,45 @@ async def company_details(company_name: str):
         state=props.get("state"),
         zip_code=props.get("zip"),
         country=props.get("country"),
-    )
\ No newline at end of file
+    )
+
+
+@hub_router.post("/webhook", include_in_schema=False)
+async def hubspot_webhook(request: Request):
+    """
+    HubSpot webhook receiver. Verifies the v3 signature, queues the events for
+    the replica sync worker and acknowledges right away (HubSpot retries slow
+    or failed deliveries).
+    """
+    if not settings.HUBSPOT_WEBHOOK_SECRET:
+        raise HTTPException(status_code=503, detail="Webhook secret not configured")
+
+    body = await request.body()
+    uri = settings.HUBSPOT_WEBHOOK_URL or str(request.url)
+    if not verify_webhook(
+        settings.HUBSPOT_WEBHOOK_SECRET,
+        request.method,
+        uri,
+        body,
+        request.headers.get("X-HubSpot-Request-Timestamp"),
+        request.headers.get("X-HubSpot-Signature-v3"),
+        settings.HUBSPOT_WEBHOOK_MAX_AGE,
+    ):
+        logger.warning("Rejected HubSpot webhook with invalid or stale signature")
+        raise HTTPException(status_code=401, detail="Invalid signature")
+
+    try:
+        events = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON body")
+    if isinstance(events, dict):
+        events = [events]
+
+    accepted = enqueue_webhook_events(events)
+    return {"received": len(events), "accepted": accepted}
+
+
+@hub_router.get("/replica/stats", include_in_schema=False)
+async def replica_stats():
+    """Replica row counts, pending events and sync lag."""
+    return get_hubspot_sync_stats()
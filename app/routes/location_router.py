@@ -1,8 +1,9 @@
 from fastapi import APIRouter, HTTPException
-import httpx
 from app.core.config import settings
+from app.core.http_client import get_http_client, upstream_call
 from app.models.response import LocationResponse
 from app.core.logger import get_logger
+from app.services.zip_database import lookup_zip
 
 location_router = APIRouter(prefix="/location", tags=["Location"])
 
@@ -15,12 +16,16 @@ logger = get_logger(__name__)
 async def get_location(zipcode: str):
     """
     Return city and state for a given ZIP code.
+    Served from the offline ZIP database when available, Zippopotam otherwise.
     """
-    url = f"{ZIPPO_BASE_URL}/{zipcode}"
+    local = lookup_zip(zipcode)
+    if local is not None:
+        return LocationResponse(**local)
+
     logger.info(f"Fetching location data for ZIP code: {zipcode}")
 
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url)
+    async with upstream_call("zippo", "lookup"):
+        response = await get_http_client("zippo").get(f"/{zipcode}")
 
     if response.status_code != 200:
         raise HTTPException(status_code=404, detail="Invalid or unknown ZIP code")
@@ -0,0 +1,95 @@
+from fastapi import APIRouter, Response
+from app.core.jobs import get_job_stats
+from app.core.metrics import register_collector, render_metrics
+from app.services.company_directory import company_directory
+from app.services.distance_service import get_geocode_cache_stats, get_route_cache_stats
+from app.services.email_service import get_email_cache_stats
+from app.services.hubspot_service import get_company_cache_stats, get_contact_cache_stats, get_hubspot_rate_stats
+from app.services.hubspot_sync import get_hubspot_sync_stats
+from app.services.implicit_company_service import get_enrichment_stats
+from app.services.vin_service import get_vin_cache_stats
+
+metrics_router = APIRouter(tags=["Metrics"])
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Cache name -> stats() of a TieredCache or TTLCache
+CACHES = {
+    "geocode": get_geocode_cache_stats,
+    "routes": get_route_cache_stats,
+    "companies": lambda: get_company_cache_stats()["companies"],
+    "company_details": lambda: get_company_cache_stats()["details"],
+    "contacts": get_contact_cache_stats,
+    "enrichment": lambda: get_enrichment_stats()["cache"],
+    "vin": lambda: get_vin_cache_stats()["cache"],
+    "email": lambda: get_email_cache_stats()["cache"],
+}
+
+# Component name -> stats dict; numeric values become app_component_stat samples
+COMPONENTS = {
+    "jobs": get_job_stats,
+    "hubspot_sync": get_hubspot_sync_stats,
+    "hubspot_rate": get_hubspot_rate_stats,
+    "company_directory": company_directory.stats,
+    "enrichment": get_enrichment_stats,
+    "vin": get_vin_cache_stats,
+    "email": get_email_cache_stats,
+}
+
+
+def _collect_caches():
+    hits, misses, ratio, size = [], [], [], []
+    for name, stats_fn in CACHES.items():
+        stats = stats_fn()
+        labels = {"cache": name}
+        # TieredCache splits hits into memory and disk
+        hits.append((labels, stats.get("hits", stats.get("memory_hits", 0) + stats.get("disk_hits", 0))))
+        misses.append((labels, stats["misses"]))
+        ratio.append((labels, stats["hit_ratio"]))
+        size.append((labels, stats.get("size", stats.get("memory_size", 0))))
+    yield "cache_hits_total", "counter", "Cache lookups served from memory or disk.", hits
+    yield "cache_misses_total", "counter", "Cache lookups that had to load.", misses
+    yield "cache_hit_ratio", "gauge", "Hits / lookups since start.", ratio
+    yield "cache_entries", "gauge", "Entries held in memory.", size
+
+
+def _flatten(prefix: str, value):
+    if isinstance(value, bool):
+        yield prefix, int(value)
+    elif isinstance(value, (int, float)):
+        yield prefix, value
+    elif isinstance(value, dict):
+        for key, inner in value.items():
+            # Cache sub-dicts are exported as cache_* above
+            if key != "cache":
+                yield from _flatten(f"{prefix}.{key}" if prefix else key, inner)
+
+
+def _collect_components():
+    samples = []
+    for component, stats_fn in COMPONENTS.items():
+        for stat, value in _flatten("", stats_fn()):
+            samples.append(({"component": component, "stat": stat}, value))
+    yield "app_component_stat", "gauge", "Counters and gauges reported by app components.", samples
+
+
+def _collect_rate_limiters():
+    # Component stats skip lists, so the HubSpot limiters are exported here
+    acquired, throttled = [], []
+    for limiter in get_hubspot_rate_stats()["limiters"]:
+        labels = {"limiter": limiter["name"]}
+        acquired.append((labels, limiter["acquired"]))
+        throttled.append((labels, limiter["throttled"]))
+    yield "hubspot_rate_limiter_acquired_total", "counter", "Tokens handed out by each HubSpot rate limiter.", acquired
+    yield "hubspot_rate_limiter_throttled_total", "counter", "Acquires that had to wait for a token.", throttled
+
+
+register_collector(_collect_caches)
+register_collector(_collect_components)
+register_collector(_collect_rate_limiters)
+
+
+@metrics_router.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus text exposition of request, upstream, cache and loop metrics."""
+    return Response(render_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
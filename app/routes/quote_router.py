@@ -1,118 +1,136 @@
 import asyncio
-from fastapi import APIRouter, HTTPException
-from app.models.quote_request import QuoteRequest
-from app.models.quote_response import QuoteResponse, RouteHistory
+import json
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from app.core.config import settings
+from app.models.quote_request import PriceLanesRequest, QuoteRequest
+from app.models.quote_response import PriceLanesResponse, QuoteResponse
 from app.models.email_request import EmailRequest
 from app.models.email_response import EmailResponse
-from app.services.distance_service import get_distance_miles
+from app.services.distance_service import get_distance_matrix
 from app.core.logger import get_logger
-from app.services.hubspot_service import create_transport_deal,get_or_create_company
-from app.services.email_service import generate_email
+from app.services.email_service import generate_email, stream_email
 from app.models.quote_email_request import QuoteEmailRequest
+from app.models.distance_matrix_request import DistanceMatrixRequest
+from app.models.distance_matrix_response import DistanceMatrixResponse
 from app.services.hubspot_service import send_quote_email
-import random
-
-from app.services.implicit_company_service import enrich_company_data
+from app.services.pricing_service import apply_markups, price_lanes
+from app.services.quote_service import QuoteBatch, build_quote
+from app.services.route_history import find_similar_routes
 
 quote_router = APIRouter(prefix="/quote", tags=["Quote"])
 
 logger = get_logger(__name__)
 
 @quote_router.post("/generate", response_model=QuoteResponse)
-async def generate_quote(payload: QuoteRequest):
-    
-    deal_data = {
-        "company_name": getattr(payload, "company_name", "").strip() or "Individual Customer",
-        "contact_name": payload.contact_name,
-        "email": payload.email,
-        "phone": payload.phone,
-        "vehicles": [v.dict() for v in payload.vehicles],
-        "pickup": payload.pickup.dict(),
-        "delivery": payload.delivery.dict(),
-        # "billing_address": getattr(payload, "billing_address", None)
-    }
-
-    company_name = deal_data.get("company_name")
-    phone = deal_data.get("phone")
-    
-    address = {
-    "address_line1": payload.address_line1,
-    "address_line2": payload.address_line2,
-    "city": payload.city,
-    "state": payload.state,
-    "zip_code": payload.zip_code,
-    "country": payload.country,
-}
-
-    # ✅ ensure company exists and attach ID
-    company = await get_or_create_company(company_name, phone, address)
-    company_id = company["id"]
-    asyncio.create_task(enrich_company_data(company_id, company_name))
-    logger.info(f"Started enrichment task for company {company_name}")
-    deal_data["company_id"] = company_id  # ✅ pass company id forward
-
-    logger.info("Calling transport deal creation in HubSpot")
-
-    hubspot_response = await create_transport_deal(deal_data)
-    ...
-    logger.info(f"HubSpot deal created: {hubspot_response}")
-
-    logger.info(f"calling distance service for {payload.pickup.zip} to {payload.delivery.zip}")
+async def generate_quote(payload: QuoteRequest, response: Response):
+    quote, pipeline = await build_quote(payload)
+    response.headers["Server-Timing"] = pipeline.server_timing()
+    return quote
+
+
+@quote_router.post("/generate/bulk")
+async def generate_quotes_bulk(request: Request):
+    """
+    Generate many quotes in one call.
+
+    Body is a JSON array of QuoteRequest objects, or NDJSON (one per line)
+    with Content-Type application/x-ndjson. Quotes run with bounded
+    concurrency and share company/contact work across the batch; each
+    result is streamed back as an NDJSON line as soon as it completes:
+      {"index": 0, "ok": true, "quote": {...}}
+      {"index": 1, "ok": false, "status_code": 422, "error": "..."}
+    """
+    raw = await request.body()
     try:
-        # Step 1: Calculate distance
-        distance_miles = await get_distance_miles(
-            payload.pickup.zip, payload.delivery.zip
-        )
-        # distance_miles=round(random.uniform(500, 3000), 2)  # Dummy distance for testing
-
-        # Step 2: Dummy Super Dispatch and Internal AI Prices
-        super_dispatch_price = round(distance_miles * 1.0, 2)  # $1/mi dummy logic
-        internal_ai_price = round(super_dispatch_price * random.uniform(0.95, 1.05), 2)
-        markup_percentage = 12
-        quote_amount = round(super_dispatch_price * (1 + markup_percentage / 100), 2)
-
-        # Step 3: Dummy Similar Route History
-        route_history = [
-            RouteHistory(
-                origin="Hayward, CA",
-                destination="Arlington, VA",
-                distance_miles=2845.1,
-                date="2024-08-15",
-                status="Won",
-                price=3200,
-                company="Reed Auto Group"
-            ),
-            RouteHistory(
-                origin="San Francisco, CA",
-                destination="Aldie, VA",
-                distance_miles=2887.3,
-                date="2024-07-22",
-                status="Lost",
-                price=3050,
-                company="America’s Auto Auction"
-            )
-        ]
-
-        # Step 4: Return response
-        return QuoteResponse(
-             origin=f"{payload.pickup.city}, {payload.pickup.state}, {payload.pickup.zip}",
-             destination=f"{payload.delivery.city}, {payload.delivery.state}, {payload.delivery.zip}",
-             distance_miles=distance_miles,
-             super_dispatch_price=super_dispatch_price,
-             internal_ai_price=internal_ai_price,
-             markup_percentage=markup_percentage,
-             quote_amount=quote_amount,
-             route_history=route_history,
-             # ➕ include IDs from HubSpot
-             vehicles=[v.dict() for v in payload.vehicles],
-             company_id=hubspot_response.get("company_id"),
-             contact_id=hubspot_response.get("contact_id"),
-             deal_id=hubspot_response.get("deal_id")
-         )
-
+        if "ndjson" in request.headers.get("content-type", ""):
+            items = [json.loads(line) for line in raw.decode("utf-8").splitlines() if line.strip()]
+        else:
+            items = json.loads(raw or b"[]")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid request body: {e}")
+
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Expected a JSON array or NDJSON lines of quote requests")
+    if len(items) > settings.BULK_QUOTE_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {settings.BULK_QUOTE_MAX_ITEMS} quotes per request")
+
+    logger.info(f"Bulk quote request with {len(items)} items")
+    batch = QuoteBatch()
+    limiter = asyncio.Semaphore(settings.BULK_QUOTE_CONCURRENCY)
+
+    async def run_one(index: int, item) -> dict:
+        try:
+            payload = QuoteRequest(**item)
+        except (ValidationError, TypeError) as e:
+            return {"index": index, "ok": False, "status_code": 422, "error": str(e)}
+
+        async with limiter:
+            try:
+                quote, _ = await build_quote(payload, batch=batch)
+                return {"index": index, "ok": True, "quote": quote.dict()}
+            except HTTPException as e:
+                return {"index": index, "ok": False, "status_code": e.status_code, "error": str(e.detail)}
+            except Exception as e:
+                logger.exception(f"Bulk quote item {index} failed")
+                return {"index": index, "ok": False, "status_code": 500, "error": str(e)}
+
+    async def stream():
+        tasks = [asyncio.create_task(run_one(i, item)) for i, item in enumerate(items)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield json.dumps(await next_done) + "\n"
+        finally:
+            # Client went away: stop the remaining quotes and the work they shared
+            for task in tasks:
+                task.cancel()
+            batch.cancel()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@quote_router.post("/price", response_model=PriceLanesResponse)
+async def price_lanes_route(payload: PriceLanesRequest):
+    """
+    Price many lanes in one call, without creating HubSpot records. Lanes
+    with pickup/delivery ZIPs are blended with similar past orders; every
+    price is quoted at each requested markup (what-if sweeps).
+    """
+    if len(payload.lanes) > settings.PRICING_MAX_LANES:
+        raise HTTPException(status_code=413, detail=f"At most {settings.PRICING_MAX_LANES} lanes per request")
+
+    async def lane_history(lane):
+        if not (lane.pickup_zip and lane.delivery_zip):
+            return []
+        return await find_similar_routes(lane.pickup_zip, lane.delivery_zip, lane.distance_miles)
+
+    histories = await asyncio.gather(*(lane_history(lane) for lane in payload.lanes))
+    priced = price_lanes([{**lane.dict(), "history": history} for lane, history in zip(payload.lanes, histories)])
+
+    markups = payload.markups or [settings.PRICING_MARKUP_PERCENT]
+    prices = [p["price"] for p in priced]
+    return PriceLanesResponse(
+        markups=markups,
+        market_prices=[p["market_price"] for p in priced],
+        prices=prices,
+        quotes=apply_markups(prices, markups),
+    )
+
+
+@quote_router.post("/distance-matrix", response_model=DistanceMatrixResponse)
+async def distance_matrix(payload: DistanceMatrixRequest):
+    """
+    Road miles for every origin × destination ZIP pair in one call.
+    """
+    logger.info(f"Distance matrix for {len(payload.origins)} origins × {len(payload.destinations)} destinations")
+    try:
+        miles = await get_distance_matrix(payload.origins, payload.destinations, payload.use_truck_profile)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    return DistanceMatrixResponse(origins=payload.origins, destinations=payload.destinations, miles=miles)
+
 @quote_router.post("/generate-email", response_model=EmailResponse)
 async def generate(payload: EmailRequest):
     
@@ -128,6 +146,25 @@ async def generate(payload: EmailRequest):
     # logger.info(f"Final email subject:{body} {subject}")
     return EmailResponse(subject=subject, body=body)
 
+@quote_router.post("/generate-email/stream")
+async def generate_email_stream(payload: EmailRequest):
+    """
+    Same as /generate-email, but streams the email as Server-Sent Events while
+    the agent writes it:
+      event: subject / body   data: {"delta": "..."}
+      event: done             data: {"subject": "...", "body": "...", ...}
+      event: error            data: {"detail": "..."}
+    """
+    async def events():
+        async for event, data in stream_email(payload):
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @quote_router.post("/send-quote-email")
 async def send_quote_email_route(payload: QuoteEmailRequest):
     logger.info(f"Sending quote email for deal {payload.deal_id}")
@@ -0,0 +1,187 @@
+import asyncio
+import bisect
+import time
+from datetime import datetime
+from app.core.config import settings
+from app.core.logger import get_logger
+from app.models.response import CompanyResponse
+from app.services.hubspot_service import hubspot_request
+
+logger = get_logger(__name__)
+
+PAGE_SIZE = 100
+# HubSpot search can't page past 10,000 results; beyond that we do a full sync
+SEARCH_RESULT_CAP = 10_000
+
+
+class CompanyDirectory:
+    """
+    Local copy of every HubSpot company name, kept in a sorted array of
+    case-folded names so prefix (typeahead) lookups are a binary search.
+    """
+
+    def __init__(self):
+        self._names: dict[str, str] = {}           # id -> name
+        self._index: list[tuple[str, str, str]] = []  # (folded name, name, id), sorted
+        self.last_modified_ms = 0                  # newest hs_lastmodifieddate seen
+        self.last_full_sync = 0.0
+        self.last_sync = 0.0
+        self.ready = False
+
+    def __len__(self):
+        return len(self._names)
+
+    def _rebuild(self):
+        self._index = sorted((name.casefold(), name, cid) for cid, name in self._names.items())
+
+    def _apply(self, companies: list[dict]) -> int:
+        changed = 0
+        for company in companies:
+            props = company.get("properties", {})
+            name = props.get("name")
+            cid = company.get("id")
+            modified = props.get("hs_lastmodifieddate")
+            if modified:
+                self.last_modified_ms = max(self.last_modified_ms, _to_ms(modified))
+            if not cid:
+                continue
+            if not name:
+                changed += self._names.pop(cid, None) is not None
+            elif self._names.get(cid) != name:
+                self._names[cid] = name
+                changed += 1
+        return changed
+
+    def upsert(self, companies: list[dict]):
+        """Apply changed company records (e.g. from webhooks) without waiting for the next sync."""
+        if self._apply(companies):
+            self._rebuild()
+
+    def remove(self, company_ids: list[str]):
+        if any([self._names.pop(cid, None) for cid in company_ids]):
+            self._rebuild()
+
+    def search_prefix(self, start_chars: str = None, limit: int = 100, offset: int = 0) -> list[CompanyResponse]:
+        if not start_chars:
+            window = self._index[offset:offset + limit]
+        else:
+            prefix = start_chars.casefold()
+            i = bisect.bisect_left(self._index, (prefix,)) + offset
+            window = []
+            while i < len(self._index) and len(window) < limit and self._index[i][0].startswith(prefix):
+                window.append(self._index[i])
+                i += 1
+        return [CompanyResponse(id=cid, name=name) for _, name, cid in window]
+
+    async def full_sync(self):
+        """Page through every company (GET /crm/v3/objects/companies, following `after`)."""
+        names, after, newest = {}, None, 0
+        while True:
+            params = {"limit": PAGE_SIZE, "properties": "name,hs_lastmodifieddate", "archived": "false"}
+            if after:
+                params["after"] = after
+            data = await hubspot_request("GET", "/crm/v3/objects/companies", params=params)
+            for company in data.get("results", []):
+                props = company.get("properties", {})
+                if props.get("hs_lastmodifieddate"):
+                    newest = max(newest, _to_ms(props["hs_lastmodifieddate"]))
+                if props.get("name"):
+                    names[company["id"]] = props["name"]
+            after = data.get("paging", {}).get("next", {}).get("after")
+            if not after:
+                break
+
+        # Swap in the new snapshot at once so readers never see a partial list
+        self._names = names
+        self.last_modified_ms = newest
+        self._rebuild()
+        self.ready = True
+        self.last_full_sync = self.last_sync = time.time()
+        logger.info(f"Company directory full sync: {len(names)} companies")
+
+    async def incremental_sync(self):
+        """Fetch only companies modified since the newest change we've seen."""
+        updates, after = [], None
+        while True:
+            payload = {
+                "filterGroups": [{
+                    "filters": [{
+                        "propertyName": "hs_lastmodifieddate",
+                        "operator": "GTE",
+                        "value": str(self.last_modified_ms),
+                    }]
+                }],
+                "sorts": [{"propertyName": "hs_lastmodifieddate", "direction": "ASCENDING"}],
+                "properties": ["name", "hs_lastmodifieddate"],
+                "limit": PAGE_SIZE,
+            }
+            if after:
+                payload["after"] = after
+            data = await hubspot_request("POST", "/crm/v3/objects/companies/search", json=payload)
+            updates.extend(data.get("results", []))
+            after = data.get("paging", {}).get("next", {}).get("after")
+            if not after or int(after) >= SEARCH_RESULT_CAP:
+                break
+
+        if len(updates) >= SEARCH_RESULT_CAP:
+            await self.full_sync()
+            return
+
+        if self._apply(updates):
+            self._rebuild()
+        self.last_sync = time.time()
+        logger.info(f"Company directory incremental sync: {len(updates)} changed")
+
+    def stats(self) -> dict:
+        return {
+            "companies": len(self._names),
+            "ready": self.ready,
+            "last_sync_age_s": round(time.time() - self.last_sync, 1) if self.last_sync else None,
+        }
+
+
+def _to_ms(value: str) -> int:
+    """hs_lastmodifieddate comes back as ISO-8601 (or epoch ms in some payloads)."""
+    if value.isdigit():
+        return int(value)
+    return int(datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp() * 1000)
+
+
+# -------------------------------------------------------------------
+# App-level directory and its background sync loop (started in lifespan)
+# -------------------------------------------------------------------
+company_directory = CompanyDirectory()
+_sync_task: asyncio.Task | None = None
+
+
+async def _sync_loop():
+    while True:
+        try:
+            due_full = time.time() - company_directory.last_full_sync >= settings.COMPANY_DIRECTORY_FULL_SYNC_SECONDS
+            if not company_directory.ready or due_full:
+                # Full syncs also drop companies deleted in HubSpot
+                await company_directory.full_sync()
+            else:
+                await company_directory.incremental_sync()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.exception(f"Company directory sync failed: {e}")
+        await asyncio.sleep(settings.COMPANY_DIRECTORY_REFRESH_SECONDS)
+
+
+def start_company_directory():
+    global _sync_task
+    if settings.COMPANY_DIRECTORY_ENABLED and _sync_task is None:
+        _sync_task = asyncio.create_task(_sync_loop())
+
+
+async def stop_company_directory():
+    global _sync_task
+    if _sync_task is not None:
+        _sync_task.cancel()
+        try:
+            await _sync_task
+        except asyncio.CancelledError:
+            pass
+        _sync_task = None
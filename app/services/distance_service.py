@@ -1,14 +1,142 @@
-import httpx
+import asyncio
+import csv
+import math
+import statistics
+from pathlib import Path
+from app.core.cache import SQLiteStore, TieredCache
 from app.core.config import settings
+from app.core.http_client import get_http_client, upstream_call
+from app.core.logger import get_logger
+from app.services.zip_database import lookup_zip_coordinates
+
+logger = get_logger(__name__)
+
+ORS_TIMEOUT = 10
+GEOCODE_URL = "https://api.openrouteservice.org/geocode/search"
+
+EARTH_RADIUS_MILES = 3958.8
+DISTANCE_MODES = ("exact", "estimate", "estimate_then_refine")
+MIN_CALIBRATION_SAMPLES = 5
+
+# ZIP → [lat, lon]; ZIP centroids never change, so entries don't expire.
+geocode_cache = TieredCache("geocode", maxsize=settings.GEOCODE_CACHE_SIZE)
+
+# (origin ZIP, destination ZIP, profile) → road miles
+route_cache = TieredCache("routes", maxsize=settings.ROUTE_CACHE_SIZE, ttl=settings.ROUTE_CACHE_TTL)
+
+# Road factor (road miles / great-circle miles) per origin region, fitted by
+# calibrate_road_factors(). Regions are the first digit of the origin ZIP.
+road_factor_store = SQLiteStore("road_factors")
+road_factors: dict[str, float] = dict(road_factor_store.items())
+
+# Keep references to refinement tasks so they aren't garbage-collected
+_background_tasks: set[asyncio.Task] = set()
+
+
+def normalize_zip(zipcode: str) -> str:
+    """Reduce '02134-1234', ' 2134 ' etc. to the 5-digit ZIP used as cache key."""
+    digits = str(zipcode).strip().split("-")[0]
+    if digits.isdigit() and len(digits) <= 5:
+        return digits.zfill(5)
+    return digits[:5]
+
+
+async def _ors_geocode(zipcode: str) -> list[float]:
+    """Look up a ZIP code and return [latitude, longitude] using ORS geocoding."""
+    ORS_KEY = settings.OPENROUTESERVICE_API_KEY
+    try:
+        async with upstream_call("ors", "geocode"):
+            response = await get_http_client("ors").get(
+                GEOCODE_URL,
+                params={
+                    "api_key": ORS_KEY,
+                    "text": zipcode,
+                    "boundary.country": "US",
+                },
+                timeout=ORS_TIMEOUT,
+            )
+        response.raise_for_status()
+        data = response.json()
+    except Exception as e:
+        raise ValueError(f"Error geocoding ZIP {zipcode}: {e}")
+
+    features = data.get("features", [])
+    if not features:
+        raise ValueError(f"Geocode failed for ZIP {zipcode}")
+
+    lon, lat = features[0]["geometry"]["coordinates"]
+    return [lat, lon]
+
+
+async def geocode_zip(zipcode: str) -> tuple[float, float]:
+    """
+    Return (latitude, longitude) for a ZIP code.
+    Served from the offline ZIP database, then the geocode cache;
+    concurrent misses share one ORS lookup.
+    """
+    key = normalize_zip(zipcode)
+    local = lookup_zip_coordinates(key)
+    if local is not None:
+        return local
+
+    lat, lon = await geocode_cache.get_or_load(key, lambda: _ors_geocode(key))
+    return lat, lon
+
+
+def warm_geocode_cache(path: str) -> int:
+    """Preload ZIP coordinates from a CSV file with zip,lat,lon columns."""
+    file = Path(path)
+    if not file.exists():
+        logger.warning(f"Geocode warm-up file not found: {file}")
+        return 0
+
+    with file.open(newline="", encoding="utf-8") as f:
+        rows = [
+            (normalize_zip(row["zip"]), [float(row["lat"]), float(row["lon"])])
+            for row in csv.DictReader(f)
+            if row.get("zip") and row.get("lat") and row.get("lon")
+        ]
+
+    geocode_cache.set_many(rows)
+    logger.info(f"Geocode cache warmed with {len(rows)} ZIPs from {file}")
+    return len(rows)
+
+
+def get_geocode_cache_stats() -> dict:
+    return geocode_cache.stats()
+
+
+def route_key(zip_from: str, zip_to: str, use_truck_profile: bool = False) -> str:
+    """Cache key for a lane: normalized ZIPs plus routing profile."""
+    a, b = normalize_zip(zip_from), normalize_zip(zip_to)
+    if settings.ROUTE_CACHE_SYMMETRIC and b < a:
+        a, b = b, a
+    profile = "driving-hgv" if use_truck_profile else "driving-car"
+    return f"{a}:{b}:{profile}"
+
+
+def get_route_cache_stats() -> dict:
+    return route_cache.stats()
 
 
 async def get_distance_miles(zip_from: str, zip_to: str, use_truck_profile: bool = False) -> float:
     """
     Calculate driving distance (in miles) between two U.S. ZIP codes
     using OpenRouteService.
-    
+
+    Repeat lanes are answered from the route cache; concurrent requests for
+    the same uncached lane share one ORS directions call.
+    """
+    key = route_key(zip_from, zip_to, use_truck_profile)
+    return await route_cache.get_or_load(
+        key, lambda: _ors_route_miles(zip_from, zip_to, use_truck_profile)
+    )
+
+
+async def _ors_route_miles(zip_from: str, zip_to: str, use_truck_profile: bool = False) -> float:
+    """
     Steps:
-      1. Convert both ZIP codes to coordinates via ORS /geocode/search.
+      1. Convert both ZIP codes to coordinates (geocode cache, ORS /geocode/search on miss).
       2. Request /v2/directions/ driving-car OR driving-hgv for the route.
          - driving-hgv is a truck routing profile.
     """
@@ -19,55 +147,33 @@ async def get_distance_miles(zip_from: str, zip_to: str, use_truck_profile: bool
     # Select routing profile
     profile = "driving-hgv" if use_truck_profile else "driving-car"
     directions_url = f"https://api.openrouteservice.org/v2/directions/{profile}"
-    geocode_url = "https://api.openrouteservice.org/geocode/search"
-
-    async with httpx.AsyncClient(timeout=10) as client:
-
-        async def geocode(zipcode: str) -> tuple[float, float]:
-            """Look up a ZIP code and return (latitude, longitude) using ORS geocoding."""
-            try:
-                response = await client.get(
-                    geocode_url,
-                    params={
-                        "api_key": ORS_KEY,
-                        "text": zipcode,
-                        "boundary.country": "US",
-                    },
-                )
-                response.raise_for_status()
-                data = response.json()
-            except Exception as e:
-                raise ValueError(f"Error geocoding ZIP {zipcode}: {e}")
-
-            features = data.get("features", [])
-            if not features:
-                raise ValueError(f"Geocode failed for ZIP {zipcode}")
-
-            lon, lat = features[0]["geometry"]["coordinates"]
-            return lat, lon
-
-        # Step 1: Get coordinates for both ZIPs
-        from_lat, from_lon = await geocode(zip_from)
-        to_lat, to_lon = await geocode(zip_to)
-
-        # Step 2: Calculate driving or truck distance
-        payload = {
-            "coordinates": [[from_lon, from_lat], [to_lon, to_lat]],
-            "radiuses": [5000, 5000],  # 🔹 increase search radius to 5 km on each end
-            "options": {
-                "profile_params": {
-                    "restrictions": {
-                        "vehicle_type": "truck",
-                        "width": 2.6,
-                        "height": 4.0,
-                        "length": 12.0,
-                        "weight": 40.0
-                    }
+
+    client = get_http_client("ors")
+
+    # Step 1: Get coordinates for both ZIPs (independent lookups, run together)
+    (from_lat, from_lon), (to_lat, to_lon) = await asyncio.gather(
+        geocode_zip(zip_from), geocode_zip(zip_to)
+    )
+
+    # Step 2: Calculate driving or truck distance
+    payload = {
+        "coordinates": [[from_lon, from_lat], [to_lon, to_lat]],
+        "radiuses": [5000, 5000],  # 🔹 increase search radius to 5 km on each end
+        "options": {
+            "profile_params": {
+                "restrictions": {
+                    "vehicle_type": "truck",
+                    "width": 2.6,
+                    "height": 4.0,
+                    "length": 12.0,
+                    "weight": 40.0
                 }
-            } if use_truck_profile else {}
-        }
+            }
+        } if use_truck_profile else {}
+    }
 
-        try:
+    try:
+        async with upstream_call("ors", "directions"):
             route_res = await client.post(
                 directions_url,
                 headers={
@@ -75,19 +181,222 @@ async def get_distance_miles(zip_from: str, zip_to: str, use_truck_profile: bool
                     "Content-Type": "application/json",
                 },
                 json=payload,
+                timeout=ORS_TIMEOUT,
+            )
+        route_res.raise_for_status()
+        route_data = route_res.json()
+    except Exception as e:
+        raise ValueError(f"OpenRouteService API error: {e}")
+
+    # Validate response
+    routes = route_data.get("routes")
+    if not routes:
+        raise ValueError(f"OpenRouteService error: {route_data}")
+
+    # Extract distance and convert to miles
+    meters = routes[0]["summary"]["distance"]
+    miles = round(meters / 1609.34, 2)
+
+    return miles
+
+
+# -------------------------------------------------------------------
+# Batch distances: N origins × M destinations via ORS /v2/matrix
+# -------------------------------------------------------------------
+async def _ors_matrix_miles(profile: str, origins: list, destinations: list) -> list[list]:
+    """One ORS matrix call for a chunk of (zip, (lat, lon)) origins and destinations."""
+    locations = [[lon, lat] for _, (lat, lon) in origins + destinations]
+    payload = {
+        "locations": locations,
+        "sources": list(range(len(origins))),
+        "destinations": list(range(len(origins), len(locations))),
+        "metrics": ["distance"],
+        "units": "mi",
+    }
+    try:
+        async with upstream_call("ors", "matrix"):
+            res = await get_http_client("ors").post(
+                f"https://api.openrouteservice.org/v2/matrix/{profile}",
+                headers={
+                    "Authorization": settings.OPENROUTESERVICE_API_KEY,
+                    "Content-Type": "application/json",
+                },
+                json=payload,
+                timeout=ORS_TIMEOUT,
             )
-            route_res.raise_for_status()
-            route_data = route_res.json()
+        res.raise_for_status()
+        data = res.json()
+    except Exception as e:
+        raise ValueError(f"OpenRouteService matrix API error: {e}")
+
+    distances = data.get("distances")
+    if distances is None:
+        raise ValueError(f"OpenRouteService matrix error: {data}")
+    return distances
+
+
+async def get_distance_matrix(origins: list[str], destinations: list[str], use_truck_profile: bool = False) -> list[list]:
+    """
+    Road miles for every origin × destination ZIP pair (None where ORS found no route).
+
+    Coordinates for all distinct ZIPs are resolved together, lanes already in
+    the route cache are skipped, and the rest are fetched with ORS matrix calls
+    chunked to stay within ORS_MATRIX_MAX_LOCATIONS per call. Results fill the route cache.
+    """
+    if not settings.OPENROUTESERVICE_API_KEY:
+        raise ValueError("OPENROUTESERVICE_API_KEY not configured in settings.")
+
+    profile = "driving-hgv" if use_truck_profile else "driving-car"
+    origins = [normalize_zip(z) for z in origins]
+    destinations = [normalize_zip(z) for z in destinations]
+
+    matrix = [[route_cache.get(route_key(o, d, use_truck_profile)) for d in destinations] for o in origins]
+    missing_origins = sorted({o for i, o in enumerate(origins) if None in matrix[i]})
+    missing_destinations = sorted({
+        d for j, d in enumerate(destinations) if any(row[j] is None for row in matrix)
+    })
+    if not missing_origins:
+        return matrix
+
+    zips = sorted(set(missing_origins) | set(missing_destinations))
+    coords = dict(zip(zips, await asyncio.gather(*(geocode_zip(z) for z in zips))))
+
+    # Split the remaining grid into chunks of at most half the location limit per side
+    side = max(1, settings.ORS_MATRIX_MAX_LOCATIONS // 2)
+    chunks = [
+        ([(z, coords[z]) for z in missing_origins[i:i + side]],
+         [(z, coords[z]) for z in missing_destinations[j:j + side]])
+        for i in range(0, len(missing_origins), side)
+        for j in range(0, len(missing_destinations), side)
+    ]
+    results = await asyncio.gather(*(_ors_matrix_miles(profile, o, d) for o, d in chunks))
+
+    fetched = {}
+    for (chunk_origins, chunk_destinations), distances in zip(chunks, results):
+        for (o, _), row in zip(chunk_origins, distances):
+            for (d, _), miles in zip(chunk_destinations, row):
+                if miles is not None:
+                    fetched[(o, d)] = round(miles, 2)
+
+    route_cache.set_many((route_key(o, d, use_truck_profile), miles) for (o, d), miles in fetched.items())
+
+    for i, o in enumerate(origins):
+        for j, d in enumerate(destinations):
+            if matrix[i][j] is None:
+                matrix[i][j] = fetched.get((o, d))
+    return matrix
+
+
+# -------------------------------------------------------------------
+# Fast estimate mode: great-circle distance × regional road factor
+# -------------------------------------------------------------------
+def haversine_miles(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * math.asin(math.sqrt(a))
+
+
+def road_region(zipcode: str) -> str:
+    return normalize_zip(zipcode)[:1]
+
+
+def get_road_factor(zip_from: str) -> float:
+    return road_factors.get(road_region(zip_from), settings.DEFAULT_ROAD_FACTOR)
+
+
+async def estimate_distance_miles(zip_from: str, zip_to: str) -> float:
+    """Great-circle miles × calibrated road factor, from local/cached coordinates."""
+    (from_lat, from_lon), (to_lat, to_lon) = await asyncio.gather(
+        geocode_zip(zip_from), geocode_zip(zip_to)
+    )
+    miles = haversine_miles(from_lat, from_lon, to_lat, to_lon) * get_road_factor(zip_from)
+    return round(miles, 2)
+
+
+async def resolve_distance(
+    zip_from: str,
+    zip_to: str,
+    use_truck_profile: bool = False,
+    mode: str = None,
+    on_refined=None,
+) -> dict:
+    """
+    Resolve lane distance according to the distance mode:
+      - exact:                ORS route (via the route cache)
+      - estimate:             cached exact route if known, otherwise an estimate
+      - estimate_then_refine: like estimate, then computes the exact route in the
+                              background and calls `on_refined(miles)` when done
+    Returns {"miles": float, "estimated": bool}.
+    """
+    mode = mode or settings.DISTANCE_MODE
+    if mode not in DISTANCE_MODES:
+        raise ValueError(f"Unknown distance mode '{mode}', expected one of {DISTANCE_MODES}")
+
+    if mode == "exact":
+        return {"miles": await get_distance_miles(zip_from, zip_to, use_truck_profile), "estimated": False}
+
+    cached = route_cache.get(route_key(zip_from, zip_to, use_truck_profile))
+    if cached is not None:
+        return {"miles": cached, "estimated": False}
+
+    miles = await estimate_distance_miles(zip_from, zip_to)
+    if mode == "estimate_then_refine":
+        schedule_refinement(zip_from, zip_to, use_truck_profile, on_refined)
+    return {"miles": miles, "estimated": True}
+
+
+def schedule_refinement(zip_from: str, zip_to: str, use_truck_profile: bool = False, on_refined=None):
+    """Compute the exact route in the background; it lands in the route cache."""
+
+    async def refine():
+        try:
+            miles = await get_distance_miles(zip_from, zip_to, use_truck_profile)
+            logger.info(f"Refined distance {zip_from} → {zip_to}: {miles} mi")
+            if on_refined is not None:
+                await on_refined(miles)
         except Exception as e:
-            raise ValueError(f"OpenRouteService API error: {e}")
+            logger.warning(f"Distance refinement failed for {zip_from} → {zip_to}: {e}")
+
+    task = asyncio.create_task(refine())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
 
-        # Validate response
-        routes = route_data.get("routes")
-        if not routes:
-            raise ValueError(f"OpenRouteService error: {route_data}")
 
-        # Extract distance and convert to miles
-        meters = routes[0]["summary"]["distance"]
-        miles = round(meters / 1609.34, 2)
+def calibrate_road_factors(min_samples: int = MIN_CALIBRATION_SAMPLES) -> dict[str, float]:
+    """
+    Fit the road factor per origin region from cached exact routes whose ZIP
+    coordinates are known locally. Uses the median ratio, which is robust to
+    the odd detour-heavy lane. Regions with too few samples keep the default.
+    """
+    ratios: dict[str, list[float]] = {}
+    for key, miles in route_cache.disk.items():
+        zip_from, zip_to, _ = key.split(":")
+        a = lookup_zip_coordinates(zip_from) or geocode_cache.get(zip_from)
+        b = lookup_zip_coordinates(zip_to) or geocode_cache.get(zip_to)
+        if not a or not b:
+            continue
+        straight = haversine_miles(a[0], a[1], b[0], b[1])
+        if straight < 1:
+            continue
+        # Directional keys are (origin, destination), which is what get_road_factor
+        # looks up; symmetric keys store ZIPs sorted, so either end may be the
+        # origin and the lane counts once for each distinct region
+        if settings.ROUTE_CACHE_SYMMETRIC:
+            regions = {road_region(zip_from), road_region(zip_to)}
+        else:
+            regions = {road_region(zip_from)}
+        for region in regions:
+            ratios.setdefault(region, []).append(miles / straight)
 
-        return miles
\ No newline at end of file
+    fitted = {
+        region: round(statistics.median(values), 4)
+        for region, values in ratios.items()
+        if len(values) >= min_samples
+    }
+    road_factors.update(fitted)
+    road_factor_store.set_many(fitted.items())
+    logger.info(f"Calibrated road factors: {fitted}")
+    return fitted
@@ -1,41 +1,348 @@
+import asyncio
+import hashlib
 import json
-import aiohttp
-from app.core.logger import get_logger
+from app.core.cache import SingleFlight, TieredCache
+from app.core.logger import get_logger, log_payload
 from app.core.config import settings
+from app.core.http_client import get_http_client, upstream_call
 
 EMAIL_GENERATION_URL = settings.EMAIL_GENERATION_URL
+EMAIL_GENERATION_STREAM_URL = settings.EMAIL_GENERATION_STREAM_URL or EMAIL_GENERATION_URL
 logger = get_logger(__name__)
 
 SESSION_ID = "1761653686716"
 AGENT_ID = "6900b36599417c626e85542d"
 
-async def generate_email(quote_payload: dict) -> dict:
-    request_payload = {
-        "session_id": SESSION_ID,
-        "message": quote_payload.json(),
-        "agent_id": AGENT_ID
-    }
+# Generated emails keyed by a hash of the canonical request, so regenerating
+# for the same quote is served locally.
+email_cache = TieredCache("email", maxsize=settings.EMAIL_CACHE_SIZE, ttl=settings.EMAIL_CACHE_TTL)
+email_flight = SingleFlight()
+email_stats = {"cache_hits": 0, "agent_calls": 0, "timeouts": 0, "fallbacks": 0}
 
-    logger.info(f"Sending email generation request with payload: {request_payload}")
+# Agent calls that outlived their request timeout; kept referenced so they
+# can finish and fill the cache for the next click.
+_pending_generations: set[asyncio.Task] = set()
 
-    async with aiohttp.ClientSession() as session:
-        async with session.post(EMAIL_GENERATION_URL, json=request_payload) as response:
-            response.raise_for_status()
-            data = await response.json()
-            logger.info(f"Received email generation response: {data}")
 
+def get_email_cache_stats() -> dict:
+    return {**email_stats, "in_background": len(_pending_generations), "cache": email_cache.stats()}
+
+
+def email_cache_key(quote_payload) -> str:
+    # Agent id is part of the key: a different agent (prompt, tone) means different emails
+    canonical = json.dumps(
+        {"agent_id": AGENT_ID, "request": quote_payload.model_dump(mode="json")},
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def render_fallback_email(quote_payload) -> dict:
+    """Plain template email, used when the agent is slow or returns nothing usable."""
+    vehicles = ", ".join(f"{v.year} {v.make} {v.model}" for v in quote_payload.vehicles) or "your vehicle"
+    origin = f"{quote_payload.pickup_city}, {quote_payload.pickup_state}"
+    destination = f"{quote_payload.delivery_city}, {quote_payload.delivery_state}"
+    return {
+        "subject": f"Your Vehicle Shipping Quote: {origin} to {destination}",
+        "body": (
+            f"Dear {quote_payload.contact_name},\n\n"
+            f"Thank you for requesting a quote to ship {vehicles} from {origin} to {destination}.\n\n"
+            f"Your quoted price is ${quote_payload.final_quote_amount:,.2f}.\n\n"
+            "Reply to this email or give us a call to book your shipment or ask any questions.\n\n"
+            "Best regards,\nVehicle Shipping Team"
+        ),
+    }
+
+
+def parse_email_text(text_content: str) -> dict:
     # 🔧 FIX: clean the text before parsing (strip newlines & spaces)
-    text_content = (data.get("text") or "{}").strip()
+    text_content = (text_content or "{}").strip()
 
     try:
         parsed_content = json.loads(text_content)
     except json.JSONDecodeError:
         logger.error(f"Failed to parse text content: {text_content}")
         parsed_content = {}
-    
-    output={
+
+    return {
         "subject": parsed_content.get("subject", ""),
         "body": parsed_content.get("body", "")
     }
-    # logger.info(f"Parsed email content: {output}")
-    return output
\ No newline at end of file
+
+
+async def _agent_generate_email(key: str, quote_payload) -> dict:
+    request_payload = {
+        "session_id": SESSION_ID,
+        "message": quote_payload.model_dump_json(),
+        "agent_id": AGENT_ID
+    }
+
+    logger.info(f"Sending email generation request for {quote_payload.email}")
+    log_payload(logger, "Email generation payload", request_payload)
+
+    email_stats["agent_calls"] += 1
+    async with upstream_call("agent", "email_generate"):
+        response = await get_http_client("agent").post(EMAIL_GENERATION_URL, json=request_payload)
+    response.raise_for_status()
+    data = response.json()
+    log_payload(logger, "Received email generation response", data)
+
+    output = parse_email_text(data.get("text"))
+    # Only cache complete emails; an empty one should be retried next time
+    if output["subject"] and output["body"]:
+        email_cache.set(key, output)
+    return output
+
+
+async def generate_email(quote_payload) -> dict:
+    """
+    Returns {"subject", "body"} for the quote. Identical requests are served
+    from the cache or share one in-flight agent call. If the agent takes longer
+    than EMAIL_GENERATION_TIMEOUT, a template email is returned right away and
+    the agent call keeps running in the background to fill the cache.
+    """
+    key = email_cache_key(quote_payload)
+    cached = email_cache.get(key)
+    if cached is not None:
+        email_stats["cache_hits"] += 1
+        return cached
+
+    task = asyncio.ensure_future(email_flight.do(key, lambda: _agent_generate_email(key, quote_payload)))
+    try:
+        output = await asyncio.wait_for(asyncio.shield(task), timeout=settings.EMAIL_GENERATION_TIMEOUT)
+    except asyncio.TimeoutError:
+        email_stats["timeouts"] += 1
+        logger.warning(f"Email generation exceeded {settings.EMAIL_GENERATION_TIMEOUT}s; using template email")
+        _pending_generations.add(task)
+        task.add_done_callback(_finish_background_generation)
+        output = {}
+    except Exception as e:
+        logger.exception(f"Email generation failed: {e}")
+        output = {}
+
+    if not (output.get("subject") and output.get("body")):
+        email_stats["fallbacks"] += 1
+        return render_fallback_email(quote_payload)
+    return output
+
+
+def _finish_background_generation(task: asyncio.Task):
+    _pending_generations.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(f"Background email generation failed: {task.exception()!r}")
+
+
+# -------------------------------------------------------------------
+# Streaming generation – the agent streams the {"subject", "body"} JSON
+# text; EmailStreamParser turns it into per-field text deltas as it arrives.
+# -------------------------------------------------------------------
+_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "b": "\b", "f": "\f", '"': '"', "\\": "\\", "/": "/"}
+
+
+class EmailStreamParser:
+    """
+    Incremental parser for a flat JSON object of string values, e.g.
+    {"subject": "...", "body": "..."}. feed() takes arbitrary chunks (splits
+    may fall inside keys or escapes) and returns the new (field, text) deltas.
+    Leading noise such as a ```json fence is skipped; non-string values are ignored.
+    """
+
+    def __init__(self):
+        self.state = "start"
+        self.key = ""
+        self.values: dict[str, str] = {}
+        self._escape = None       # None, "" (after backslash) or collected \u hex digits
+        self._high_surrogate = None
+
+    @property
+    def done(self) -> bool:
+        return self.state == "done"
+
+    def feed(self, chunk: str) -> list[tuple[str, str]]:
+        deltas: list[tuple[str, str]] = []
+
+        def emit(text: str):
+            self.values[self.key] = self.values.get(self.key, "") + text
+            if deltas and deltas[-1][0] == self.key:
+                deltas[-1] = (self.key, deltas[-1][1] + text)
+            else:
+                deltas.append((self.key, text))
+
+        for ch in chunk:
+            state = self.state
+            if state == "start":
+                if ch == "{":
+                    self.state = "expect_key"
+            elif state == "expect_key":
+                if ch == '"':
+                    self.key, self.state = "", "in_key"
+                elif ch == "}":
+                    self.state = "done"
+            elif state == "in_key":
+                if self._escape is not None:
+                    self.key += _ESCAPES.get(ch, ch)
+                    self._escape = None
+                elif ch == "\\":
+                    self._escape = ""
+                elif ch == '"':
+                    self.state = "expect_colon"
+                else:
+                    self.key += ch
+            elif state == "expect_colon":
+                if ch == ":":
+                    self.state = "expect_value"
+            elif state == "expect_value":
+                if ch == '"':
+                    self.state = "in_value"
+                elif not ch.isspace():
+                    self.state = "skip_value"
+            elif state == "skip_value":
+                if ch == ",":
+                    self.state = "expect_key"
+                elif ch == "}":
+                    self.state = "done"
+            elif state == "in_value":
+                text = self._value_char(ch)
+                if text:
+                    emit(text)
+            elif state == "after_value":
+                if ch == ",":
+                    self.state = "expect_key"
+                elif ch == "}":
+                    self.state = "done"
+        return deltas
+
+    def _value_char(self, ch: str) -> str:
+        if self._escape is None:
+            if ch == "\\":
+                self._escape = ""
+                return ""
+            if ch == '"':
+                self.state = "after_value"
+                return ""
+            return ch
+
+        if self._escape == "":
+            if ch == "u":
+                self._escape = "u"
+                return ""
+            self._escape = None
+            return _ESCAPES.get(ch, ch)
+
+        # Collecting \uXXXX
+        self._escape += ch
+        if len(self._escape) < 5:
+            return ""
+        code = int(self._escape[1:], 16)
+        self._escape = None
+        if 0xD800 <= code < 0xDC00:
+            self._high_surrogate = code
+            return ""
+        if 0xDC00 <= code < 0xE000 and self._high_surrogate is not None:
+            code = 0x10000 + ((self._high_surrogate - 0xD800) << 10) + (code - 0xDC00)
+        self._high_surrogate = None
+        return chr(code)
+
+    def result(self) -> dict:
+        return {"subject": self.values.get("subject", ""), "body": self.values.get("body", "")}
+
+
+async def _agent_stream_text(quote_payload):
+    """Yield the agent's response text chunks (SSE `data:` lines or a raw chunked body)."""
+    request_payload = {
+        "session_id": SESSION_ID,
+        "message": quote_payload.model_dump_json(),
+        "agent_id": AGENT_ID,
+        "stream": True,
+    }
+    logger.info(f"Streaming email generation request for {quote_payload.email}")
+    email_stats["agent_calls"] += 1
+
+    async with upstream_call("agent", "email_stream"):
+        async with get_http_client("agent").stream("POST", EMAIL_GENERATION_STREAM_URL, json=request_payload) as response:
+            response.raise_for_status()
+            if "text/event-stream" not in response.headers.get("content-type", ""):
+                async for text in response.aiter_text():
+                    yield text
+                return
+
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    return
+                try:
+                    event = json.loads(data)
+                except ValueError:
+                    yield data
+                    continue
+                if isinstance(event, dict):
+                    yield event.get("text") or event.get("delta") or ""
+                elif isinstance(event, str):
+                    yield event
+
+
+def _whole_email_events(email: dict, **extra):
+    yield "subject", {"delta": email["subject"]}
+    yield "body", {"delta": email["body"]}
+    yield "done", {**email, **extra}
+
+
+async def stream_email(quote_payload):
+    """
+    Async generator of (event, data) pairs for SSE: "subject"/"body" events
+    carry text deltas as the agent produces them, "done" carries the full
+    email. Cached emails are replayed at once; if the agent sends nothing
+    within EMAIL_GENERATION_TIMEOUT (or fails before any text), the template
+    email is streamed instead.
+    """
+    key = email_cache_key(quote_payload)
+    cached = email_cache.get(key)
+    if cached is not None:
+        email_stats["cache_hits"] += 1
+        for event in _whole_email_events(cached, cached=True):
+            yield event
+        return
+
+    parser = EmailStreamParser()
+    chunks = _agent_stream_text(quote_payload)
+    started = False
+    try:
+        # Only the first read is timed; once the agent is streaming it may finish at its own pace
+        async with asyncio.timeout(settings.EMAIL_GENERATION_TIMEOUT):
+            chunk = await anext(chunks, None)
+        while chunk is not None:
+            for field, text in parser.feed(chunk):
+                if field in ("subject", "body"):
+                    started = True
+                    yield field, {"delta": text}
+            if parser.done:
+                break
+            chunk = await anext(chunks, None)
+    except Exception as e:
+        if isinstance(e, asyncio.TimeoutError):
+            email_stats["timeouts"] += 1
+        if started:
+            logger.error(f"Email stream failed mid-way: {e!r}")
+            yield "error", {"detail": "Email generation was interrupted"}
+            return
+        logger.warning(f"Email stream produced no text ({e!r}); using template email")
+        email_stats["fallbacks"] += 1
+        for event in _whole_email_events(render_fallback_email(quote_payload), fallback=True):
+            yield event
+        return
+    finally:
+        await chunks.aclose()
+
+    output = parser.result()
+    if not (output["subject"] and output["body"]):
+        email_stats["fallbacks"] += 1
+        for event in _whole_email_events(render_fallback_email(quote_payload), fallback=True):
+            yield event
+        return
+
+    email_cache.set(key, output)
+    yield "done", output
+
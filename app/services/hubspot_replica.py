@@ -0,0 +1,247 @@
+import base64
+import hashlib
+import hmac
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# -------------------------------------------------------------------
+# Local SQLite replica of HubSpot companies, contacts and deals.
+#
+# Rows are written by the webhook sync worker and by full resyncs
+# (app/services/hubspot_sync.py), and read by hubspot_service so name
+# and email lookups don't need a HubSpot round trip.
+# -------------------------------------------------------------------
+OBJECT_TYPES = ("companies", "contacts", "deals")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS objects (
+    object_type TEXT NOT NULL,
+    id          TEXT NOT NULL,
+    name_key    TEXT,
+    email       TEXT,
+    properties  TEXT NOT NULL,
+    modified_ms INTEGER,
+    synced_at   REAL NOT NULL,
+    PRIMARY KEY (object_type, id)
+);
+CREATE INDEX IF NOT EXISTS objects_name ON objects (object_type, name_key);
+CREATE INDEX IF NOT EXISTS objects_email ON objects (object_type, email);
+CREATE TABLE IF NOT EXISTS sync_state (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+
+def _name_key(name: Optional[str]) -> Optional[str]:
+    # Same normalization as hubspot_service.normalize_company_name
+    from app.services.hubspot_service import normalize_company_name
+    return normalize_company_name(name) if name else None
+
+
+def _modified_ms(props: dict) -> Optional[int]:
+    value = props.get("hs_lastmodifieddate") or props.get("lastmodifieddate")
+    if not value:
+        return None
+    if str(value).isdigit():
+        return int(value)
+    return int(datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp() * 1000)
+
+
+# An incoming row replaces the stored one unless it is provably older. synced_at
+# always moves forward so full resyncs can tell which rows still exist.
+_NEWER = "(excluded.modified_ms IS NULL OR objects.modified_ms IS NULL OR excluded.modified_ms >= objects.modified_ms)"
+_UPSERT_SQL = f"""
+INSERT INTO objects (object_type, id, name_key, email, properties, modified_ms, synced_at)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (object_type, id) DO UPDATE SET
+    name_key = CASE WHEN {_NEWER} THEN excluded.name_key ELSE objects.name_key END,
+    email = CASE WHEN {_NEWER} THEN excluded.email ELSE objects.email END,
+    properties = CASE WHEN {_NEWER} THEN excluded.properties ELSE objects.properties END,
+    modified_ms = CASE WHEN {_NEWER} THEN excluded.modified_ms ELSE objects.modified_ms END,
+    synced_at = excluded.synced_at
+"""
+
+
+class HubSpotReplica:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._refresh_ready()
+
+    # ---------------------------- writes ----------------------------
+    def upsert_many(self, object_type: str, records: list[dict], synced_at: float = None) -> int:
+        """Insert or replace records, keeping stored fields when the incoming copy is older."""
+        synced_at = synced_at or time.time()
+        rows = []
+        for record in records:
+            if not record or not record.get("id"):
+                continue
+            props = record.get("properties") or {}
+            rows.append((
+                object_type,
+                str(record["id"]),
+                _name_key(props.get("name") or props.get("dealname")),
+                (props.get("email") or "").strip().lower() or None,
+                json.dumps(props),
+                _modified_ms(props),
+                synced_at,
+            ))
+        with self._lock:
+            self._conn.executemany(_UPSERT_SQL, rows)
+        return len(rows)
+
+    def upsert(self, object_type: str, record: dict):
+        self.upsert_many(object_type, [record])
+
+    def delete_many(self, object_type: str, ids: list[str]):
+        with self._lock:
+            self._conn.executemany(
+                "DELETE FROM objects WHERE object_type = ? AND id = ?",
+                [(object_type, str(i)) for i in ids],
+            )
+
+    def delete_stale(self, object_type: str, before: float) -> int:
+        """Drop rows a full resync didn't touch (deleted in HubSpot)."""
+        with self._lock:
+            cur = self._conn.execute(
+                "DELETE FROM objects WHERE object_type = ? AND synced_at < ?", (object_type, before)
+            )
+        return cur.rowcount
+
+    # ---------------------------- reads -----------------------------
+    def _rows(self, sql: str, params: tuple) -> list[dict]:
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [{"id": rid, "properties": json.loads(props)} for rid, props in rows]
+
+    def get(self, object_type: str, object_id: str) -> Optional[dict]:
+        rows = self._rows(
+            "SELECT id, properties FROM objects WHERE object_type = ? AND id = ?", (object_type, str(object_id))
+        )
+        return rows[0] if rows else None
+
+    def find_company_by_name(self, company_name: str) -> Optional[dict]:
+        rows = self._rows(
+            "SELECT id, properties FROM objects WHERE object_type = 'companies' AND name_key = ? "
+            "ORDER BY CAST(id AS INTEGER) LIMIT 1",
+            (_name_key(company_name),),
+        )
+        return rows[0] if rows else None
+
+    def search_companies(self, company_name: str, limit: int = 10) -> list[dict]:
+        """Local stand-in for a CONTAINS_TOKEN search: whole-word match on the normalized name."""
+        key = _name_key(company_name)
+        if not key:
+            return []
+        return self._rows(
+            """
+            SELECT id, properties FROM objects
+            WHERE object_type = 'companies'
+              AND (name_key = ? OR name_key LIKE ? OR name_key LIKE ? OR name_key LIKE ?)
+            ORDER BY name_key = ? DESC, name_key
+            LIMIT ?
+            """,
+            (key, f"{key} %", f"% {key}", f"% {key} %", key, limit),
+        )
+
+    def find_contact_by_email(self, email: str) -> Optional[dict]:
+        rows = self._rows(
+            "SELECT id, properties FROM objects WHERE object_type = 'contacts' AND email = ? LIMIT 1",
+            ((email or "").strip().lower(),),
+        )
+        return rows[0] if rows else None
+
+    # --------------------------- sync state --------------------------
+    def get_state(self, key: str, default=None):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_state(self, key: str, value):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)", (key, json.dumps(value))
+            )
+        self._refresh_ready()
+
+    def _refresh_ready(self):
+        # Reads are only authoritative once every object type has had a full sync
+        self.ready = all(self.get_state(f"full_sync:{t}") for t in OBJECT_TYPES)
+
+    def counts(self) -> dict:
+        with self._lock:
+            rows = self._conn.execute("SELECT object_type, COUNT(*) FROM objects GROUP BY object_type").fetchall()
+        return {t: 0 for t in OBJECT_TYPES} | dict(rows)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# -------------------------------------------------------------------
+# Webhook signatures (HubSpot v3): base64(HMAC-SHA256(secret,
+# method + uri + body + timestamp)). Shared by the receiver and the
+# local sender stub in scripts/hubspot_webhook_stub.py.
+# -------------------------------------------------------------------
+def sign_webhook(secret: str, method: str, uri: str, body: bytes, timestamp: str) -> str:
+    message = method.upper().encode() + uri.encode() + body + timestamp.encode()
+    digest = hmac.new(secret.encode(), message, hashlib.sha256).digest()
+    return base64.b64encode(digest).decode()
+
+
+def verify_webhook(secret: str, method: str, uri: str, body: bytes, timestamp: str,
+                   signature: str, max_age: float) -> bool:
+    try:
+        age = time.time() - int(timestamp) / 1000
+    except (TypeError, ValueError):
+        return False
+    if abs(age) > max_age:
+        return False
+    expected = sign_webhook(secret, method, uri, body, timestamp)
+    return hmac.compare_digest(expected, signature or "")
+
+
+# -------------------------------------------------------------------
+# App-level instance, opened from the FastAPI lifespan hook
+# -------------------------------------------------------------------
+replica: Optional[HubSpotReplica] = None
+
+
+def open_hubspot_replica():
+    from app.core.config import settings
+
+    global replica
+    if not settings.HUBSPOT_REPLICA_ENABLED:
+        return None
+    replica = HubSpotReplica(settings.HUBSPOT_REPLICA_PATH)
+    logger.info(f"Opened HubSpot replica at {settings.HUBSPOT_REPLICA_PATH}: {replica.counts()}")
+    return replica
+
+
+def close_hubspot_replica():
+    global replica
+    if replica is not None:
+        replica.close()
+        replica = None
+
+
+def get_ready_replica() -> Optional[HubSpotReplica]:
+    """The replica if it can answer reads, else None (callers go to HubSpot)."""
+    return replica if replica is not None and replica.ready else None
+
+
+def replica_upsert(object_type: str, record: dict):
+    """Write-through for records we just created, so reads see them before the webhook lands."""
+    if replica is not None and record and record.get("id"):
+        replica.upsert(object_type, record)
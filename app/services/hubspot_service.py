@@ -1,8 +1,14 @@
+import asyncio
+import re
+from datetime import datetime, timezone
 import httpx
-import aiohttp
 from fastapi import HTTPException
+from app.core.cache import SingleFlight, TieredCache, TTLCache
 from app.core.config import settings
-from app.core.logger import get_logger
+from app.core.http_client import get_http_client, upstream_call
+from app.core.logger import get_logger, log_payload
+from app.core.rate_limit import RateLimiter, TokenBucket, backoff_delay, retry_after_seconds
+from app.services.hubspot_replica import get_ready_replica, replica_upsert
 from app.models.response import CompanyResponse
 
 logger = get_logger("hubspot_service")
@@ -17,25 +23,290 @@ HEADERS = {
     "Content-Type": "application/json"
 }
 
+_NOT_CACHED = object()
+
 # -------------------------------------------------------------------
-# Common helper for httpx‑based endpoints
+# Rate limiting – HubSpot enforces per-second and per-10-second budgets,
+# with a stricter separate budget for the search API.
 # -------------------------------------------------------------------
-async def hubspot_request(method: str, endpoint: str, params=None, json=None):
-    headers = HEADERS
-    full_url = f"{HUBSPOT_BASE_URL}{endpoint}"
-    logger.info(f"HubSpot {method} request to {full_url}")
-
-    async with httpx.AsyncClient() as client:
-        resp = await client.request(method, full_url, headers=headers, params=params, json=json)
-        if resp.status_code >= 400:
-            logger.error(f"HubSpot error {resp.status_code}: {resp.text}")
-            raise HTTPException(status_code=resp.status_code, detail=resp.text)
+hubspot_limiter = RateLimiter(
+    "hubspot",
+    TokenBucket(settings.HUBSPOT_RATE_PER_SECOND, 1.0),
+    TokenBucket(settings.HUBSPOT_RATE_PER_10S, 10.0),
+)
+hubspot_search_limiter = RateLimiter(
+    "hubspot_search",
+    TokenBucket(settings.HUBSPOT_SEARCH_RATE_PER_SECOND, 1.0),
+)
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "PUT", "DELETE", "PATCH"}
+RETRY_STATUS = {500, 502, 503, 504}
+
+retry_stats = {"retried": 0, "rate_limited": 0, "failed": 0}
+
+
+def get_hubspot_rate_stats() -> dict:
+    return {
+        **retry_stats,
+        "limiters": [hubspot_limiter.stats(), hubspot_search_limiter.stats()],
+    }
+
+# -------------------------------------------------------------------
+# Common helper – all HubSpot calls share the pooled "hubspot" client
+# -------------------------------------------------------------------
+# Object type (name or id) -> singular label for metrics
+_OPERATION_OBJECTS = {
+    "companies": "company", "0-2": "company",
+    "contacts": "contact", "0-1": "contact",
+    "deals": "deal", "0-3": "deal",
+    "emails": "email",
+}
+
+
+def hubspot_operation(method: str, endpoint: str) -> str:
+    """
+    Bounded metrics label for a call, e.g. POST /crm/v3/objects/contacts ->
+    "contact_create", PATCH /crm/v3/objects/0-3/{id} -> "deal_update".
+    """
+    method = method.upper()
+    parts = endpoint.split("?")[0].strip("/").split("/")
+    if len(parts) >= 4 and parts[2] == "objects":
+        obj = _OPERATION_OBJECTS.get(parts[3], "object")
+        rest = parts[4:]
+        if not rest:
+            action = {"POST": "create", "GET": "list"}.get(method, method.lower())
+        elif rest[0] == "search":
+            action = "search"
+        elif rest[0] == "batch":
+            action = f"batch_{rest[1]}" if len(rest) > 1 else "batch"
+        else:
+            action = {"GET": "get", "PATCH": "update", "DELETE": "delete"}.get(method, method.lower())
+        return f"{obj}_{action}"
+    if len(parts) >= 3 and parts[2] == "associations":
+        return "association_batch" if "batch" in parts else "association"
+    return "other"
+
+
+async def hubspot_send(method: str, endpoint: str, params=None, json=None, idempotent: bool = None):
+    """
+    Send a HubSpot request on the shared client and return the raw response.
+
+    Every call waits for a rate-limit token first. 429s are always retried
+    (HubSpot didn't process the request), honoring Retry-After; 5xx and
+    network errors are retried only for idempotent calls. Searches are
+    treated as idempotent.
+    """
+    client = get_http_client("hubspot")
+    operation = hubspot_operation(method, endpoint)
+    is_search = endpoint.endswith("/search")
+    if idempotent is None:
+        idempotent = method.upper() in IDEMPOTENT_METHODS or is_search
+
+    attempt = 0
+    while True:
+        await hubspot_limiter.acquire()
+        if is_search:
+            await hubspot_search_limiter.acquire()
+
+        try:
+            async with upstream_call("hubspot", operation):
+                resp = await client.request(method, endpoint, headers=HEADERS, params=params, json=json)
+        except httpx.TransportError as e:
+            if not idempotent or attempt >= settings.HUBSPOT_MAX_RETRIES:
+                retry_stats["failed"] += 1
+                raise
+            delay = backoff_delay(attempt)
+            logger.warning(f"HubSpot {method} {endpoint} failed ({e!r}); retry {attempt + 1} in {delay:.2f}s")
+        else:
+            retryable = resp.status_code == 429 or (idempotent and resp.status_code in RETRY_STATUS)
+            if not retryable:
+                return resp
+            if attempt >= settings.HUBSPOT_MAX_RETRIES:
+                retry_stats["failed"] += 1
+                return resp
+
+            delay = retry_after_seconds(resp.headers.get("Retry-After"))
+            if delay is None:
+                delay = backoff_delay(attempt)
+            if resp.status_code == 429:
+                retry_stats["rate_limited"] += 1
+                # Back off every caller, not just this one
+                (hubspot_search_limiter if is_search else hubspot_limiter).pause(delay)
+            logger.warning(f"HubSpot {method} {endpoint} returned {resp.status_code}; retry {attempt + 1} in {delay:.2f}s")
+
+        retry_stats["retried"] += 1
+        attempt += 1
+        await asyncio.sleep(delay)
+
+
+def _safe_json(resp) -> dict:
+    try:
         return resp.json()
+    except Exception:
+        return {}
+
+
+async def hubspot_request(method: str, endpoint: str, params=None, json=None):
+    logger.info(f"HubSpot {method} request to {HUBSPOT_BASE_URL}{endpoint}")
+
+    resp = await hubspot_send(method, endpoint, params=params, json=json)
+    if resp.status_code >= 400:
+        logger.error(f"HubSpot error {resp.status_code}: {resp.text}")
+        raise HTTPException(status_code=resp.status_code, detail=resp.text)
+    return resp.json()
 
 # -------------------------------------------------------------------
-# Company utilities (unchanged)
+# Associations – v4 batch API
+# -------------------------------------------------------------------
+# v4 associations are bidirectional, so one record per pair is enough and
+# all pairs of the same object types fit in one batch call.
+ASSOCIATION_BATCH_SIZE = 100
+ASSOCIATION_WINDOW = settings.HUBSPOT_ASSOCIATION_WINDOW_MS / 1000
+
+# HubSpot-defined association type ids used for inline associations on create
+DEAL_TO_COMPANY_TYPE_ID = 5
+DEAL_TO_CONTACT_TYPE_ID = 3
+EMAIL_TO_DEAL_TYPE_ID = 210
+
+
+def inline_association(to_id: str, type_id: int) -> dict:
+    """Build an entry for the `associations` field of an object create call."""
+    return {
+        "to": {"id": to_id},
+        "types": [{"associationCategory": "HUBSPOT_DEFINED", "associationTypeId": type_id}],
+    }
+
+
+class AssociationBatcher:
+    """
+    Collects associations and writes them with the minimum number of
+    POST /crm/v4/associations/{from}/{to}/batch/associate/default calls.
+
+    With window > 0 the batcher is shared: pairs added by concurrent
+    requests within the window are flushed together.
+    """
+
+    def __init__(self, window: float = 0.0):
+        self.window = window
+        self._pending: dict[tuple[str, str], dict[tuple[str, str], list[asyncio.Future]]] = {}
+        self._flush_task = None
+
+    def add(self, from_type: str, to_type: str, from_id: str, to_id: str) -> asyncio.Future:
+        # Store in canonical type order so A→B and B→A collapse into one record
+        if to_type < from_type:
+            from_type, to_type, from_id, to_id = to_type, from_type, to_id, from_id
+
+        future = asyncio.get_running_loop().create_future()
+        pairs = self._pending.setdefault((from_type, to_type), {})
+        pairs.setdefault((str(from_id), str(to_id)), []).append(future)
+
+        if self.window > 0 and self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_after_window())
+        return future
+
+    async def _flush_after_window(self):
+        await asyncio.sleep(self.window)
+        self._flush_task = None
+        await self.flush()
+
+    async def flush(self):
+        pending, self._pending = self._pending, {}
+        calls = []
+        for (from_type, to_type), pairs in pending.items():
+            items = list(pairs.items())
+            for i in range(0, len(items), ASSOCIATION_BATCH_SIZE):
+                calls.append(self._send(from_type, to_type, items[i:i + ASSOCIATION_BATCH_SIZE]))
+        await asyncio.gather(*calls)
+
+    async def _send(self, from_type, to_type, items):
+        url = f"/crm/v4/associations/{from_type}/{to_type}/batch/associate/default"
+        payload = {"inputs": [{"from": {"id": f}, "to": {"id": t}} for (f, t), _ in items]}
+        try:
+            # Re-associating an existing pair is a no-op, so this call is safe to retry
+            res = await hubspot_send("POST", url, json=payload, idempotent=True)
+            ok = res.status_code < 400
+            if ok:
+                logger.info(f"Assoc {from_type}<->{to_type} x{len(items)}: {res.status_code}")
+            else:
+                logger.error(f"Assoc {from_type}<->{to_type} x{len(items)} failed: {res.status_code} {res.text}")
+        except Exception as e:
+            logger.error(f"Assoc {from_type}<->{to_type} x{len(items)} failed: {e}")
+            ok = False
+
+        for _, futures in items:
+            for future in futures:
+                if not future.done():
+                    future.set_result(ok)
+
+
+_shared_batcher = AssociationBatcher(window=ASSOCIATION_WINDOW)
+
+
+async def associate_objects(pairs: list[tuple[str, str, str, str]]) -> bool:
+    """
+    Associate (from_type, to_type, from_id, to_id) pairs, skipping any with a
+    missing id. Returns True when every batch call succeeded.
+    """
+    pairs = [p for p in pairs if p[2] and p[3]]
+    if not pairs:
+        return True
+
+    if ASSOCIATION_WINDOW > 0:
+        futures = [_shared_batcher.add(*p) for p in pairs]
+    else:
+        batcher = AssociationBatcher()
+        futures = [batcher.add(*p) for p in pairs]
+        await batcher.flush()
+
+    return all(await asyncio.gather(*futures))
+
+# -------------------------------------------------------------------
+# Company cache – keyed by normalized name, holds the HubSpot record
+# (or None for a recent "not found"), filled by searches and creates.
+# -------------------------------------------------------------------
+company_cache = TTLCache(maxsize=settings.COMPANY_CACHE_SIZE, ttl=settings.COMPANY_CACHE_TTL)
+company_details_cache = TTLCache(maxsize=settings.COMPANY_CACHE_SIZE, ttl=settings.COMPANY_CACHE_TTL)
+company_flight = SingleFlight()
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_company_name(company_name: str) -> str:
+    """'  ACME, Inc. ' and 'acme inc' map to the same key."""
+    name = _PUNCTUATION.sub(" ", (company_name or "").casefold())
+    return _WHITESPACE.sub(" ", name).strip()
+
+
+def cache_company(company: dict):
+    name = (company or {}).get("properties", {}).get("name")
+    if company and company.get("id") and name:
+        company_cache.set(normalize_company_name(name), company)
+
+
+def get_company_cache_stats() -> dict:
+    return {
+        "companies": company_cache.stats(),
+        "details": company_details_cache.stats(),
+        "coalesced": company_flight.coalesced,
+    }
+
+# -------------------------------------------------------------------
+# Company utilities
 # -------------------------------------------------------------------
 async def get_or_create_company(company_name: str, phone: str, address: dict):
+    """
+    Find a company by name or create it. Concurrent calls for the same
+    normalized name share one lookup/create, so two simultaneous quotes for
+    a new company don't create duplicates.
+    """
+    return await company_flight.do(
+        normalize_company_name(company_name),
+        lambda: _get_or_create_company(company_name, phone, address),
+    )
+
+
+async def _get_or_create_company(company_name: str, phone: str, address: dict):
     logger.info(f"Checking if company '{company_name}' exists in HubSpot")
 
     existing_company = await hubspot_find_company_by_name(company_name)
@@ -58,25 +329,35 @@ async def get_or_create_company(company_name: str, phone: str, address: dict):
         }
     }
 
-    logger.info(f"New company payload sent to HubSpot: {new_company_payload}")
+    log_payload(logger, "New company payload sent to HubSpot", new_company_payload)
     new_company = await hubspot_create_company(new_company_payload)
     logger.info(f"Created company '{company_name}' with ID: {new_company['id']}")
+    # Replace the negative entry left by the lookup above
+    company_cache.set(normalize_company_name(company_name), new_company)
     return new_company
 
-async def get_all_companies(limit: int = 100, start_chars: str = None):
+async def get_all_companies(limit: int = 100, start_chars: str = None, offset: int = 0):
+    """
+    Direct HubSpot fallback for when the local company directory isn't synced yet.
+    Follows `after` paging until `offset + limit` matches are found.
+    """
     endpoint = "/crm/v3/objects/companies"
-    params = {"limit": limit, "properties": "name"}
-    data = await hubspot_request("GET", endpoint, params=params)
-    results = data.get("results", [])
-    return [
-            CompanyResponse(
-                id=company["id"],
-                name=name,
-            )
-            for company in results
+    matches, after = [], None
+    while len(matches) < offset + limit:
+        params = {"limit": 100, "properties": "name"}
+        if after:
+            params["after"] = after
+        data = await hubspot_request("GET", endpoint, params=params)
+        matches.extend(
+            CompanyResponse(id=company["id"], name=name)
+            for company in data.get("results", [])
             if (name := company["properties"].get("name"))  # skip if None
             and (not start_chars or name.lower().startswith(start_chars.lower()))
-        ]
+        )
+        after = data.get("paging", {}).get("next", {}).get("after")
+        if not after:
+            break
+    return matches[offset:offset + limit]
 
 async def get_company_details(company_name: str):
     company_name = (company_name or "").strip()
@@ -84,6 +365,23 @@ async def get_company_details(company_name: str):
         logger.warning(f"Skipping HubSpot search for invalid company name: '{company_name}'")
         return []
 
+    replica = get_ready_replica()
+    if replica is not None:
+        return replica.search_companies(company_name)
+
+    key = normalize_company_name(company_name)
+    cached = company_details_cache.get(key)
+    if cached is not None:
+        return cached
+
+    results = await company_flight.do(("details", key), lambda: _search_company_details(company_name))
+    # Empty results are cached briefly so repeated typos don't hammer the search API
+    company_details_cache.set(key, results, ttl=None if results else settings.COMPANY_NEGATIVE_TTL)
+    return results
+
+
+async def _search_company_details(company_name: str):
+
     endpoint = "/crm/v3/objects/companies/search"
     payload = {
         "filterGroups": [{
@@ -108,147 +406,190 @@ async def get_company_details(company_name: str):
     }
 
     data = await hubspot_request("POST", endpoint, json=payload)
-    return data.get("results", [])
+    results = data.get("results", [])
+    for company in results:
+        cache_company(company)
+    return results
 
 # -------------------------------------------------------------------
-# create_transport_deal – main async HubSpot integration
+# Contact resolver – email -> contact id, looked up before creating so
+# returning customers don't cost a failed create (409) every time.
 # -------------------------------------------------------------------
-import aiohttp
+contact_cache = TieredCache("contacts", maxsize=settings.CONTACT_CACHE_SIZE, ttl=settings.CONTACT_CACHE_TTL)
+contact_flight = SingleFlight()
+contact_stats = {"cached": 0, "found": 0, "created": 0}
 
-from fastapi import HTTPException
-from app.core.logger import get_logger
 
-logger = get_logger("hubspot_service")
+def normalize_email(email) -> str:
+    return str(email or "").strip().lower()
 
-# HUBSPOT_BASE_URL = "https://api.hubapi.com/crm/v3/objects"
-HEADERS = {
-    "Authorization": f"Bearer {HUBSPOT_TOKEN}",
-    "Content-Type": "application/json"
-}
+
+def get_contact_cache_stats() -> dict:
+    return {**contact_cache.stats(), **contact_stats, "flight_coalesced": contact_flight.coalesced}
 
 
-async def create_transport_deal(data: dict):
+async def resolve_contact(data: dict):
     """
-    Creates or reuses HubSpot contact, company, and deal entities,
-    associates them together (bi-directional), and returns their IDs.
+    Returns the contact id for data["email"]: cache first, then one lookup by
+    email, and a create only when HubSpot has no such contact. Concurrent
+    calls for the same email share one lookup/create.
     """
-    async with aiohttp.ClientSession(headers=HEADERS) as session:
-        company_id = data.get("company_id")
-
-        # --------------------------------------------------------------
-        # 1️⃣ Create or reuse Contact
-        # --------------------------------------------------------------
-        contact_payload = {
-            "properties": {
-                "firstname": data.get("contact_name"),
-                "email": data.get("email"),
-                "phone": data.get("phone", "")
-            }
+    email = normalize_email(data.get("email"))
+    if not email:
+        return await create_contact(data)
+
+    contact_id = contact_cache.get(email)
+    if contact_id:
+        contact_stats["cached"] += 1
+        return contact_id
+
+    return await contact_flight.do(email, lambda: _resolve_contact(email, data))
+
+
+async def _resolve_contact(email: str, data: dict):
+    contact_id = await find_contact_id_by_email(email)
+    if contact_id:
+        contact_stats["found"] += 1
+    else:
+        contact_id = await create_contact(data)
+        contact_stats["created"] += 1
+
+    if contact_id:
+        contact_cache.set(email, contact_id)
+    return contact_id
+
+
+async def find_contact_id_by_email(email: str):
+    # A replica miss falls through to HubSpot, which may have the contact
+    # before its webhook has been applied; a miss here means a create
+    replica = get_ready_replica()
+    if replica is not None:
+        contact = replica.find_contact_by_email(email)
+        if contact:
+            return contact["id"]
+
+    # Batch read by the unique email property – a plain read, so it isn't
+    # held to the stricter search rate limit.
+    res = await hubspot_send(
+        "POST",
+        "/crm/v3/objects/contacts/batch/read",
+        json={"idProperty": "email", "properties": ["email"], "inputs": [{"id": email}]},
+        idempotent=True,
+    )
+    if res.status_code >= 400:
+        logger.warning(f"HubSpot contact lookup failed {res.status_code}: {res.text}")
+        return None
+
+    results = _safe_json(res).get("results", [])
+    return results[0].get("id") if results else None
+
+# -------------------------------------------------------------------
+# Contact / deal creation (called from the quote pipeline stages)
+# -------------------------------------------------------------------
+async def create_contact(data: dict):
+    """
+    Creates a HubSpot contact or reuses the existing one (409 conflict).
+    Returns the contact id. Prefer resolve_contact(), which looks the email up first;
+    the 409 path only covers contacts created elsewhere since that lookup.
+    """
+    contact_payload = {
+        "properties": {
+            "firstname": data.get("contact_name"),
+            "email": data.get("email"),
+            "phone": data.get("phone", "")
         }
-        contact_id = None
-
-        async with session.post(f"{HUBSPOT_BASE_URL}/crm/v3/objects/contacts", json=contact_payload) as res:
-            text = await res.text()
-            logger.info(f"Contact response: {res.status} {text}")
-            try:
-                body = await res.json()
-            except Exception:
-                body = {}
-
-            if res.status in (200, 201):
-                contact_id = body.get("id")
-            elif res.status == 409:
-                msg = body.get("message", "")
-                if "Existing ID:" in msg:
-                    contact_id = msg.split("Existing ID:")[-1].strip()
-                logger.info(f"Contact already exists: {contact_id}")
-            else:
-                raise HTTPException(status_code=res.status, detail=text)
-
-        # --------------------------------------------------------------
-        # 2️⃣ Create Deal
-        # --------------------------------------------------------------
-        pickup = data.get("pickup", {}) or {}
-        delivery = data.get("delivery", {}) or {}
-        from_location = f"{pickup.get('city', '')}\n{pickup.get('state', '')}\n{pickup.get('zip', '')}"
-        to_location = f"{delivery.get('city', '')}\n{delivery.get('state', '')}\n{delivery.get('zip', '')}"
-        vehicles = data.get("vehicles", []) or []
-        vehicles_list = [f"{v['year']} {v['make']} {v['model']} ({v['type']})" for v in vehicles]
-        number_of_vehicles = len(vehicles_list)
-        formatted_vehicles = "\n".join(vehicles_list)
-
-        # 🔧 Compose deal name dynamically
-        if vehicles:
-            vehicle_names = [f"{v.get('year', '')} {v.get('make', '')} {v.get('model', '')}".strip() for v in vehicles]
-            if len(vehicle_names) == 1:
-                vehicle_str = vehicle_names[0]
-            else:
-                vehicle_str = f"{number_of_vehicles} vehicles"
-            deal_name = f"Shipping {vehicle_str} from {pickup.get('city', '')} to {delivery.get('city', '')}"
+    }
+    contact_id = None
+
+    res = await hubspot_send("POST", "/crm/v3/objects/contacts", json=contact_payload)
+    logger.info(f"Contact response: {res.status_code}")
+    log_payload(logger, "Contact response body", res.text)
+    body = _safe_json(res)
+
+    if res.status_code in (200, 201):
+        contact_id = body.get("id")
+        replica_upsert("contacts", body)
+    elif res.status_code == 409:
+        msg = body.get("message", "")
+        if "Existing ID:" in msg:
+            contact_id = msg.split("Existing ID:")[-1].strip()
+        logger.info(f"Contact already exists: {contact_id}")
+    else:
+        raise HTTPException(status_code=res.status_code, detail=res.text)
+
+    return contact_id
+
+
+async def create_deal(data: dict, company_id: str = None, contact_id: str = None):
+    """
+    Creates the transport deal from pickup/delivery/vehicle data.
+    When company/contact ids are given they are associated inline on create.
+    Returns the deal id.
+    """
+    pickup = data.get("pickup", {}) or {}
+    delivery = data.get("delivery", {}) or {}
+    from_location = f"{pickup.get('city', '')}\n{pickup.get('state', '')}\n{pickup.get('zip', '')}"
+    to_location = f"{delivery.get('city', '')}\n{delivery.get('state', '')}\n{delivery.get('zip', '')}"
+    vehicles = data.get("vehicles", []) or []
+    vehicles_list = [f"{v['year']} {v['make']} {v['model']} ({v['type']})" for v in vehicles]
+    number_of_vehicles = len(vehicles_list)
+    formatted_vehicles = "\n".join(vehicles_list)
+
+    # 🔧 Compose deal name dynamically
+    if vehicles:
+        vehicle_names = [f"{v.get('year', '')} {v.get('make', '')} {v.get('model', '')}".strip() for v in vehicles]
+        if len(vehicle_names) == 1:
+            vehicle_str = vehicle_names[0]
         else:
-            deal_name = f"{data.get('contact_name')} Quote"
-
-        deal_payload = {
-            "properties": {
-                "dealname": deal_name,
-                "from": from_location,
-                "to": to_location,
-                "vehicles_json": str(formatted_vehicles),
-                "number_of_vehicles": number_of_vehicles
-            }
+            vehicle_str = f"{number_of_vehicles} vehicles"
+        deal_name = f"Shipping {vehicle_str} from {pickup.get('city', '')} to {delivery.get('city', '')}"
+    else:
+        deal_name = f"{data.get('contact_name')} Quote"
+
+    deal_payload = {
+        "properties": {
+            "dealname": deal_name,
+            "from": from_location,
+            "to": to_location,
+            "vehicles_json": str(formatted_vehicles),
+            "number_of_vehicles": number_of_vehicles
         }
+    }
+    associations = []
+    if company_id:
+        associations.append(inline_association(company_id, DEAL_TO_COMPANY_TYPE_ID))
+    if contact_id:
+        associations.append(inline_association(contact_id, DEAL_TO_CONTACT_TYPE_ID))
+    if associations:
+        deal_payload["associations"] = associations
+
+    deal_id = None
+    res = await hubspot_send("POST", "/crm/v3/objects/deals", json=deal_payload)
+    logger.info(f"Deal response: {res.status_code}")
+    log_payload(logger, "Deal response body", res.text)
+    body = _safe_json(res)
+
+    if res.status_code in (200, 201):
+        deal_id = body.get("id")
+        replica_upsert("deals", body)
+    elif res.status_code == 409:
+        msg = body.get("message", "")
+        if "Existing ID:" in msg:
+            deal_id = msg.split("Existing ID:")[-1].strip()
+        logger.info(f"Deal already exists: {deal_id}")
+    else:
+        raise HTTPException(status_code=res.status_code, detail=res.text)
+
+    return deal_id
+
+
+async def update_deal_properties(deal_id: str, properties: dict):
+    """PATCH deal properties; returns the HubSpot response."""
+    res = await hubspot_send("PATCH", f"/crm/v3/objects/0-3/{deal_id}", json={"properties": properties})
+    logger.info(f"Deal update response: {res.status_code}")
+    log_payload(logger, "Deal update response body", res.text)
+    return res
 
-        deal_id = None
-        async with session.post(f"{HUBSPOT_BASE_URL}/crm/v3/objects/deals", json=deal_payload) as res:
-            text = await res.text()
-            logger.info(f"Deal response: {res.status} {text}")
-            try:
-                body = await res.json()
-            except Exception:
-                body = {}
-
-            if res.status in (200, 201):
-                deal_id = body.get("id")
-            elif res.status == 409:
-                msg = body.get("message", "")
-                if "Existing ID:" in msg:
-                    deal_id = msg.split("Existing ID:")[-1].strip()
-                logger.info(f"Deal already exists: {deal_id}")
-            else:
-                raise HTTPException(status_code=res.status, detail=text)
-
-        # --------------------------------------------------------------
-        # 3️⃣ Create ASSOCIATIONS (bi‑directional)
-        # --------------------------------------------------------------
-        async def associate(from_type, to_type, from_id, to_id, assoc_type):
-            url = f"https://api.hubapi.com/crm/v3/associations/{from_type}/{to_type}/batch/create"
-            payload = {"inputs": [{"from": {"id": from_id}, "to": {"id": to_id}, "type": assoc_type}]}
-            async with session.post(url, json=payload) as res:
-                logger.info(f"Assoc {from_type}->{to_type} ({assoc_type}): {res.status} {await res.text()}")
-
-        # Deal ↔ Company
-        if deal_id and company_id:
-            await associate("deals", "companies", deal_id, company_id, "deal_to_company")
-            await associate("companies", "deals", company_id, deal_id, "company_to_deal")
-
-        # Deal ↔ Contact
-        if deal_id and contact_id:
-            await associate("deals", "contacts", deal_id, contact_id, "deal_to_contact")
-            await associate("contacts", "deals", contact_id, deal_id, "contact_to_deal")
-
-        # Company ↔ Contact
-        if company_id and contact_id:
-            await associate("companies", "contacts", company_id, contact_id, "company_to_contact")
-            await associate("contacts", "companies", contact_id, company_id, "contact_to_company")
-
-        # --------------------------------------------------------------
-        # 4️⃣ Return IDs
-        # --------------------------------------------------------------
-        logger.info(f"HubSpot IDs → Company: {company_id}, Contact: {contact_id}, Deal: {deal_id}")
-        return {"company_id": company_id, "contact_id": contact_id, "deal_id": deal_id}
-
-from datetime import datetime, timezone
-import aiohttp
 
 async def send_quote_email(data: dict):
     """
@@ -256,84 +597,75 @@ async def send_quote_email(data: dict):
     creates an EMAIL engagement, and associates it
     bidirectionally with the deal.
     """
-    async with aiohttp.ClientSession(headers=HEADERS) as session:
-        # ---------------------------------------------------------
-        # 1️⃣ Update deal custom properties
-        # ---------------------------------------------------------
-        deal_payload = {
-            "properties": {
-                "distance_miles": data["distance_miles"],
-                "amount": data['quote_amount'],
-                "dealstage": "contractsent"  # Add the deal stage update
-            }
+    # ---------------------------------------------------------
+    # 1️⃣ Update deal custom properties
+    # ---------------------------------------------------------
+    deal_payload = {
+        "properties": {
+            "distance_miles": data["distance_miles"],
+            "amount": data['quote_amount'],
+            "dealstage": "contractsent"  # Add the deal stage update
         }
+    }
 
-        logger.info(
-            f"Updating deal {data['deal_id']} with distance, quote amount, and stage {deal_payload}"
-        )
+    logger.info(f"Updating deal {data['deal_id']} with distance, quote amount, and stage")
+    log_payload(logger, "Deal update payload", deal_payload)
 
-        async with session.patch(
-            f"{HUBSPOT_BASE_URL}/crm/v3/objects/0-3/{data['deal_id']}",
-            json=deal_payload,
-        ) as res:
-            deal_text = await res.text()
-            logger.info(f"Deal update response: {res.status} {deal_text}")
-
-        # ---------------------------------------------------------
-        # 2️⃣ Create EMAIL engagement
-        # ---------------------------------------------------------
-        hs_timestamp = int(datetime.now(timezone.utc).timestamp() * 1000)
-        email_props = {
-            "hs_email_direction": "EMAIL",
-            "hs_email_subject": data["email_subject"],
-            "hs_email_text": data["email_body"],
-            "hs_timestamp": hs_timestamp,
-        }
+    await update_deal_properties(data["deal_id"], deal_payload["properties"])
 
-        async with session.post(
-            f"{HUBSPOT_BASE_URL}/crm/v3/objects/emails",
-            json={"properties": email_props},
-        ) as res:
-            create_text = await res.text()
-            logger.info(f"Email create response: {res.status} {res}")
-            try:
-                email_json = await res.json()
-            except Exception:
-                email_json = {}
-            email_id = email_json.get("id")
-
-        # ---------------------------------------------------------
-        # 3️⃣ Bidirectional association: Email ↔ Deal
-        # ---------------------------------------------------------
-        async def associate(from_type, to_type, from_id, to_id, assoc_type):
-            url = f"https://api.hubapi.com/crm/v3/associations/{from_type}/{to_type}/batch/create"
-            payload = {"inputs": [{"from": {"id": from_id}, "to": {"id": to_id}, "type": assoc_type}]}
-            async with session.post(url, json=payload) as r:
-                text = await r.text()
-                logger.info(f"Assoc {from_type}->{to_type} ({assoc_type}): {r.status} {text}")
-
-        if email_id:
-            # Email → Deal
-            await associate("emails", "deals", email_id, data["deal_id"], "email_to_deal")
-            # Deal → Email
-            await associate("deals", "emails", data["deal_id"], email_id, "deal_to_email")
-        else:
-            logger.warning("No email_id returned; skipping associations.")
+    # ---------------------------------------------------------
+    # 2️⃣ Create EMAIL engagement
+    # ---------------------------------------------------------
+    hs_timestamp = int(datetime.now(timezone.utc).timestamp() * 1000)
+    email_props = {
+        "hs_email_direction": "EMAIL",
+        "hs_email_subject": data["email_subject"],
+        "hs_email_text": data["email_body"],
+        "hs_timestamp": hs_timestamp,
+    }
+
+    # 3️⃣ Email ↔ Deal association is set inline on create (bidirectional)
+    res = await hubspot_send(
+        "POST",
+        "/crm/v3/objects/emails",
+        json={
+            "properties": email_props,
+            "associations": [inline_association(data["deal_id"], EMAIL_TO_DEAL_TYPE_ID)],
+        },
+    )
+    logger.info(f"Email create response: {res.status_code}")
+    log_payload(logger, "Email create response body", res.text)
+    email_id = _safe_json(res).get("id")
+
+    if not email_id:
+        logger.warning("No email_id returned; email not associated.")
+
+    # ---------------------------------------------------------
+    # 4️⃣ Return IDs
+    # ---------------------------------------------------------
+    logger.info(f"HubSpot email↔deal association complete: Email {email_id}, Deal {data['deal_id']}")
+    return {"deal_id": data["deal_id"], "email_id": email_id}
 
-        # ---------------------------------------------------------
-        # 4️⃣ Return IDs
-        # ---------------------------------------------------------
-        logger.info(f"HubSpot email↔deal association complete: Email {email_id}, Deal {data['deal_id']}")
-        return {"deal_id": data["deal_id"], "email_id": email_id}
-    
 
 async def hubspot_find_company_by_name(company_name: str):
     """
     Search HubSpot for a company by name.
     Returns the first matching record or None if not found.
+    Answers from the replica or the company cache when possible. A replica
+    miss still goes to HubSpot: the company may have been created there
+    before its webhook reached us, and a miss leads to a create.
     """
-    url = "https://api.hubapi.com/crm/v3/objects/companies/search"
-    headers = {"Authorization": f"Bearer {HUBSPOT_TOKEN}"}
+    replica = get_ready_replica()
+    if replica is not None:
+        company = replica.find_company_by_name(company_name)
+        if company is not None:
+            return company
+
+    key = normalize_company_name(company_name)
+    cached = company_cache.get(key, _NOT_CACHED)
+    if cached is not _NOT_CACHED:
+        return cached
+
     payload = {
         "filterGroups": [{
             "filters": [{
@@ -341,23 +673,31 @@ async def hubspot_find_company_by_name(company_name: str):
                 "operator": "EQ",
                 "value": company_name
             }]
-        }]
+        }],
+        # Domain/owner let callers skip enrichment for companies that already have them
+        "properties": ["name", "domain", "hubspot_owner_id"]
     }
 
-    async with aiohttp.ClientSession() as session:
-        async with session.post(url, headers=headers, json=payload) as resp:
-            data = await resp.json()
-            results = data.get("results", [])
-            return results[0] if results else None
+    resp = await hubspot_send("POST", "/crm/v3/objects/companies/search", json=payload)
+    if resp.status_code >= 400:
+        logger.error(f"HubSpot company search failed {resp.status_code}: {resp.text}")
+        return None
+
+    results = _safe_json(resp).get("results", [])
+    company = results[0] if results else None
+    if company:
+        company_cache.set(key, company)
+    else:
+        company_cache.set(key, None, ttl=settings.COMPANY_NEGATIVE_TTL)
+    return company
 
 
 async def hubspot_create_company(company_payload: dict):
     """
     Creates a new HubSpot company.
     """
-    url = "https://api.hubapi.com/crm/v3/objects/companies"
-    headers = {"Authorization": f"Bearer {HUBSPOT_TOKEN}"}
-
-    async with aiohttp.ClientSession() as session:
-        async with session.post(url, headers=headers, json=company_payload) as resp:
-            return await resp.json()
\ No newline at end of file
+    resp = await hubspot_send("POST", "/crm/v3/objects/companies", json=company_payload)
+    company = _safe_json(resp)
+    cache_company(company)
+    replica_upsert("companies", company)
+    return company
@@ -0,0 +1,218 @@
+import asyncio
+import time
+from typing import Optional
+from app.core.config import settings
+from app.core.logger import get_logger
+from app.services import hubspot_replica
+from app.services.company_directory import company_directory
+from app.services.hubspot_service import hubspot_request
+
+logger = get_logger(__name__)
+
+# Properties mirrored per object type
+SYNC_PROPERTIES = {
+    "companies": ["name", "domain", "phone", "address", "address2", "city", "state", "zip", "country",
+                  "hubspot_owner_id", "hs_lastmodifieddate"],
+    "contacts": ["firstname", "lastname", "email", "phone", "lastmodifieddate"],
+    "deals": ["dealname", "amount", "dealstage", "pipeline", "closedate", "hs_lastmodifieddate"],
+}
+
+# Webhook subscriptionType prefix -> CRM object type
+EVENT_OBJECT_TYPES = {"company": "companies", "contact": "contacts", "deal": "deals"}
+DELETE_EVENTS = {"deletion", "privacyDeletion"}
+
+BATCH_READ_SIZE = 100
+
+sync_stats = {
+    "events_received": 0,
+    "events_ignored": 0,
+    "objects_refreshed": 0,
+    "objects_deleted": 0,
+    "failed_batches": 0,
+    "last_event_lag_ms": None,
+    "max_event_lag_ms": 0,
+}
+
+
+# -------------------------------------------------------------------
+# Webhook events -> sync queue
+# -------------------------------------------------------------------
+_queue: Optional[asyncio.Queue] = None
+_worker: Optional[asyncio.Task] = None
+_background: set[asyncio.Task] = set()
+
+
+def enqueue_webhook_events(events: list[dict]) -> int:
+    """
+    Queue webhook events for the sync worker; returns how many were accepted.
+    Property-change events only carry one property, so the worker re-reads the
+    whole record instead of applying the event payload.
+    """
+    accepted = 0
+    for event in events:
+        sync_stats["events_received"] += 1
+        prefix, _, action = (event.get("subscriptionType") or "").partition(".")
+        object_type = EVENT_OBJECT_TYPES.get(prefix)
+        object_id = event.get("objectId")
+        if _queue is None or object_type is None or object_id is None:
+            sync_stats["events_ignored"] += 1
+            continue
+        _queue.put_nowait((object_type, str(object_id), action in DELETE_EVENTS, event.get("occurredAt")))
+        accepted += 1
+    return accepted
+
+
+async def _drain_batch() -> list[tuple]:
+    """Wait for one event, then take whatever else arrived so reads can be batched."""
+    batch = [await _queue.get()]
+    await asyncio.sleep(settings.HUBSPOT_SYNC_BATCH_WINDOW_MS / 1000)
+    while not _queue.empty() and len(batch) < BATCH_READ_SIZE:
+        batch.append(_queue.get_nowait())
+    return batch
+
+
+async def _apply_batch(batch: list[tuple]):
+    replica = hubspot_replica.replica
+    # Last event per object wins (e.g. an update followed by a delete)
+    latest = {(object_type, object_id): deleted for object_type, object_id, deleted, _ in batch}
+
+    by_type: dict[str, dict[str, list[str]]] = {}
+    for (object_type, object_id), deleted in latest.items():
+        by_type.setdefault(object_type, {"refresh": [], "delete": []})["delete" if deleted else "refresh"].append(object_id)
+
+    for object_type, ids in by_type.items():
+        if ids["delete"]:
+            replica.delete_many(object_type, ids["delete"])
+            sync_stats["objects_deleted"] += len(ids["delete"])
+            if object_type == "companies":
+                company_directory.remove(ids["delete"])
+        if ids["refresh"]:
+            records = await batch_read(object_type, ids["refresh"])
+            replica.upsert_many(object_type, records)
+            sync_stats["objects_refreshed"] += len(records)
+            if object_type == "companies":
+                company_directory.upsert(records)
+
+    now_ms = time.time() * 1000
+    occurred = [o for *_, o in batch if o]
+    if occurred:
+        lag = round(now_ms - min(occurred))
+        sync_stats["last_event_lag_ms"] = lag
+        sync_stats["max_event_lag_ms"] = max(sync_stats["max_event_lag_ms"], lag)
+    replica.set_state("last_event_applied_at", time.time())
+
+
+async def _sync_worker():
+    while True:
+        batch = await _drain_batch()
+        try:
+            await _apply_batch(batch)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # The next full resync repairs anything we missed here
+            sync_stats["failed_batches"] += 1
+            logger.exception(f"HubSpot sync batch of {len(batch)} events failed: {e}")
+        finally:
+            for _ in batch:
+                _queue.task_done()
+
+
+# -------------------------------------------------------------------
+# HubSpot reads used by the worker and full resync
+# -------------------------------------------------------------------
+async def batch_read(object_type: str, ids: list[str]) -> list[dict]:
+    records = []
+    for i in range(0, len(ids), BATCH_READ_SIZE):
+        data = await hubspot_request(
+            "POST",
+            f"/crm/v3/objects/{object_type}/batch/read",
+            json={
+                "properties": SYNC_PROPERTIES[object_type],
+                "inputs": [{"id": object_id} for object_id in ids[i:i + BATCH_READ_SIZE]],
+            },
+        )
+        records.extend(data.get("results", []))
+    return records
+
+
+async def full_resync(object_types=hubspot_replica.OBJECT_TYPES) -> dict:
+    """
+    Page through every object of each type into the replica (cold start or repair).
+    Rows the resync didn't touch were deleted in HubSpot and are dropped.
+    """
+    replica = hubspot_replica.replica
+    if replica is None:
+        raise RuntimeError("HubSpot replica is not enabled (HUBSPOT_REPLICA_ENABLED)")
+
+    counts = {}
+    for object_type in object_types:
+        started = time.time()
+        after, total = None, 0
+        while True:
+            params = {"limit": 100, "properties": ",".join(SYNC_PROPERTIES[object_type]), "archived": "false"}
+            if after:
+                params["after"] = after
+            data = await hubspot_request("GET", f"/crm/v3/objects/{object_type}", params=params)
+            total += replica.upsert_many(object_type, data.get("results", []), synced_at=time.time())
+            after = data.get("paging", {}).get("next", {}).get("after")
+            if not after:
+                break
+
+        removed = replica.delete_stale(object_type, started)
+        replica.set_state(f"full_sync:{object_type}", time.time())
+        counts[object_type] = total
+        logger.info(f"HubSpot replica full resync of {object_type}: {total} rows, {removed} removed")
+    return counts
+
+
+# -------------------------------------------------------------------
+# Lifecycle (lifespan) and stats
+# -------------------------------------------------------------------
+async def _cold_start():
+    try:
+        await full_resync()
+    except Exception as e:
+        logger.exception(f"HubSpot replica cold-start resync failed: {e}")
+
+
+def start_hubspot_sync():
+    global _queue, _worker
+    replica = hubspot_replica.open_hubspot_replica()
+    if replica is None:
+        return
+    _queue = asyncio.Queue()
+    _worker = asyncio.create_task(_sync_worker())
+    if not replica.ready:
+        _background.add(task := asyncio.create_task(_cold_start()))
+        task.add_done_callback(_background.discard)
+
+
+async def stop_hubspot_sync():
+    global _queue, _worker
+    if _worker is not None:
+        # Apply what's already queued, then stop
+        try:
+            await asyncio.wait_for(_queue.join(), timeout=5)
+        except asyncio.TimeoutError:
+            logger.warning(f"HubSpot sync stopped with {_queue.qsize()} events pending")
+        for task in [_worker, *_background]:
+            task.cancel()
+        await asyncio.gather(_worker, *_background, return_exceptions=True)
+        _worker, _queue = None, None
+    hubspot_replica.close_hubspot_replica()
+
+
+def get_hubspot_sync_stats() -> dict:
+    replica = hubspot_replica.replica
+    if replica is None:
+        return {"enabled": False}
+    last_applied = replica.get_state("last_event_applied_at")
+    return {
+        "enabled": True,
+        "ready": replica.ready,
+        "rows": replica.counts(),
+        "pending_events": _queue.qsize() if _queue is not None else 0,
+        "seconds_since_last_event": round(time.time() - last_applied, 1) if last_applied else None,
+        **sync_stats,
+    }
@@ -1,7 +1,10 @@
-import aiohttp
 import json
+from app.core.cache import TieredCache
 from app.core.config import settings
-from app.core.logger import get_logger
+from app.core.http_client import get_http_client, upstream_call
+from app.core.jobs import enqueue_job, register_job
+from app.core.logger import get_logger, log_payload
+from app.services.hubspot_service import company_cache, hubspot_send, normalize_company_name
 
 logger = get_logger(__name__)
 
@@ -9,45 +12,125 @@ HUBSPOT_BASE_URL = settings.HUBSPOT_BASE_URL
 HUBSPOT_ACCESS_TOKEN = settings.HUBSPOT_TOKEN
 ENRICHMENT_URL = settings.COMPANY_DETAIL_EXTRACTOR_URL
 
-async def enrich_company_data(company_id: str, company_name: str):
-    """Fetch enrichment info and update HubSpot company."""
-    try:
-        async with aiohttp.ClientSession() as session:
-            # Fetch the enrichment data
-            payload = {
-                "session_id": "1761633122763",  # static or from config
-                "message": company_name,        # required as per your spec
-                "agent_id": "68ff216f264610a11c1164a1"
-            }
-
-            # Send POST request
-            async with session.post(ENRICHMENT_URL, json=payload) as res:
-                data = await res.json()
-                logger.info(f"Enrichment response for {company_name}: {data}")
-
-            parsed = json.loads(data.get("text", "{}"))
-            domain = parsed.get("domain")
-            owner_name = parsed.get("Owner_name")
-
-            if not domain and not owner_name:
-                logger.warning(f"No enrichment data for company {company_name}")
-                return
-
-            payload = {
-                "properties": {
-                    "domain": domain,
-                    "hubspot_owner_id": owner_name
-                }
-            }
-
-            async with session.patch(
-                f"{HUBSPOT_BASE_URL}/crm/v3/objects/0-2/{company_id}",
-                headers={"Authorization": f"Bearer {HUBSPOT_ACCESS_TOKEN}"},
-                json=payload
-            ) as hubspot_res:
-                text = await hubspot_res.text()
-                logger.info(f"HubSpot update: {hubspot_res.status} {text}")
-
-    except Exception as e:
-        logger.exception(f"Error updating company {company_name} ({company_id}): {e}")
+ENRICH_COMPANY_JOB = "enrich_company"
 
+# Company properties the enrichment agent fills in
+ENRICHED_PROPERTIES = ("domain", "hubspot_owner_id")
+
+# Agent results by normalized company name, so a company is only sent to the
+# agent once per TTL no matter how often it is quoted.
+enrichment_cache = TieredCache(
+    "enrichment", maxsize=settings.ENRICHMENT_CACHE_SIZE, ttl=settings.ENRICHMENT_CACHE_TTL
+)
+enrichment_stats = {"skipped": 0, "queued": 0, "cache_hits": 0, "agent_calls": 0, "patched": 0, "rejected": 0}
+
+
+def _rejected_key(company_id: str) -> str:
+    # Companies whose enrichment PATCH HubSpot refused, kept in the same cache
+    return f"rejected:{company_id}"
+
+
+def get_enrichment_stats() -> dict:
+    return {**enrichment_stats, "cache": enrichment_cache.stats()}
+
+
+async def fetch_enrichment(company_name: str) -> dict:
+    """Ask the company-detail extractor agent for the company's domain and owner."""
+    key = normalize_company_name(company_name)
+    cached = enrichment_cache.get(key)
+    if cached is not None:
+        enrichment_stats["cache_hits"] += 1
+        return cached
+
+    # Fetch the enrichment data
+    payload = {
+        "session_id": "1761633122763",  # static or from config
+        "message": company_name,        # required as per your spec
+        "agent_id": "68ff216f264610a11c1164a1"
+    }
+
+    # Send POST request
+    enrichment_stats["agent_calls"] += 1
+    async with upstream_call("agent", "company_enrichment"):
+        res = await get_http_client("agent").post(ENRICHMENT_URL, json=payload)
+    res.raise_for_status()
+    data = res.json()
+    log_payload(logger, f"Enrichment response for {company_name}", data)
+
+    parsed = json.loads(data.get("text", "{}"))
+    result = {"domain": parsed.get("domain"), "hubspot_owner_id": parsed.get("Owner_name")}
+    found = any(result.values())
+    enrichment_cache.set(key, result, ttl=None if found else settings.ENRICHMENT_NEGATIVE_TTL)
+    return result
+
+
+async def enrich_company_data(company_id: str, company_name: str, fields: list[str] = None):
+    """
+    Fetch enrichment info and update HubSpot company.
+    Only `fields` (default: all enriched properties) are written, so values
+    already set on the company are left alone. Runs as a background job (see
+    enqueue_company_enrichment); errors propagate so the queue can retry.
+    """
+    enrichment = await fetch_enrichment(company_name)
+    properties = {f: enrichment.get(f) for f in (fields or ENRICHED_PROPERTIES) if enrichment.get(f)}
+
+    if not properties:
+        logger.warning(f"No enrichment data for company {company_name}")
+        return
+
+    payload = {"properties": properties}
+
+    hubspot_res = await hubspot_send("PATCH", f"/crm/v3/objects/0-2/{company_id}", json=payload)
+    logger.info(f"HubSpot update: {hubspot_res.status_code}")
+    log_payload(logger, "HubSpot update response body", hubspot_res.text)
+    if hubspot_res.status_code >= 500 or hubspot_res.status_code == 429:
+        hubspot_res.raise_for_status()
+    if hubspot_res.status_code >= 400:
+        # Rejected for good (e.g. an owner name HubSpot won't take as hubspot_owner_id);
+        # remember the company so later quotes don't queue the same PATCH again
+        enrichment_stats["rejected"] += 1
+        enrichment_cache.set(_rejected_key(company_id), {"status": hubspot_res.status_code, "fields": list(properties)})
+        logger.warning(
+            f"HubSpot rejected enrichment of company {company_name} ({company_id}) "
+            f"with {hubspot_res.status_code}; not retrying until the enrichment cache expires"
+        )
+        return
+
+    enrichment_stats["patched"] += 1
+    # Let the cached record reflect the patch so the next quote skips enrichment
+    key = normalize_company_name(company_name)
+    cached = company_cache.get(key)
+    if cached and cached.get("id") == company_id:
+        company_cache.set(key, {**cached, "properties": {**cached.get("properties", {}), **properties}})
+
+
+register_job(ENRICH_COMPANY_JOB, enrich_company_data)
+
+
+def enqueue_company_enrichment(company_id: str, company_name: str, properties: dict = None):
+    """
+    Queue enrichment for a company, unless its enriched properties are already
+    populated, HubSpot rejected an earlier enrichment PATCH for it, or a job
+    for it is already pending.
+    """
+    missing = [p for p in ENRICHED_PROPERTIES if not (properties or {}).get(p)]
+    if not missing:
+        enrichment_stats["skipped"] += 1
+        logger.info(f"Company {company_name} ({company_id}) already enriched; skipping")
+        return None
+    if enrichment_cache.get(_rejected_key(company_id)) is not None:
+        enrichment_stats["skipped"] += 1
+        logger.info(f"Enrichment of company {company_name} ({company_id}) was rejected before; skipping")
+        return None
+
+    job_id = enqueue_job(
+        ENRICH_COMPANY_JOB,
+        {"company_id": company_id, "company_name": company_name, "fields": missing},
+        dedup_key=f"{ENRICH_COMPANY_JOB}:{company_id}",
+    )
+    if job_id is None:
+        logger.info(f"Enrichment already queued for company {company_name} ({company_id})")
+    else:
+        enrichment_stats["queued"] += 1
+        logger.info(f"Queued enrichment job {job_id} for company {company_name}")
+    return job_id
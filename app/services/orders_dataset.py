@@ -0,0 +1,276 @@
+import csv
+import json
+import re
+import time
+import uuid
+from datetime import date
+from pathlib import Path
+from typing import Iterator, Optional
+import pyarrow as pa
+import pyarrow.ipc as ipc
+from app.core.logger import get_logger
+from app.services.zip_database import ZipDatabase
+
+logger = get_logger(__name__)
+
+# -------------------------------------------------------------------
+# Cleaned, typed orders dataset (Arrow IPC)
+#
+# scripts/ingest_orders.py streams Orders_Master.csv in chunks, cleans each
+# row and appends it to a dataset partitioned by pickup month:
+#
+#   <dataset>/pickup_month=2024-08/part-<run>.arrow
+#   <dataset>/_manifest.json        one entry per ingest run
+#
+# Re-running on a grown or re-exported CSV only writes orders whose order_id
+# is not in the dataset yet. The service memory-maps the files at startup
+# (open_orders_dataset) and takes typed columns from them, so nothing is
+# parsed; see route_history.load_orders_dataset for what gets copied.
+# -------------------------------------------------------------------
+MANIFEST = "_manifest.json"
+CHUNK_ROWS = 50_000
+
+
+def _schema():
+    return pa.schema([
+        pa.field("order_id", pa.string(), nullable=False),
+        pa.field("customer_name", pa.string()),
+        pa.field("carrier_name", pa.string()),
+        pa.field("vehicles_count", pa.int16()),
+        pa.field("vehicle_type", pa.string()),
+        pa.field("vehicle_make", pa.string()),
+        pa.field("vehicle_model", pa.string()),
+        pa.field("vehicle_year", pa.int16()),
+        pa.field("pickup_zip", pa.string()),
+        pa.field("pickup_city", pa.string()),
+        pa.field("pickup_state", pa.string()),
+        pa.field("pickup_lat", pa.float32()),
+        pa.field("pickup_lon", pa.float32()),
+        pa.field("delivery_zip", pa.string()),
+        pa.field("delivery_city", pa.string()),
+        pa.field("delivery_state", pa.string()),
+        pa.field("delivery_lat", pa.float32()),
+        pa.field("delivery_lon", pa.float32()),
+        pa.field("customer_zip", pa.string()),
+        pa.field("distance_miles", pa.float32()),
+        pa.field("pickup_date", pa.date32()),
+        pa.field("delivery_date", pa.date32()),
+        pa.field("transit_days", pa.int16()),
+        pa.field("order_cost", pa.float64()),
+        pa.field("order_price", pa.float64()),
+        pa.field("gross_profit", pa.float64()),
+        pa.field("margin_pct", pa.float32()),
+    ])
+
+
+# -------------------------------------------------------------------
+# Row cleaning
+# -------------------------------------------------------------------
+def clean_zip(value) -> str:
+    """'7047', '07047', '67213.0', '02134-1234' -> 5-digit ZIP ('' when unusable)."""
+    text = str(value or "").strip().split("-")[0]
+    if text.endswith(".0"):
+        text = text[:-2]
+    # Leading zeros are lost in spreadsheet exports, but no ZIP is below 00501
+    if not text.isdigit() or not 3 <= len(text) <= 5:
+        return ""
+    return text.zfill(5)
+
+
+def clean_text(value) -> Optional[str]:
+    text = re.sub(r"\s+", " ", str(value or "")).strip()
+    return text or None
+
+
+def clean_city(value) -> Optional[str]:
+    text = clean_text(value)
+    return text.title() if text and (text.isupper() or text.islower()) else text
+
+
+def clean_money(value) -> Optional[float]:
+    text = str(value or "").strip().replace("$", "").replace(",", "")
+    if not text:
+        return None
+    try:
+        return round(float(text), 2)
+    except ValueError:
+        raise ValueError(f"invalid amount: {value!r}")
+
+
+def clean_float(value) -> Optional[float]:
+    text = str(value or "").strip()
+    return float(text) if text else None
+
+
+def clean_int(value) -> Optional[int]:
+    text = str(value or "").strip()
+    return int(float(text)) if text else None
+
+
+def clean_date(value) -> Optional[date]:
+    text = str(value or "").strip()
+    try:
+        return date.fromisoformat(text[:10]) if text else None
+    except ValueError:
+        raise ValueError(f"invalid date: {value!r}")
+
+
+class OrderCleaner:
+    """
+    Normalizes raw Orders_Master.csv rows. With a ZIP database, missing
+    cities/states and ZIP centroids are filled in and full state names are
+    reduced to their abbreviation.
+    """
+
+    def __init__(self, zip_db: Optional[ZipDatabase] = None):
+        self.zip_db = zip_db
+        self.state_abbr = {}
+        if zip_db is not None:
+            self.state_abbr = {name.lower(): abbr for abbr, name in zip_db.states if name and abbr}
+
+    def _state(self, value) -> Optional[str]:
+        text = clean_text(value)
+        if not text:
+            return None
+        if len(text) == 2:
+            return text.upper()
+        return self.state_abbr.get(text.lower(), text)
+
+    def _place(self, row: dict, prefix: str) -> dict:
+        zipcode = clean_zip(row.get(f"{prefix}_zip"))
+        place = self.zip_db.lookup(zipcode) if self.zip_db is not None and zipcode else None
+        return {
+            f"{prefix}_zip": zipcode or None,
+            f"{prefix}_city": clean_city(row.get(f"{prefix}_city")) or (place["city"] if place else None),
+            f"{prefix}_state": self._state(row.get(f"{prefix}_state")) or (place["state_abbr"] if place else None),
+            f"{prefix}_lat": place["lat"] if place else None,
+            f"{prefix}_lon": place["lon"] if place else None,
+        }
+
+    def clean(self, row: dict) -> dict:
+        """Cleaned order dict; raises ValueError for rows that can't be used."""
+        order_id = clean_text(row.get("order_id"))
+        if not order_id:
+            raise ValueError("missing order_id")
+        if order_id.endswith(".0"):
+            order_id = order_id[:-2]
+
+        order = {
+            "order_id": order_id,
+            "customer_name": clean_text(row.get("customer_name")),
+            "carrier_name": clean_text(row.get("carrier_name")),
+            "vehicles_count": max(clean_int(row.get("vehicles_count")) or 1, 1),
+            "vehicle_type": (clean_text(row.get("vehicle_type")) or "").lower() or None,
+            "vehicle_make": clean_city(row.get("vehicle_make")),
+            "vehicle_model": clean_text(row.get("vehicle_model")),
+            "vehicle_year": clean_int(row.get("vehicle_year")),
+            **self._place(row, "pickup"),
+            **self._place(row, "delivery"),
+            "customer_zip": clean_zip(row.get("customer_zip")) or None,
+            "distance_miles": clean_float(row.get("distance_miles")),
+            "pickup_date": clean_date(row.get("pickup_date")),
+            "delivery_date": clean_date(row.get("delivery_date")),
+            "transit_days": clean_int(row.get("transit_days")),
+            "order_cost": clean_money(row.get("order_cost")),
+            "order_price": clean_money(row.get("order_price")),
+            "gross_profit": clean_money(row.get("gross_profit")),
+            "margin_pct": clean_float(row.get("margin_pct")),
+        }
+        if not order["pickup_zip"] or not order["delivery_zip"]:
+            raise ValueError("missing pickup or delivery ZIP")
+        if order["order_price"] is None:
+            raise ValueError("missing order_price")
+        return order
+
+
+def iter_csv_chunks(csv_path: Path, chunk_rows: int = CHUNK_ROWS) -> Iterator[list[dict]]:
+    with open(csv_path, newline="", encoding="utf-8-sig") as f:
+        chunk = []
+        for row in csv.DictReader(f):
+            chunk.append(row)
+            if len(chunk) >= chunk_rows:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+# -------------------------------------------------------------------
+# Arrow dataset read/write
+# -------------------------------------------------------------------
+def dataset_files(dataset_dir: Path) -> list[Path]:
+    return sorted(Path(dataset_dir).glob("pickup_month=*/*.arrow"))
+
+
+def open_orders_dataset(dataset_dir: Path, columns: list[str] = None):
+    """Memory-map every part file into one (chunked) pyarrow Table without copying."""
+    tables = []
+    for path in dataset_files(dataset_dir):
+        table = ipc.open_file(pa.memory_map(str(path), "r")).read_all()
+        tables.append(table.select(columns) if columns else table)
+    if not tables:
+        schema = _schema()
+        return schema.empty_table().select(columns) if columns else schema.empty_table()
+    return pa.concat_tables(tables)
+
+
+def _partition(order: dict) -> str:
+    pickup = order["pickup_date"]
+    return f"pickup_month={pickup:%Y-%m}" if pickup else "pickup_month=unknown"
+
+
+def ingest_orders(csv_path: Path, dataset_dir: Path, zip_db: Optional[ZipDatabase] = None,
+                  chunk_rows: int = CHUNK_ROWS) -> dict:
+    """
+    Clean `csv_path` chunk by chunk and append orders not yet in the dataset.
+    Returns the run summary that is also recorded in the manifest.
+    """
+    dataset_dir = Path(dataset_dir)
+    dataset_dir.mkdir(parents=True, exist_ok=True)
+    schema = _schema()
+    cleaner = OrderCleaner(zip_db)
+
+    seen = set(open_orders_dataset(dataset_dir, ["order_id"]).column("order_id").to_pylist())
+    # Unique even for runs started in the same second, so part files never collide
+    run_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    writers: dict[str, tuple] = {}
+    summary = {"run": run_id, "source": str(csv_path), "read": 0, "written": 0, "duplicates": 0, "rejected": {}}
+
+    try:
+        for chunk in iter_csv_chunks(csv_path, chunk_rows):
+            partitions: dict[str, list[dict]] = {}
+            for row in chunk:
+                summary["read"] += 1
+                try:
+                    order = cleaner.clean(row)
+                except ValueError as e:
+                    reason = str(e).split(":")[0]
+                    summary["rejected"][reason] = summary["rejected"].get(reason, 0) + 1
+                    continue
+                if order["order_id"] in seen:
+                    summary["duplicates"] += 1
+                    continue
+                seen.add(order["order_id"])
+                partitions.setdefault(_partition(order), []).append(order)
+
+            for partition, orders in partitions.items():
+                if partition not in writers:
+                    path = dataset_dir / partition / f"part-{run_id}.arrow"
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    sink = pa.OSFile(str(path), "wb")
+                    writers[partition] = (sink, ipc.new_file(sink, schema))
+                columns = {name: [order[name] for order in orders] for name in schema.names}
+                writers[partition][1].write_batch(pa.RecordBatch.from_pydict(columns, schema=schema))
+                summary["written"] += len(orders)
+    finally:
+        for sink, writer in writers.values():
+            writer.close()
+            sink.close()
+
+    manifest_path = dataset_dir / MANIFEST
+    manifest = json.loads(manifest_path.read_text()) if manifest_path.exists() else {"runs": []}
+    manifest["runs"].append({**summary, "partitions": sorted(writers)})
+    manifest_path.write_text(json.dumps(manifest, indent=2))
+    logger.info(f"Ingested {summary['written']} new orders from {csv_path} into {dataset_dir} "
+                f"({summary['duplicates']} already present, rejected: {summary['rejected']})")
+    return summary
@@ -0,0 +1,305 @@
+import csv
+import json
+from abc import ABC, abstractmethod
+from datetime import date
+from pathlib import Path
+from statistics import median
+from typing import Optional, Sequence
+import numpy as np
+from app.core.logger import get_logger
+from app.services.orders_dataset import dataset_files, open_orders_dataset
+
+logger = get_logger(__name__)
+
+# -------------------------------------------------------------------
+# Lane pricing
+#
+# A pricing model turns lane features (road miles, vehicle count, vehicle
+# type, pickup month) into a carrier price; the log-linear model is fitted
+# offline from Orders_Master.csv (scripts/fit_pricing_model.py) and loaded
+# from PRICING_MODEL_PATH at startup. Prices from similar past orders (lane
+# history) are blended in at quote time. Models price whole batches in one
+# vectorized call on numpy arrays.
+# -------------------------------------------------------------------
+
+# Orders_Master.csv has no vehicle type, so these stay hand-set multipliers.
+# fit_loglinear writes them into the model document (where they can be
+# edited); models built without one apply no type multiplier.
+DEFAULT_TYPE_FACTORS = {
+    "sedan": 1.0,
+    "coupe": 1.0,
+    "hatchback": 1.0,
+    "wagon": 1.05,
+    "suv": 1.1,
+    "van": 1.15,
+    "minivan": 1.1,
+    "pickup": 1.2,
+    "truck": 1.2,
+    "motorcycle": 0.75,
+}
+
+# Lane history weight is n / (n + HISTORY_PRIOR_ORDERS) for n similar orders
+HISTORY_PRIOR_ORDERS = 5
+
+
+def type_factor(vehicle_type: Optional[str], factors: dict = DEFAULT_TYPE_FACTORS) -> float:
+    key = (vehicle_type or "").strip().lower()
+    if key in factors:
+        return factors[key]
+    # "Pickup Truck", "Compact SUV", ...
+    matches = [factors[word] for word in key.replace("-", " ").split() if word in factors]
+    return max(matches) if matches else 1.0
+
+
+def vehicles_factor(vehicle_types: Sequence[Optional[str]], factors: dict = DEFAULT_TYPE_FACTORS) -> float:
+    """Average type multiplier of the vehicles on one order."""
+    if not vehicle_types or not factors:
+        return 1.0
+    return sum(type_factor(t, factors) for t in vehicle_types) / len(vehicle_types)
+
+
+def pickup_month(pickup_date: Optional[str]) -> int:
+    try:
+        return date.fromisoformat(str(pickup_date).strip()[:10]).month
+    except (TypeError, ValueError):
+        return date.today().month
+
+
+def history_price_per_vehicle_mile(history: list[dict]) -> tuple[float, int]:
+    """
+    Median price per vehicle-mile of similar past orders (RouteHistory fields)
+    and how many there were. Order prices cover every vehicle on the order.
+    """
+    rates = [
+        h["price"] / h["distance_miles"] / max(h.get("vehicles") or 1, 1)
+        for h in history
+        if h.get("price") and h.get("distance_miles")
+    ]
+    return (median(rates), len(rates)) if rates else (0.0, 0)
+
+
+# -------------------------------------------------------------------
+# Models
+# -------------------------------------------------------------------
+class PricingModel(ABC):
+    """
+    Base class for pluggable pricing models. price_batch() takes equal-length
+    columns and returns one price per lane; subclasses only implement base().
+    `type_factors` are the vehicle type multipliers the model applies.
+    """
+
+    name = "base"
+
+    def __init__(self, type_factors: dict = None):
+        self.type_factors = dict(type_factors or {})
+
+    @abstractmethod
+    def base(self, miles, vehicles, months, type_factors):
+        """Model price per lane, before lane history."""
+
+    def price_batch(self, miles, vehicles, months, type_factors, history_rate=None, history_count=None):
+        # history_rate is per vehicle-mile, so it scales with this lane's vehicle count
+        prices = self.base(miles, vehicles, months, type_factors)
+        if history_rate is None:
+            return prices
+
+        rate = np.asarray(history_rate, dtype=float)
+        weight = np.asarray(history_count, dtype=float)
+        weight = weight / (weight + HISTORY_PRIOR_ORDERS)
+        history = rate * np.asarray(miles, dtype=float) * np.asarray(vehicles, dtype=float)
+        return np.where(rate > 0, prices * (1 - weight) + history * weight, prices)
+
+    def describe(self) -> dict:
+        return {"model": self.name}
+
+
+class PerMileModel(PricingModel):
+    """Flat rate per mile regardless of vehicle count – the original placeholder pricing."""
+
+    name = "per_mile"
+
+    def __init__(self, rate_per_mile: float = 1.0, type_factors: dict = None):
+        super().__init__(type_factors)
+        self.rate_per_mile = rate_per_mile
+
+    def base(self, miles, vehicles, months, type_factors):
+        return self.rate_per_mile * np.asarray(miles, float) * np.asarray(type_factors, float)
+
+    def describe(self) -> dict:
+        return {"model": self.name, "rate_per_mile": self.rate_per_mile, "type_factors": self.type_factors}
+
+
+class LogLinearPricingModel(PricingModel):
+    """
+    log(price) = intercept + a·log(miles) + b·log(vehicles) + season[month],
+    times the vehicle type multiplier. Coefficients are held as one compact
+    array: [intercept, a, b, season_1 .. season_12].
+    """
+
+    name = "loglinear"
+
+    # Until a fitted model is deployed: price = miles, i.e. a flat $1/mile
+    # whatever the vehicle count (and no type factors), as before pricing models
+    DEFAULT_COEFFICIENTS = [0.0, 1.0, 0.0] + [0.0] * 12
+
+    def __init__(self, coefficients: Sequence[float] = None, fitted_rows: int = 0, type_factors: dict = None):
+        super().__init__(type_factors)
+        coefficients = list(coefficients or self.DEFAULT_COEFFICIENTS)
+        if len(coefficients) != 15:
+            raise ValueError(f"Expected 15 pricing coefficients, got {len(coefficients)}")
+        self.coefficients = np.asarray(coefficients, dtype=float)
+        self.fitted_rows = fitted_rows
+        self._season = np.asarray(coefficients[3:], dtype=float)
+
+    def base(self, miles, vehicles, months, type_factors):
+        intercept, a, b = self.coefficients[:3]
+        months = np.asarray(months, dtype=np.int64)
+        log_price = (
+            intercept
+            + a * np.log(np.maximum(np.asarray(miles, float), 1.0))
+            + b * np.log(np.maximum(np.asarray(vehicles, float), 1.0))
+            + self._season[months - 1]
+        )
+        return np.exp(log_price) * np.asarray(type_factors, float)
+
+    def describe(self) -> dict:
+        return {
+            "model": self.name,
+            "fitted_rows": self.fitted_rows,
+            "coefficients": self.coefficients.tolist(),
+            "type_factors": self.type_factors,
+        }
+
+
+PRICING_MODELS = {
+    PerMileModel.name: PerMileModel,
+    LogLinearPricingModel.name: LogLinearPricingModel,
+}
+
+
+# -------------------------------------------------------------------
+# Offline fitting (scripts/fit_pricing_model.py)
+# -------------------------------------------------------------------
+def _training_rows(orders: Path):
+    """(miles, vehicles, month, price) from the orders dataset directory or the raw CSV."""
+    if Path(orders).is_dir() and dataset_files(orders):
+        table = open_orders_dataset(orders, ["distance_miles", "vehicles_count", "pickup_date", "order_price"])
+        for m, v, d, p in zip(*table.to_pydict().values()):
+            if m is not None and p is not None and d is not None:
+                yield m, v or 1, d.month, p
+        return
+
+    with open(orders, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            try:
+                yield (
+                    float(row["distance_miles"]),
+                    float(row.get("vehicles_count") or 1),
+                    date.fromisoformat(row["pickup_date"].strip()[:10]).month,
+                    float(row["order_price"]),
+                )
+            except (KeyError, TypeError, ValueError):
+                continue
+
+
+def fit_loglinear(orders: Path) -> dict:
+    """
+    Least-squares fit of the log-linear model on past orders (the cleaned
+    dataset directory or Orders_Master.csv). Returns the JSON document
+    load_pricing_model() reads.
+    """
+    miles, vehicles, months, prices = [], [], [], []
+    for m, v, mo, p in _training_rows(orders):
+        if m > 0 and v > 0 and p > 0:
+            miles.append(m)
+            vehicles.append(v)
+            months.append(mo)
+            prices.append(p)
+
+    if len(prices) < 20:
+        raise ValueError(f"Only {len(prices)} usable orders in {orders}; not enough to fit")
+
+    n = len(prices)
+    months = np.asarray(months)
+    # January is the baseline month; its season term stays 0
+    design = np.column_stack([
+        np.ones(n),
+        np.log(miles),
+        np.log(vehicles),
+        *[(months == mo).astype(float) for mo in range(2, 13)],
+    ])
+    solution, *_ = np.linalg.lstsq(design, np.log(prices), rcond=None)
+    coefficients = [*solution[:3], 0.0, *solution[3:]]
+
+    residuals = np.log(prices) - design @ solution
+    return {
+        "model": LogLinearPricingModel.name,
+        "coefficients": [round(float(c), 6) for c in coefficients],
+        "fitted_rows": n,
+        "type_factors": DEFAULT_TYPE_FACTORS,
+        "rmse_log": round(float(np.sqrt(np.mean(residuals ** 2))), 4),
+    }
+
+
+# -------------------------------------------------------------------
+# App-level model, loaded from the FastAPI lifespan hook
+# -------------------------------------------------------------------
+pricing_model: PricingModel = LogLinearPricingModel()
+
+
+def load_pricing_model() -> PricingModel:
+    # Imported here so the fit script can run without app credentials
+    from app.core.config import settings
+
+    global pricing_model
+    name = settings.PRICING_MODEL
+    if name not in PRICING_MODELS:
+        raise ValueError(f"Unknown pricing model '{name}', expected one of {tuple(PRICING_MODELS)}")
+
+    params = {}
+    path = Path(settings.PRICING_MODEL_PATH)
+    if name == LogLinearPricingModel.name:
+        if path.exists():
+            doc = json.loads(path.read_text())
+            params = {
+                "coefficients": doc["coefficients"],
+                "fitted_rows": doc.get("fitted_rows", 0),
+                "type_factors": doc.get("type_factors"),
+            }
+        else:
+            logger.warning(f"Pricing model file not found at {path}; using default $1/mile coefficients")
+
+    pricing_model = PRICING_MODELS[name](**params)
+    logger.info(f"Loaded pricing model {pricing_model.describe()}")
+    return pricing_model
+
+
+def price_lanes(lanes: list[dict]) -> list[dict]:
+    """
+    Price many lanes in one vectorized call. Each lane has distance_miles and
+    optionally vehicles (count), vehicle_types, pickup_date and history
+    (similar past orders as RouteHistory fields). Returns per lane
+    {"market_price", "price"}: the model price, then blended with lane history.
+    """
+    if not lanes:
+        return []
+
+    miles = [float(lane["distance_miles"]) for lane in lanes]
+    vehicles = [max(int(lane.get("vehicles") or len(lane.get("vehicle_types") or ()) or 1), 1) for lane in lanes]
+    months = [pickup_month(lane.get("pickup_date")) for lane in lanes]
+    factors = [vehicles_factor(lane.get("vehicle_types") or (), pricing_model.type_factors) for lane in lanes]
+    history = [history_price_per_vehicle_mile(lane.get("history") or []) for lane in lanes]
+
+    market = pricing_model.price_batch(miles, vehicles, months, factors)
+    blended = pricing_model.price_batch(
+        miles, vehicles, months, factors,
+        history_rate=[rate for rate, _ in history],
+        history_count=[count for _, count in history],
+    )
+    return [{"market_price": round(float(m), 2), "price": round(float(p), 2)} for m, p in zip(market, blended)]
+
+
+def apply_markups(prices: Sequence[float], markups: Sequence[float]) -> list[list[float]]:
+    """Quote amounts for every price × markup percentage (what-if sweeps)."""
+    table = np.outer(np.asarray(prices, float), 1 + np.asarray(markups, float) / 100)
+    return np.round(table, 2).tolist()
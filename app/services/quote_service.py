@@ -0,0 +1,193 @@
+import asyncio
+from fastapi import HTTPException
+from app.core.config import settings
+from app.core.logger import get_logger
+from app.core.pipeline import StagePipeline
+from app.models.quote_request import QuoteRequest
+from app.models.quote_response import QuoteResponse, RouteHistory
+from app.services.distance_service import resolve_distance
+from app.services.pricing_service import price_lanes
+from app.services.route_history import find_similar_routes
+from app.services.hubspot_service import (
+    associate_objects,
+    resolve_contact,
+    create_deal,
+    get_or_create_company,
+    normalize_company_name,
+    update_deal_properties,
+)
+from app.services.implicit_company_service import enqueue_company_enrichment
+
+logger = get_logger(__name__)
+
+
+class QuoteBatch:
+    """
+    Shared state for quotes processed together (bulk quoting).
+    Work keyed by company name or contact email runs once per batch and
+    every quote that needs it awaits the same task.
+    """
+
+    def __init__(self):
+        self._tasks: dict[tuple, asyncio.Task] = {}
+
+    def once(self, key: tuple, func):
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._tasks[key] = task
+        return asyncio.shield(task)
+
+    def cancel(self):
+        """Cancel shared work nobody is waiting for any more (bulk client went away)."""
+        for task in self._tasks.values():
+            if not task.done():
+                task.cancel()
+
+
+async def build_quote(payload: QuoteRequest, batch: QuoteBatch = None) -> tuple[QuoteResponse, StagePipeline]:
+    """
+    Run the quote pipeline for one request: HubSpot company/contact/deal and
+    lane distance, then pricing. Returns the response and the executed
+    pipeline (for its stage timings).
+    """
+    deal_data = {
+        "company_name": getattr(payload, "company_name", "").strip() or "Individual Customer",
+        "contact_name": payload.contact_name,
+        "email": payload.email,
+        "phone": payload.phone,
+        "vehicles": [v.dict() for v in payload.vehicles],
+        "pickup": payload.pickup.dict(),
+        "delivery": payload.delivery.dict(),
+        # "billing_address": getattr(payload, "billing_address", None)
+    }
+
+    company_name = deal_data.get("company_name")
+    phone = deal_data.get("phone")
+
+    address = {
+        "address_line1": payload.address_line1,
+        "address_line2": payload.address_line2,
+        "city": payload.city,
+        "state": payload.state,
+        "zip_code": payload.zip_code,
+        "country": payload.country,
+    }
+
+    # Independent stages run concurrently:
+    #   company ─┬─> deal (deal↔company/contact associated inline)
+    #   contact ─┴─> associations (contact↔company)
+    #   distance (no HubSpot dependency)
+    async def resolve_company():
+        # ✅ ensure company exists and attach ID
+        company = await get_or_create_company(company_name, phone, address)
+        enqueue_company_enrichment(company["id"], company_name, company.get("properties"))
+        return company["id"]
+
+    def company_stage():
+        if batch is not None:
+            return batch.once(("company", normalize_company_name(company_name)), resolve_company)
+        return resolve_company()
+
+    def contact_stage():
+        if batch is not None:
+            return batch.once(("contact", str(payload.email).lower()), lambda: resolve_contact(deal_data))
+        return resolve_contact(deal_data)
+
+    def associations_stage(company, contact):
+        if batch is not None:
+            return batch.once(
+                ("association", contact, company),
+                lambda: associate_objects([("contacts", "companies", contact, company)]),
+            )
+        return associate_objects([("contacts", "companies", contact, company)])
+
+    # In estimate_then_refine mode the exact distance arrives after the
+    # response; it is written to the deal once the deal id is known.
+    deal_ready = asyncio.get_running_loop().create_future()
+
+    async def write_refined_distance(miles):
+        deal_id = await deal_ready
+        if deal_id:
+            await update_deal_properties(deal_id, {"distance_miles": miles})
+
+    logger.info(f"calling HubSpot and distance service for {payload.pickup.zip} to {payload.delivery.zip}")
+    pipeline = (
+        StagePipeline()
+        .stage("company", company_stage, writes=True)
+        .stage("contact", contact_stage, writes=True)
+        .stage(
+            "deal",
+            lambda company, contact: create_deal(deal_data, company, contact),
+            deps=("company", "contact"),
+            writes=True,
+        )
+        .stage("associations", associations_stage, deps=("company", "contact"), writes=True)
+        .stage(
+            "distance",
+            lambda: resolve_distance(payload.pickup.zip, payload.delivery.zip, on_refined=write_refined_distance),
+        )
+    )
+
+    try:
+        # Step 1: HubSpot deal + distance
+        results = await pipeline.run()
+        deal_ready.set_result(results["deal"])
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        # No deal on failure or cancellation; a pending refinement gives up
+        if not deal_ready.done():
+            deal_ready.cancel()
+        logger.info(f"Quote pipeline stage timings (ms): {pipeline.timings}")
+
+    hubspot_response = {
+        "company_id": results["company"],
+        "contact_id": results["contact"],
+        "deal_id": results["deal"],
+    }
+    logger.info(f"HubSpot deal created: {hubspot_response}")
+    distance_miles = results["distance"]["miles"]
+    distance_estimated = results["distance"]["estimated"]
+
+    try:
+        # Step 2: Similar lanes from past orders
+        history = await find_similar_routes(payload.pickup.zip, payload.delivery.zip, distance_miles)
+        route_history = [RouteHistory(**record) for record in history]
+
+        # Step 3: Lane model price, blended with what similar lanes sold for
+        [price] = price_lanes([{
+            "distance_miles": distance_miles,
+            "vehicle_types": [v.type for v in payload.vehicles],
+            "pickup_date": payload.pickup.date,
+            "history": history,
+        }])
+        super_dispatch_price = price["market_price"]
+        internal_ai_price = price["price"]
+        markup_percentage = settings.PRICING_MARKUP_PERCENT
+        quote_amount = round(internal_ai_price * (1 + markup_percentage / 100), 2)
+
+        # Step 4: Return response
+        quote = QuoteResponse(
+            origin=f"{payload.pickup.city}, {payload.pickup.state}, {payload.pickup.zip}",
+            destination=f"{payload.delivery.city}, {payload.delivery.state}, {payload.delivery.zip}",
+            distance_miles=distance_miles,
+            distance_estimated=distance_estimated,
+            super_dispatch_price=super_dispatch_price,
+            internal_ai_price=internal_ai_price,
+            markup_percentage=markup_percentage,
+            quote_amount=quote_amount,
+            route_history=route_history,
+            # ➕ include IDs from HubSpot
+            vehicles=[v.dict() for v in payload.vehicles],
+            company_id=hubspot_response.get("company_id"),
+            contact_id=hubspot_response.get("contact_id"),
+            deal_id=hubspot_response.get("deal_id")
+        )
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return quote, pipeline
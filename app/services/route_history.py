@@ -0,0 +1,316 @@
+import asyncio
+import csv
+import math
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Optional, Sequence
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+from app.core.config import settings
+from app.core.logger import get_logger
+from app.services.distance_service import EARTH_RADIUS_MILES, geocode_zip
+from app.services import zip_database
+from app.services.orders_dataset import clean_zip, dataset_files, open_orders_dataset
+from app.services.zip_database import lookup_zip, lookup_zip_coordinates
+
+logger = get_logger(__name__)
+
+# -------------------------------------------------------------------
+# Similar-lane history over our past orders (Orders_Master.csv)
+#
+# Orders are held as numpy columns with ZIP centroids resolved once at
+# load. Rows are grid-bucketed by pickup location: the row ids are kept
+# sorted by grid cell, so the candidates near an origin are a few slices
+# found with searchsorted, and every distance and score is computed
+# vectorized over those candidates.
+# -------------------------------------------------------------------
+CELL_DEGREES = 1.0        # grid bucket size (~69 miles of latitude)
+MILES_PER_DEGREE = 69.0
+_LON_CELLS = math.ceil(360 / CELL_DEGREES) + 1
+
+# Scoring weights (lower score = more similar)
+PROXIMITY_UNIT_MILES = 100.0   # 100 mi of origin+destination offset costs 1.0
+DISTANCE_BAND_WEIGHT = 2.0     # relative difference in lane length
+RECENCY_WEIGHT = 0.5           # per year since pickup
+UNDATED_AGE_YEARS = 5          # undated orders rank as old
+
+# Pickup days are stored as days since 1970-01-01; NO_DAY when unknown
+EPOCH = date(1970, 1, 1)
+NO_DAY = -1
+
+
+def _epoch_day(value) -> int:
+    if not isinstance(value, date):
+        try:
+            value = date.fromisoformat(str(value).strip()[:10])
+        except ValueError:
+            return NO_DAY
+    return (value - EPOCH).days
+
+
+def _place_label(zipcode: str) -> str:
+    place = lookup_zip(zipcode)
+    return f"{place['city']}, {place['state_abbr']}" if place else zipcode
+
+
+def _cell_ids(lat, lon):
+    """Grid cell id per point (arrays in, int64 array out)."""
+    i = np.floor((np.asarray(lat, dtype=np.float64) + 90) / CELL_DEGREES).astype(np.int64)
+    j = np.floor((np.asarray(lon, dtype=np.float64) + 180) / CELL_DEGREES).astype(np.int64)
+    return i * _LON_CELLS + j
+
+
+def _haversine_from(lat: float, lon: float, lats, lons):
+    """Great-circle miles from one point to arrays of points."""
+    phi1 = math.radians(lat)
+    phi2 = np.radians(lats)
+    dphi = phi2 - phi1
+    dlambda = np.radians(lons) - math.radians(lon)
+    a = np.sin(dphi / 2) ** 2 + math.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(a))
+
+
+def _haversine_pairs(lat1, lon1, lat2, lon2):
+    """Element-wise great-circle miles between two arrays of points."""
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = np.radians(lon2) - np.radians(lon1)
+    a = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(a))
+
+
+def _value(column, row: int):
+    # String columns are Python lists (CSV) or Arrow arrays (dataset)
+    value = column[row]
+    return value.as_py() if hasattr(value, "as_py") else value
+
+
+class RouteHistoryIndex:
+    """
+    Numeric columns are equal-length numpy arrays; origin, destination and
+    company are sequences indexed by row. Rows without coordinates (NaN)
+    are kept in the columns but left out of the grid.
+    """
+
+    def __init__(self, o_lat, o_lon, d_lat, d_lon, distance, price, vehicles, day,
+                 origin: Sequence, destination: Sequence, company: Sequence):
+        self.o_lat, self.o_lon = o_lat, o_lon
+        self.d_lat, self.d_lon = d_lat, d_lon
+        self.price = price          # whole order, all vehicles
+        self.vehicles = vehicles
+        self.day = day
+        self.origin, self.destination, self.company = origin, destination, company
+        # Orders without a distance get the straight-line one
+        missing = ~(distance > 0)
+        if missing.any():
+            distance = np.where(missing, _haversine_pairs(o_lat, o_lon, d_lat, d_lon), distance)
+        self.distance = distance
+
+        located = np.isfinite(o_lat) & np.isfinite(o_lon) & np.isfinite(d_lat) & np.isfinite(d_lon)
+        rows = np.flatnonzero(located)
+        cells = _cell_ids(o_lat[rows], o_lon[rows])
+        order = np.argsort(cells, kind="stable")
+        self._rows = rows[order]      # row ids sorted by origin cell
+        self._cells = cells[order]
+        self.skipped = len(o_lat) - len(rows)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _near_origin(self, lat: float, lon: float, radius_miles: float):
+        """Row ids in every grid cell that overlaps the radius around (lat, lon)."""
+        lat_span = radius_miles / MILES_PER_DEGREE
+        lon_span = lat_span / max(math.cos(math.radians(lat)), 0.1)
+        i_lo, i_hi = (math.floor((lat + d + 90) / CELL_DEGREES) for d in (-lat_span, lat_span))
+        j_lo, j_hi = (math.floor((lon + d + 180) / CELL_DEGREES) for d in (-lon_span, lon_span))
+        wanted = (np.arange(i_lo, i_hi + 1)[:, None] * _LON_CELLS + np.arange(j_lo, j_hi + 1)[None, :]).ravel()
+        starts = np.searchsorted(self._cells, wanted, side="left")
+        stops = np.searchsorted(self._cells, wanted, side="right")
+        hit = stops > starts
+        if not hit.any():
+            return self._rows[:0]
+        return np.concatenate([self._rows[a:b] for a, b in zip(starts[hit], stops[hit])])
+
+    def similar(self, origin: tuple[float, float], destination: tuple[float, float], distance_miles: float,
+                k: int, radius_miles: float, max_radius_miles: float, today: int = None) -> list[tuple[float, int]]:
+        """
+        Top-k (score, row) for orders near both ends of the lane, ranked by
+        origin/destination offset, lane-length difference and age. The search
+        radius doubles until k orders are found or max_radius_miles is reached.
+        """
+        today = _epoch_day(date.today()) if today is None else today
+        while True:
+            rows = self._near_origin(*origin, radius_miles)
+            origin_off = _haversine_from(*origin, self.o_lat[rows], self.o_lon[rows])
+            destination_off = _haversine_from(*destination, self.d_lat[rows], self.d_lon[rows])
+            keep = (origin_off <= radius_miles) & (destination_off <= radius_miles)
+            if keep.sum() >= k or radius_miles >= max_radius_miles:
+                break
+            radius_miles = min(radius_miles * 2, max_radius_miles)
+
+        rows, origin_off, destination_off = rows[keep], origin_off[keep], destination_off[keep]
+        if not len(rows):
+            return []
+        score = (origin_off + destination_off) / PROXIMITY_UNIT_MILES
+        if distance_miles:
+            score += DISTANCE_BAND_WEIGHT * np.abs(self.distance[rows] - distance_miles) / distance_miles
+        day = self.day[rows]
+        age = np.where(day != NO_DAY, np.maximum(0, today - day) / 365, UNDATED_AGE_YEARS)
+        score += RECENCY_WEIGHT * age
+
+        top = np.argpartition(score, k - 1)[:k] if len(rows) > k else np.arange(len(rows))
+        top = top[np.argsort(score[top], kind="stable")]
+        return [(float(score[i]), int(rows[i])) for i in top]
+
+    def record(self, row: int) -> dict:
+        day = int(self.day[row])
+        return {
+            "origin": _value(self.origin, row),
+            "destination": _value(self.destination, row),
+            "distance_miles": round(float(self.distance[row]), 1),
+            "date": (EPOCH + timedelta(days=day)).isoformat() if day != NO_DAY else "",
+            "price": round(float(self.price[row]), 2),
+            "vehicles": int(self.vehicles[row]),
+            "company": _value(self.company, row) or "",
+        }
+
+
+def _float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _coordinates(zipcode: str) -> tuple[float, float]:
+    return (zipcode and lookup_zip_coordinates(zipcode)) or (math.nan, math.nan)
+
+
+def load_orders_csv(path: Path) -> RouteHistoryIndex:
+    columns = {name: [] for name in (
+        "o_lat", "o_lon", "d_lat", "d_lon", "distance", "price", "vehicles", "day",
+        "origin", "destination", "company",
+    )}
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            pickup_zip = clean_zip(row.get("pickup_zip"))
+            delivery_zip = clean_zip(row.get("delivery_zip"))
+            o_lat, o_lon = _coordinates(pickup_zip)
+            d_lat, d_lon = _coordinates(delivery_zip)
+            columns["o_lat"].append(o_lat)
+            columns["o_lon"].append(o_lon)
+            columns["d_lat"].append(d_lat)
+            columns["d_lon"].append(d_lon)
+            columns["distance"].append(_float(row.get("distance_miles")))
+            columns["price"].append(_float(row.get("order_price")))
+            columns["vehicles"].append(max(int(_float(row.get("vehicles_count"))), 1))
+            columns["day"].append(_epoch_day(row.get("pickup_date") or ""))
+            columns["origin"].append(_place_label(pickup_zip))
+            columns["destination"].append(_place_label(delivery_zip))
+            columns["company"].append((row.get("customer_name") or "").strip())
+
+    return RouteHistoryIndex(
+        *(np.asarray(columns[name], dtype=np.float64) for name in ("o_lat", "o_lon", "d_lat", "d_lon", "distance", "price")),
+        np.asarray(columns["vehicles"], dtype=np.int32),
+        np.asarray(columns["day"], dtype=np.int32),
+        columns["origin"],
+        columns["destination"],
+        columns["company"],
+    )
+
+
+def _numpy_column(column, fill=None):
+    """
+    An Arrow column as a numpy array: a zero-copy view of the memory-mapped
+    buffer when the column is one null-free chunk, otherwise one bulk copy
+    (nulls replaced by `fill`).
+    """
+    if column.num_chunks == 1 and column.null_count == 0:
+        return column.chunk(0).to_numpy(zero_copy_only=True)
+    if column.null_count:
+        column = column.fill_null(fill)
+    return column.to_numpy()
+
+
+def _labels(table, prefix: str):
+    """'City, ST' per row as an Arrow array, the ZIP where either is missing."""
+    joined = pc.binary_join_element_wise(table[f"{prefix}_city"], table[f"{prefix}_state"], ", ")
+    return pc.coalesce(joined, table[f"{prefix}_zip"], "")
+
+
+def load_orders_dataset(dataset_dir: Path) -> RouteHistoryIndex:
+    """
+    Build the index from the cleaned dataset (scripts/ingest_orders.py), which
+    carries centroids. Numeric columns come straight from the Arrow buffers
+    (no per-row Python); labels stay Arrow arrays and are only read for the
+    rows a query returns.
+    """
+    table = open_orders_dataset(dataset_dir, [
+        "pickup_zip", "pickup_city", "pickup_state", "pickup_lat", "pickup_lon",
+        "delivery_zip", "delivery_city", "delivery_state", "delivery_lat", "delivery_lon",
+        "distance_miles", "order_price", "vehicles_count", "pickup_date", "customer_name",
+    ])
+    return RouteHistoryIndex(
+        _numpy_column(table["pickup_lat"], math.nan),
+        _numpy_column(table["pickup_lon"], math.nan),
+        _numpy_column(table["delivery_lat"], math.nan),
+        _numpy_column(table["delivery_lon"], math.nan),
+        _numpy_column(table["distance_miles"], 0.0),
+        _numpy_column(table["order_price"], 0.0),
+        _numpy_column(table["vehicles_count"], 1),
+        # date32 is days since the epoch already
+        _numpy_column(table["pickup_date"].cast(pa.int32()), NO_DAY),
+        _labels(table, "pickup"),
+        _labels(table, "delivery"),
+        table["customer_name"],
+    )
+
+
+# -------------------------------------------------------------------
+# App-level instance, loaded from the FastAPI lifespan hook (after the
+# ZIP database, which supplies the centroids)
+# -------------------------------------------------------------------
+route_history: Optional[RouteHistoryIndex] = None
+
+
+def load_route_history():
+    """Load from the orders dataset when it exists, else from the CSV."""
+    global route_history
+    dataset = Path(settings.ORDERS_DATASET_PATH)
+    path = Path(settings.ORDERS_CSV_PATH)
+    if dataset_files(dataset):
+        route_history, source = load_orders_dataset(dataset), dataset
+    elif not path.exists():
+        logger.warning(f"Orders file not found at {path}; quotes will have no route history")
+        return None
+    elif zip_database.zip_db is None:
+        logger.warning("ZIP database not loaded; route history needs local ZIP centroids")
+        return None
+    else:
+        route_history, source = load_orders_csv(path), path
+
+    logger.info(f"Loaded {len(route_history)} orders into route history from {source} "
+                f"({route_history.skipped} skipped without ZIP coordinates)")
+    return route_history
+
+
+async def find_similar_routes(pickup_zip: str, delivery_zip: str, distance_miles: float, k: int = None) -> list[dict]:
+    """Most similar past orders for a lane, as RouteHistory fields. Empty when no history is loaded."""
+    if route_history is None or not len(route_history):
+        return []
+    try:
+        origin, destination = await asyncio.gather(geocode_zip(pickup_zip), geocode_zip(delivery_zip))
+    except Exception as e:
+        logger.warning(f"Route history lookup skipped, could not geocode lane: {e}")
+        return []
+
+    matches = route_history.similar(
+        origin,
+        destination,
+        distance_miles,
+        k=k or settings.ROUTE_HISTORY_K,
+        radius_miles=settings.ROUTE_HISTORY_RADIUS_MILES,
+        max_radius_miles=settings.ROUTE_HISTORY_MAX_RADIUS_MILES,
+    )
+    return [route_history.record(row) for _, row in matches]
@@ -0,0 +1,283 @@
+import asyncio
+from datetime import date
+from typing import Optional
+import httpx
+from fastapi import HTTPException
+from app.core.cache import SingleFlight, TieredCache
+from app.core.config import settings
+from app.core.http_client import get_http_client, upstream_call
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# -------------------------------------------------------------------
+# Local VIN decoding (ISO 3779 / 49 CFR 565)
+# -------------------------------------------------------------------
+VIN_LENGTH = 17
+_TRANSLITERATION = {
+    **{str(d): d for d in range(10)},
+    "A": 1, "B": 2, "C": 3, "D": 4, "E": 5, "F": 6, "G": 7, "H": 8,
+    "J": 1, "K": 2, "L": 3, "M": 4, "N": 5, "P": 7, "R": 9,
+    "S": 2, "T": 3, "U": 4, "V": 5, "W": 6, "X": 7, "Y": 8, "Z": 9,
+}
+_WEIGHTS = (8, 7, 6, 5, 4, 3, 2, 10, 0, 9, 8, 7, 6, 5, 4, 3, 2)
+
+# Position 10 cycles every 30 years; I, O, Q, U, Z and 0 are never used
+_YEAR_CODES = "ABCDEFGHJKLMNPRSTVWXY123456789"
+
+# World Manufacturer Identifiers (positions 1-3) for the makes we usually ship.
+# Lookups fall back to the first two characters for makers that use many WMIs.
+WMI_MAKES = {
+    "1FA": "FORD", "1FB": "FORD", "1FC": "FORD", "1FD": "FORD", "1FM": "FORD", "1FT": "FORD",
+    "1LN": "LINCOLN", "2FA": "FORD", "2FM": "FORD", "2FT": "FORD", "3FA": "FORD", "3FT": "FORD",
+    "1G1": "CHEVROLET", "1GC": "CHEVROLET", "1GN": "CHEVROLET", "1GB": "CHEVROLET",
+    "2G1": "CHEVROLET", "3G1": "CHEVROLET", "3GC": "CHEVROLET", "3GN": "CHEVROLET",
+    "1GT": "GMC", "1GK": "GMC", "2GT": "GMC", "3GT": "GMC", "1G6": "CADILLAC", "1GY": "CADILLAC",
+    "1G4": "BUICK", "2G4": "BUICK", "KL4": "BUICK",
+    "1C3": "CHRYSLER", "2C3": "CHRYSLER", "1C4": "JEEP", "1J4": "JEEP", "1J8": "JEEP",
+    "1C6": "RAM", "3C6": "RAM", "3C7": "RAM", "1D7": "DODGE", "2B3": "DODGE", "2C4": "DODGE",
+    "1B3": "DODGE", "3D7": "DODGE",
+    "1HG": "HONDA", "2HG": "HONDA", "2HK": "HONDA", "5FN": "HONDA", "5J6": "HONDA", "JHM": "HONDA",
+    "JHL": "HONDA", "19X": "HONDA", "19U": "ACURA", "JH4": "ACURA", "5J8": "ACURA",
+    "1N4": "NISSAN", "1N6": "NISSAN", "3N1": "NISSAN", "5N1": "NISSAN", "JN1": "NISSAN",
+    "JN8": "NISSAN", "JNK": "INFINITI", "5N3": "INFINITI",
+    "4T1": "TOYOTA", "4T3": "TOYOTA", "4T4": "TOYOTA", "5TD": "TOYOTA", "5TF": "TOYOTA",
+    "5TE": "TOYOTA", "2T1": "TOYOTA", "2T3": "TOYOTA", "JTD": "TOYOTA", "JTE": "TOYOTA",
+    "JTM": "TOYOTA", "JTN": "TOYOTA", "JTH": "LEXUS", "JTJ": "LEXUS", "2T2": "LEXUS", "58A": "LEXUS",
+    "4S3": "SUBARU", "4S4": "SUBARU", "JF1": "SUBARU", "JF2": "SUBARU",
+    "JM1": "MAZDA", "JM3": "MAZDA", "3MZ": "MAZDA",
+    "5NP": "HYUNDAI", "5NM": "HYUNDAI", "KMH": "HYUNDAI", "KM8": "HYUNDAI",
+    "5XY": "KIA", "KNA": "KIA", "KND": "KIA", "3KP": "KIA",
+    "1VW": "VOLKSWAGEN", "3VW": "VOLKSWAGEN", "WVW": "VOLKSWAGEN", "WVG": "VOLKSWAGEN",
+    "WAU": "AUDI", "WA1": "AUDI", "WBA": "BMW", "WBS": "BMW", "WBX": "BMW", "5UX": "BMW", "5YM": "BMW",
+    "WDD": "MERCEDES-BENZ", "WDC": "MERCEDES-BENZ", "WDB": "MERCEDES-BENZ", "W1K": "MERCEDES-BENZ",
+    "W1N": "MERCEDES-BENZ", "4JG": "MERCEDES-BENZ", "55S": "MERCEDES-BENZ",
+    "WP0": "PORSCHE", "WP1": "PORSCHE", "YV1": "VOLVO", "YV4": "VOLVO", "7JR": "VOLVO",
+    "SAL": "LAND ROVER", "SAJ": "JAGUAR", "ZFF": "FERRARI", "ZHW": "LAMBORGHINI",
+    "5YJ": "TESLA", "7SA": "TESLA", "LRW": "TESLA", "7G2": "TESLA",
+    "JA3": "MITSUBISHI", "JA4": "MITSUBISHI", "ML3": "MITSUBISHI",
+    "KL1": "CHEVROLET", "KL7": "CHEVROLET", "ZAC": "JEEP", "ZAR": "ALFA ROMEO", "3FR": "FORD",
+    "7FA": "HONDA", "1GM": "PONTIAC", "2G2": "PONTIAC", "1YV": "MAZDA", "1ZV": "FORD",
+    "5LM": "LINCOLN", "2LM": "LINCOLN", "3LN": "LINCOLN",
+}
+WMI_PREFIX_MAKES = {
+    "1F": "FORD", "2F": "FORD", "3F": "FORD", "1G": "CHEVROLET", "JT": "TOYOTA",
+    "JH": "HONDA", "JN": "NISSAN", "KM": "HYUNDAI", "KN": "KIA", "WB": "BMW", "WD": "MERCEDES-BENZ",
+}
+
+
+def normalize_vin(vin: str) -> str:
+    return (vin or "").strip().upper()
+
+
+def vin_check_digit(vin: str) -> str:
+    total = sum(_TRANSLITERATION[c] * w for c, w in zip(vin, _WEIGHTS))
+    remainder = total % 11
+    return "X" if remainder == 10 else str(remainder)
+
+
+def validate_vin(vin: str) -> Optional[str]:
+    """Returns an error message, or None when the VIN is well formed."""
+    if len(vin) != VIN_LENGTH:
+        return f"VIN must be {VIN_LENGTH} characters"
+    bad = sorted({c for c in vin if c not in _TRANSLITERATION})
+    if bad:
+        return f"VIN contains invalid characters: {''.join(bad)}"
+    # The check digit is mandatory for North American VINs (WMI starting 1-5)
+    if vin[0] in "12345" and vin[8] != vin_check_digit(vin):
+        return "VIN check digit does not match"
+    return None
+
+
+def decode_model_year(vin: str) -> Optional[int]:
+    """
+    Model year from position 10. The code repeats every 30 years; for
+    North American passenger vehicles a letter in position 7 means 2010+.
+    """
+    code = vin[9]
+    if code not in _YEAR_CODES:
+        return None
+    year = 1980 + _YEAR_CODES.index(code)
+    if vin[0] in "12345":
+        if vin[6].isalpha():
+            year += 30
+    elif year + 30 <= date.today().year + 1:
+        # No position-7 rule elsewhere: take the latest cycle that isn't in the future
+        year += 30
+    return year
+
+
+def wmi_make(vin: str) -> Optional[str]:
+    return WMI_MAKES.get(vin[:3]) or WMI_PREFIX_MAKES.get(vin[:2])
+
+
+def local_decode(vin: str) -> dict:
+    return {"year": decode_model_year(vin), "make": wmi_make(vin), "model": None, "type": "Unknown"}
+
+
+# -------------------------------------------------------------------
+# Persistent cache of NHTSA decodes. Entries are stored under the full VIN
+# and under its pattern (WMI + VDS + year code) – vehicles of the same
+# make/model/trim/year share a pattern, so new VINs of a known vehicle are
+# decoded without calling NHTSA.
+# -------------------------------------------------------------------
+vin_cache = TieredCache("vin", maxsize=settings.VIN_CACHE_SIZE, ttl=settings.VIN_CACHE_TTL)
+vin_flight = SingleFlight()
+vin_stats = {"vin_hits": 0, "pattern_hits": 0, "nhtsa_calls": 0, "local_fallbacks": 0}
+
+
+def vin_pattern(vin: str) -> str:
+    return vin[:8] + vin[9]
+
+
+def get_vin_cache_stats() -> dict:
+    return {**vin_stats, "cache": vin_cache.stats()}
+
+
+def cached_decode(vin: str) -> Optional[dict]:
+    result = vin_cache.get(f"vin:{vin}")
+    if result is not None:
+        vin_stats["vin_hits"] += 1
+        return result
+    result = vin_cache.get(f"pattern:{vin_pattern(vin)}")
+    if result is not None:
+        vin_stats["pattern_hits"] += 1
+        vin_cache.set(f"vin:{vin}", result)
+        return result
+    return None
+
+
+def store_decode(vin: str, nhtsa_result: dict) -> dict:
+    """Convert one NHTSA Results row to our decode and cache it (VIN + pattern)."""
+    year = nhtsa_result.get("ModelYear")
+    decoded = {
+        "year": int(year) if str(year or "").isdigit() else decode_model_year(vin),
+        "make": nhtsa_result.get("Make") or wmi_make(vin),
+        "model": nhtsa_result.get("Model") or None,
+        "type": nhtsa_result.get("BodyClass") or "Unknown",
+    }
+    # Only cache decodes NHTSA actually recognised
+    if nhtsa_result.get("Make") and nhtsa_result.get("Model"):
+        vin_cache.set_many([(f"vin:{vin}", decoded), (f"pattern:{vin_pattern(vin)}", decoded)])
+    return decoded
+
+
+async def _nhtsa_decode(vin: str) -> dict:
+    logger.info(f"Calling NHTSA API for VIN: {vin}")
+    vin_stats["nhtsa_calls"] += 1
+    try:
+        async with upstream_call("nhtsa", "decode"):
+            response = await get_http_client("nhtsa").get(
+                f"/DecodeVinValues/{vin}", params={"format": "json"}
+            )
+    except httpx.ReadTimeout:
+        raise HTTPException(status_code=504, detail="NHTSA VIN API request timed out")
+    except httpx.RequestError as e:
+        raise HTTPException(status_code=503, detail=f"NHTSA VIN API request failed: {str(e)}")
+
+    if not response.is_success:
+        raise HTTPException(status_code=response.status_code, detail="NHTSA VIN API request failed")
+
+    data = response.json()
+
+    try:
+        results = data["Results"][0]  # results is a list with one dict
+    except (KeyError, IndexError):
+        raise HTTPException(status_code=500, detail="Unexpected NHTSA API response structure")
+
+    return store_decode(vin, results)
+
+
+async def _nhtsa_decode_batch(vins: list[str]) -> dict[str, dict]:
+    """One DecodeVINValuesBatch call for up to NHTSA_BATCH_SIZE VINs; returns decodes by VIN."""
+    logger.info(f"Calling NHTSA batch API for {len(vins)} VINs")
+    vin_stats["nhtsa_calls"] += 1
+    try:
+        async with upstream_call("nhtsa", "decode_batch"):
+            response = await get_http_client("nhtsa").post(
+                "/DecodeVINValuesBatch/", data={"format": "json", "data": ";".join(vins)}
+            )
+    except httpx.ReadTimeout:
+        raise HTTPException(status_code=504, detail="NHTSA VIN API request timed out")
+    except httpx.RequestError as e:
+        raise HTTPException(status_code=503, detail=f"NHTSA VIN API request failed: {str(e)}")
+
+    if not response.is_success:
+        raise HTTPException(status_code=response.status_code, detail="NHTSA VIN API request failed")
+
+    return {
+        normalize_vin(row.get("VIN")): store_decode(normalize_vin(row.get("VIN")), row)
+        for row in response.json().get("Results", [])
+        if row.get("VIN")
+    }
+
+
+async def decode_vins(vins: list[str]) -> list[dict]:
+    """
+    Decode many VINs: cached ones locally, the rest in concurrent
+    DecodeVINValuesBatch calls of up to NHTSA_BATCH_SIZE VINs each.
+    Returns one {vin, ok, vehicle | status_code, error} entry per input.
+    """
+    vins = [normalize_vin(v) for v in vins]
+    decoded: dict[str, dict] = {}
+    errors: dict[str, tuple[int, str]] = {}
+
+    pending = []
+    for vin in dict.fromkeys(vins):
+        error = validate_vin(vin)
+        if error:
+            errors[vin] = (400, error)
+        elif (cached := cached_decode(vin)) is not None:
+            decoded[vin] = cached
+        else:
+            pending.append(vin)
+
+    size = settings.NHTSA_BATCH_SIZE
+    chunks = [pending[i:i + size] for i in range(0, len(pending), size)]
+    results = await asyncio.gather(*[_nhtsa_decode_batch(chunk) for chunk in chunks], return_exceptions=True)
+
+    for chunk, result in zip(chunks, results):
+        for vin in chunk:
+            if isinstance(result, dict) and vin in result:
+                decoded[vin] = result[vin]
+            elif isinstance(result, dict):
+                errors[vin] = (502, "VIN missing from NHTSA batch response")
+            elif isinstance(result, HTTPException) and result.status_code >= 500 and wmi_make(vin):
+                vin_stats["local_fallbacks"] += 1
+                decoded[vin] = local_decode(vin)
+            elif isinstance(result, HTTPException):
+                errors[vin] = (result.status_code, result.detail)
+            else:
+                errors[vin] = (500, str(result))
+
+    return [
+        {"vin": vin, "ok": True, "vehicle": decoded[vin]} if vin in decoded
+        else {"vin": vin, "ok": False, "status_code": errors[vin][0], "error": errors[vin][1]}
+        for vin in vins
+    ]
+
+
+async def decode_vin(vin: str) -> dict:
+    """
+    Decode a VIN to {year, make, model, type}: VIN/pattern cache first, then
+    NHTSA. If NHTSA is unavailable, falls back to the local year/WMI decode
+    when that at least identifies the make.
+    """
+    vin = normalize_vin(vin)
+    error = validate_vin(vin)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+
+    cached = cached_decode(vin)
+    if cached is not None:
+        return cached
+
+    try:
+        return await vin_flight.do(vin_pattern(vin), lambda: _nhtsa_decode(vin))
+    except HTTPException as e:
+        local = local_decode(vin)
+        if e.status_code < 500 or not local["make"]:
+            raise
+        vin_stats["local_fallbacks"] += 1
+        logger.warning(f"NHTSA decode failed for {vin} ({e.detail}); using local decode")
+        return local
@@ -0,0 +1,189 @@
+import csv
+import json
+import mmap
+import struct
+from pathlib import Path
+from typing import Optional
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# -------------------------------------------------------------------
+# Compact, memory-mapped US ZIP centroid database
+#
+# Layout (little endian):
+#   magic "ZIPDB001" | uint32 rows | uint32 header_len | header JSON (states)
+#   int32[100000]  row index per 5-digit ZIP (-1 = unknown)
+#   float32[rows]  latitude
+#   float32[rows]  longitude
+#   uint16[rows]   state index into header["states"]
+#   uint32[rows+1] city offsets into the UTF-8 city blob
+#   city blob
+#
+# A lookup is one index read plus a few fixed-offset reads: O(1), no parsing.
+# -------------------------------------------------------------------
+MAGIC = b"ZIPDB001"
+ZIP_SPACE = 100_000
+COUNTRY = "United States"
+
+
+def _align(n: int) -> int:
+    return (n + 3) & ~3
+
+
+class ZipDatabase:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._file = self.path.open("rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        buf = memoryview(self._mm)
+
+        if bytes(buf[:8]) != MAGIC:
+            raise ValueError(f"{self.path} is not a ZIP database file")
+        rows, header_len = struct.unpack_from("<II", buf, 8)
+        header = json.loads(bytes(buf[16:16 + header_len]))
+        self.states = [tuple(s) for s in header["states"]]
+        self.rows = rows
+
+        offset = _align(16 + header_len)
+        self._index = buf[offset:offset + 4 * ZIP_SPACE].cast("i")
+        offset += 4 * ZIP_SPACE
+        self._lat = buf[offset:offset + 4 * rows].cast("f")
+        offset += 4 * rows
+        self._lon = buf[offset:offset + 4 * rows].cast("f")
+        offset += 4 * rows
+        self._state = buf[offset:offset + 2 * rows].cast("H")
+        offset = _align(offset + 2 * rows)
+        self._city_off = buf[offset:offset + 4 * (rows + 1)].cast("I")
+        offset += 4 * (rows + 1)
+        self._cities = buf[offset:]
+
+    def _row(self, zipcode: str) -> int:
+        if len(zipcode) != 5 or not zipcode.isdigit():
+            return -1
+        return self._index[int(zipcode)]
+
+    def __contains__(self, zipcode: str) -> bool:
+        return self._row(zipcode) >= 0
+
+    def coordinates(self, zipcode: str) -> Optional[tuple[float, float]]:
+        row = self._row(zipcode)
+        if row < 0:
+            return None
+        return self._lat[row], self._lon[row]
+
+    def lookup(self, zipcode: str) -> Optional[dict]:
+        row = self._row(zipcode)
+        if row < 0:
+            return None
+        state_abbr, state = self.states[self._state[row]]
+        city = bytes(self._cities[self._city_off[row]:self._city_off[row + 1]]).decode("utf-8")
+        return {
+            "zip": zipcode,
+            "city": city,
+            "state": state,
+            "state_abbr": state_abbr,
+            "country": COUNTRY,
+            "lat": round(self._lat[row], 6),
+            "lon": round(self._lon[row], 6),
+        }
+
+    def close(self):
+        # Release the views before closing the map
+        for view in (self._index, self._lat, self._lon, self._state, self._city_off, self._cities):
+            view.release()
+        self._mm.close()
+        self._file.close()
+
+
+def build_zip_database(csv_path: str, out_path: str) -> int:
+    """
+    Build the binary ZIP database from a CSV with columns
+    zip, city, state, state_abbr, lat, lon. Returns the number of ZIPs written.
+    """
+    records = {}
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            zipcode = (row.get("zip") or "").strip().split("-")[0].zfill(5)
+            if len(zipcode) != 5 or not zipcode.isdigit() or not row.get("lat") or not row.get("lon"):
+                continue
+            # First occurrence wins (source files sometimes list alternate place names)
+            records.setdefault(zipcode, row)
+
+    states: dict[tuple[str, str], int] = {}
+    index = [-1] * ZIP_SPACE
+    lats, lons, state_ids, city_offsets = [], [], [], [0]
+    city_blob = bytearray()
+
+    for row_id, zipcode in enumerate(sorted(records)):
+        row = records[zipcode]
+        index[int(zipcode)] = row_id
+        lats.append(float(row["lat"]))
+        lons.append(float(row["lon"]))
+        state_key = ((row.get("state_abbr") or "").strip(), (row.get("state") or "").strip())
+        state_ids.append(states.setdefault(state_key, len(states)))
+        city_blob += (row.get("city") or "").strip().encode("utf-8")
+        city_offsets.append(len(city_blob))
+
+    rows = len(lats)
+    header = json.dumps({"states": [list(k) for k in states]}).encode("utf-8")
+
+    out = bytearray(MAGIC)
+    out += struct.pack("<II", rows, len(header))
+    out += header
+    out += b"\0" * (_align(len(out)) - len(out))
+    out += struct.pack(f"<{ZIP_SPACE}i", *index)
+    out += struct.pack(f"<{rows}f", *lats)
+    out += struct.pack(f"<{rows}f", *lons)
+    out += struct.pack(f"<{rows}H", *state_ids)
+    out += b"\0" * (_align(len(out)) - len(out))
+    out += struct.pack(f"<{rows + 1}I", *city_offsets)
+    out += city_blob
+
+    Path(out_path).parent.mkdir(parents=True, exist_ok=True)
+    Path(out_path).write_bytes(out)
+    return rows
+
+
+# -------------------------------------------------------------------
+# App-level instance, opened from the FastAPI lifespan hook
+# -------------------------------------------------------------------
+zip_db: Optional[ZipDatabase] = None
+
+
+def load_zip_database():
+    # Imported here so the build script can run without app credentials
+    from app.core.config import settings
+
+    global zip_db
+    if not settings.ZIP_DB_ENABLED:
+        return None
+
+    path = Path(settings.ZIP_DB_PATH)
+    if not path.exists():
+        logger.warning(f"ZIP database not found at {path}; using remote lookups only")
+        return None
+
+    zip_db = ZipDatabase(path)
+    logger.info(f"Loaded ZIP database with {zip_db.rows} ZIPs from {path}")
+    return zip_db
+
+
+def close_zip_database():
+    global zip_db
+    if zip_db is not None:
+        zip_db.close()
+        zip_db = None
+
+
+def lookup_zip(zipcode: str) -> Optional[dict]:
+    """Local ZIP lookup; None when the database is disabled or the ZIP is unknown."""
+    if zip_db is None:
+        return None
+    return zip_db.lookup(zipcode)
+
+
+def lookup_zip_coordinates(zipcode: str) -> Optional[tuple[float, float]]:
+    if zip_db is None:
+        return None
+    return zip_db.coordinates(zipcode)
@@ -0,0 +1,24 @@
+"""
+Build the offline ZIP centroid database used by /location and geocoding.
+
+Usage:
+    python scripts/build_zip_db.py zips.csv data/zipdb.bin
+
+The CSV needs the columns zip, city, state, state_abbr, lat, lon
+(e.g. an export of the GeoNames US postal code file).
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.services.zip_database import build_zip_database  # noqa: E402
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print(__doc__)
+        sys.exit(1)
+
+    count = build_zip_database(sys.argv[1], sys.argv[2])
+    print(f"Wrote {count} ZIPs to {sys.argv[2]}")
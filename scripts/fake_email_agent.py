@@ -0,0 +1,62 @@
+"""
+Fake email-generation agent for local testing of /quote/generate-email and
+/quote/generate-email/stream without calling the real LLM agent.
+
+Usage:
+    python scripts/fake_email_agent.py [port]      # default port 9100
+
+Then run the app with
+    EMAIL_GENERATION_URL=http://localhost:9100/email
+
+Requests with "stream": true get the email JSON as Server-Sent Events
+({"text": chunk} per event, then [DONE]) in small, slightly delayed chunks;
+other requests get {"text": "<email json>"} in one response, like the agent.
+Set FAKE_AGENT_DELAY (seconds per chunk, default 0.05) to simulate a slow agent.
+"""
+import asyncio
+import json
+import os
+import sys
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+app = FastAPI()
+CHUNK_SIZE = 12
+DELAY = float(os.environ.get("FAKE_AGENT_DELAY", "0.05"))
+
+
+def fake_email(message: str) -> str:
+    try:
+        quote = json.loads(message)
+    except ValueError:
+        quote = {}
+    name = quote.get("contact_name", "there")
+    route = f"{quote.get('pickup_city', '?')} to {quote.get('delivery_city', '?')}"
+    return json.dumps({
+        "subject": f"Your \"{route}\" shipping quote",
+        "body": f"Hi {name},\n\nHere is your quote for {route}: "
+                f"${quote.get('final_quote_amount', 0):,.2f}.\n\nThanks! 🚚",
+    })
+
+
+@app.post("/email")
+async def email(request: Request):
+    payload = await request.json()
+    text = fake_email(payload.get("message", "{}"))
+    if not payload.get("stream"):
+        await asyncio.sleep(DELAY)
+        return {"text": text}
+
+    async def events():
+        for i in range(0, len(text), CHUNK_SIZE):
+            await asyncio.sleep(DELAY)
+            yield f"data: {json.dumps({'text': text[i:i + CHUNK_SIZE]})}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+if __name__ == "__main__":
+    uvicorn.run(app, port=int(sys.argv[1]) if len(sys.argv) > 1 else 9100)
@@ -0,0 +1,28 @@
+"""
+Fit the log-linear lane pricing model from past orders.
+
+Usage:
+    python scripts/fit_pricing_model.py data/orders data/pricing_model.json
+    python scripts/fit_pricing_model.py Orders_Master.csv data/pricing_model.json
+
+Reads the cleaned orders dataset (scripts/ingest_orders.py) or the raw CSV
+with the columns distance_miles, vehicles_count, pickup_date and order_price. The service loads the output from PRICING_MODEL_PATH at startup.
+"""
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.services.pricing_service import fit_loglinear  # noqa: E402
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print(__doc__)
+        sys.exit(1)
+
+    model = fit_loglinear(Path(sys.argv[1]))
+    Path(sys.argv[2]).parent.mkdir(parents=True, exist_ok=True)
+    Path(sys.argv[2]).write_text(json.dumps(model, indent=2))
+    print(f"Fitted on {model['fitted_rows']} orders (RMSE {model['rmse_log']} in log price); wrote {sys.argv[2]}")
@@ -0,0 +1,43 @@
+"""
+Full resync of the local HubSpot replica (cold start, or repair after missed webhooks).
+
+Usage:
+    python scripts/hubspot_resync.py [companies|contacts|deals ...]
+
+With no arguments every object type is resynced. Uses the same settings as the
+app (HUBSPOT_TOKEN, HUBSPOT_REPLICA_PATH); the replica is enabled for this run
+regardless of HUBSPOT_REPLICA_ENABLED.
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.core.config import settings  # noqa: E402
+from app.core.http_client import close_http_clients, start_http_clients  # noqa: E402
+from app.services import hubspot_replica  # noqa: E402
+from app.services.hubspot_sync import full_resync  # noqa: E402
+
+
+async def main(object_types):
+    settings.HUBSPOT_REPLICA_ENABLED = True
+    await start_http_clients()
+    hubspot_replica.open_hubspot_replica()
+    try:
+        return await full_resync(object_types)
+    finally:
+        hubspot_replica.close_hubspot_replica()
+        await close_http_clients()
+
+
+if __name__ == "__main__":
+    object_types = sys.argv[1:] or list(hubspot_replica.OBJECT_TYPES)
+    unknown = [t for t in object_types if t not in hubspot_replica.OBJECT_TYPES]
+    if unknown:
+        print(__doc__)
+        sys.exit(1)
+
+    counts = asyncio.run(main(object_types))
+    for object_type, count in counts.items():
+        print(f"{object_type}: {count} rows")
@@ -0,0 +1,67 @@
+"""
+Local stand-in for HubSpot's webhook sender: signs events with the v3 scheme
+and POSTs them to a running app, for exercising /hubspot/webhook by hand.
+
+Usage:
+    python scripts/hubspot_webhook_stub.py <subscriptionType> <objectId> [more objectIds ...]
+
+    e.g. python scripts/hubspot_webhook_stub.py company.propertyChange 1234 5678
+         python scripts/hubspot_webhook_stub.py contact.deletion 42
+
+Environment:
+    WEBHOOK_URL     target URL (default http://localhost:8000/hubspot/webhook)
+    WEBHOOK_SECRET  signing secret (default: HUBSPOT_WEBHOOK_SECRET from the app settings)
+"""
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.services.hubspot_replica import sign_webhook  # noqa: E402
+
+
+def build_events(subscription_type: str, object_ids: list[str]) -> list[dict]:
+    now = int(time.time() * 1000)
+    return [
+        {
+            "eventId": now + i,
+            "subscriptionId": 1,
+            "portalId": 1,
+            "occurredAt": now,
+            "subscriptionType": subscription_type,
+            "attemptNumber": 0,
+            "objectId": int(object_id),
+        }
+        for i, object_id in enumerate(object_ids)
+    ]
+
+
+def send_events(url: str, secret: str, events: list[dict]) -> httpx.Response:
+    body = json.dumps(events).encode()
+    timestamp = str(int(time.time() * 1000))
+    headers = {
+        "Content-Type": "application/json",
+        "X-HubSpot-Request-Timestamp": timestamp,
+        "X-HubSpot-Signature-v3": sign_webhook(secret, "POST", url, body, timestamp),
+    }
+    return httpx.post(url, content=body, headers=headers)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print(__doc__)
+        sys.exit(1)
+
+    url = os.environ.get("WEBHOOK_URL", "http://localhost:8000/hubspot/webhook")
+    secret = os.environ.get("WEBHOOK_SECRET")
+    if not secret:
+        from app.core.config import settings
+        secret = settings.HUBSPOT_WEBHOOK_SECRET
+
+    resp = send_events(url, secret, build_events(sys.argv[1], sys.argv[2:]))
+    print(resp.status_code, resp.text)
@@ -0,0 +1,40 @@
+"""
+Clean Orders_Master.csv into the Arrow orders dataset the service loads at
+startup (route history, pricing fits).
+
+Usage:
+    python scripts/ingest_orders.py Orders_Master.csv [data/orders] [data/zipdb.bin]
+
+The CSV is streamed in chunks; ZIPs are zero-padded, cities/states and ZIP
+centroids filled in from the ZIP database (when present), and every column
+written with an explicit type. Re-running appends only orders whose
+order_id is not in the dataset yet.
+"""
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.services.orders_dataset import ingest_orders  # noqa: E402
+from app.services.zip_database import ZipDatabase  # noqa: E402
+
+
+if __name__ == "__main__":
+    if not 2 <= len(sys.argv) <= 4:
+        print(__doc__)
+        sys.exit(1)
+
+    csv_path = Path(sys.argv[1])
+    dataset_dir = Path(sys.argv[2] if len(sys.argv) > 2 else "data/orders")
+    zip_db_path = Path(sys.argv[3] if len(sys.argv) > 3 else "data/zipdb.bin")
+
+    zip_db = ZipDatabase(zip_db_path) if zip_db_path.exists() else None
+    if zip_db is None:
+        print(f"ZIP database not found at {zip_db_path}; cities/states and centroids are not filled in")
+    try:
+        summary = ingest_orders(csv_path, dataset_dir, zip_db=zip_db)
+    finally:
+        if zip_db is not None:
+            zip_db.close()
+    print(json.dumps(summary, indent=2))
@@ -0,0 +1,15 @@
+import os
+import tempfile
+
+# The app's Settings require upstream credentials; tests never call out, so
+# placeholders are enough. Caches go to a throwaway directory.
+for name in (
+    "HUBSPOT_TOKEN",
+    "VIN_API",
+    "OPENROUTESERVICE_API_KEY",
+    "OPENROUTESERVICE_BASE_URL",
+    "COMPANY_DETAIL_EXTRACTOR_URL",
+    "EMAIL_GENERATION_URL",
+):
+    os.environ.setdefault(name, "test")
+os.environ.setdefault("CACHE_DIR", tempfile.mkdtemp(prefix="hubspot_task_cache_"))
@@ -0,0 +1,70 @@
+import json
+import random
+
+import pytest
+
+from app.services.email_service import EmailStreamParser
+
+EMAIL = {
+    "subject": 'Your quote: Dallas, TX → Wichita, KS "2 vehicles"',
+    "body": "Hi Jane,\n\tThanks for reaching out \\ here's the quote.\r\nPrice: $1,250 😀 / café\n— Team",
+}
+
+
+def _feed(text: str, chunks: list[str]) -> tuple[EmailStreamParser, dict]:
+    parser = EmailStreamParser()
+    streamed: dict[str, str] = {}
+    for chunk in chunks:
+        for field, delta in parser.feed(chunk):
+            streamed[field] = streamed.get(field, "") + delta
+    return parser, streamed
+
+
+def _random_chunks(text: str, rng: random.Random) -> list[str]:
+    chunks, i = [], 0
+    while i < len(text):
+        size = rng.randint(1, 8)
+        chunks.append(text[i:i + size])
+        i += size
+    return chunks
+
+
+@pytest.mark.parametrize("ensure_ascii", [True, False])
+@pytest.mark.parametrize("seed", range(25))
+def test_random_chunk_splits(seed, ensure_ascii):
+    text = json.dumps(EMAIL, ensure_ascii=ensure_ascii)
+    parser, streamed = _feed(text, _random_chunks(text, random.Random(seed)))
+    assert parser.done
+    assert parser.result() == EMAIL
+    assert streamed == EMAIL
+
+
+def test_one_character_chunks():
+    # Every escape (\n, \", \\, \uXXXX and surrogate pairs) is split across chunks
+    text = json.dumps(EMAIL)
+    parser, streamed = _feed(text, list(text))
+    assert parser.result() == EMAIL
+    assert streamed == EMAIL
+
+
+@pytest.mark.parametrize("split", range(1, 13))
+def test_unicode_escape_split_at_every_offset(split):
+    text = '{"subject": "\\ud83d\\ude00 ok", "body": "x"}'
+    start = text.index("\\ud83d")
+    chunks = [text[:start + split], text[start + split:]]
+    parser, _ = _feed(text, chunks)
+    assert parser.result() == {"subject": "😀 ok", "body": "x"}
+
+
+def test_fence_and_non_string_values_are_skipped():
+    text = '```json\n{"subject": "Hi", "priority": 3, "body": "Line\\nTwo"}\n```'
+    parser, streamed = _feed(text, _random_chunks(text, random.Random(1)))
+    assert parser.done
+    assert parser.result() == {"subject": "Hi", "body": "Line\nTwo"}
+    assert "priority" not in streamed
+
+
+def test_incomplete_stream_is_not_done():
+    parser, _ = _feed('{"subject": "Hi", "body": "unfinished', ['{"subject": "Hi", ', '"body": "unfinished'])
+    assert not parser.done
+    assert parser.result() == {"subject": "Hi", "body": "unfinished"}
@@ -0,0 +1,70 @@
+import json
+import time
+
+from app.services.hubspot_replica import sign_webhook, verify_webhook
+
+SECRET = "client-secret"
+URI = "https://quotes.example.com/hubspot/webhook"
+MAX_AGE = 300
+
+
+def _signed(body: bytes, timestamp: str = None):
+    timestamp = timestamp or str(int(time.time() * 1000))
+    return timestamp, sign_webhook(SECRET, "POST", URI, body, timestamp)
+
+
+def _body() -> bytes:
+    return json.dumps([{"eventId": 1, "subscriptionType": "company.propertyChange", "objectId": 42}]).encode()
+
+
+def test_round_trip():
+    body = _body()
+    timestamp, signature = _signed(body)
+    assert verify_webhook(SECRET, "POST", URI, body, timestamp, signature, MAX_AGE)
+
+
+def test_method_is_case_insensitive():
+    body = _body()
+    timestamp, signature = _signed(body)
+    assert verify_webhook(SECRET, "post", URI, body, timestamp, signature, MAX_AGE)
+
+
+def test_tampered_body_is_rejected():
+    body = _body()
+    timestamp, signature = _signed(body)
+    tampered = body.replace(b"42", b"43")
+    assert not verify_webhook(SECRET, "POST", URI, tampered, timestamp, signature, MAX_AGE)
+
+
+def test_other_uri_or_secret_is_rejected():
+    body = _body()
+    timestamp, signature = _signed(body)
+    assert not verify_webhook(SECRET, "POST", URI + "?x=1", body, timestamp, signature, MAX_AGE)
+    assert not verify_webhook("other-secret", "POST", URI, body, timestamp, signature, MAX_AGE)
+
+
+def test_expired_timestamp_is_rejected():
+    body = _body()
+    timestamp, signature = _signed(body, str(int((time.time() - MAX_AGE - 60) * 1000)))
+    assert not verify_webhook(SECRET, "POST", URI, body, timestamp, signature, MAX_AGE)
+
+
+def test_future_timestamp_is_rejected():
+    body = _body()
+    timestamp, signature = _signed(body, str(int((time.time() + MAX_AGE + 60) * 1000)))
+    assert not verify_webhook(SECRET, "POST", URI, body, timestamp, signature, MAX_AGE)
+
+
+def test_timestamp_is_part_of_the_signature():
+    body = _body()
+    timestamp, signature = _signed(body)
+    later = str(int(timestamp) + 1000)
+    assert not verify_webhook(SECRET, "POST", URI, body, later, signature, MAX_AGE)
+
+
+def test_missing_headers_are_rejected():
+    body = _body()
+    timestamp, signature = _signed(body)
+    assert not verify_webhook(SECRET, "POST", URI, body, None, signature, MAX_AGE)
+    assert not verify_webhook(SECRET, "POST", URI, body, "not-a-number", signature, MAX_AGE)
+    assert not verify_webhook(SECRET, "POST", URI, body, timestamp, None, MAX_AGE)